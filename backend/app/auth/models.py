@@ -28,18 +28,27 @@ class UserLogin(BaseModel):
     phone_no: str
     otp: str
 
+class OTPRequest(BaseModel):
+    phone_no: str
+
+class SetPasswordRequest(BaseModel):
+    current_password: str
+    new_password: str = Field(..., min_length=8, max_length=72)
+
 class UserInDB(BaseModel):
     user_id: str = Field(default_factory=generate_user_id)
     name: str
     email: EmailStr
     phone_no: str
-    password_hash: str
+    password_hash: Optional[str] = None  # Set when the user chooses a password
     city: str
     state: str
     char_id: str = Field(default_factory=generate_char_id)
     govt_id_type: str
     govt_id_number: str
     govt_id_image: Optional[str] = None
+    identity_screening: Optional[dict] = None
+    status: str = "active"
     created_at: datetime = Field(default_factory=get_current_datetime)
     updated_at: datetime = Field(default_factory=get_current_datetime)
     is_active: bool = True
@@ -49,4 +58,9 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user_id: str
-    char_id: str
\ No newline at end of file
+    char_id: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
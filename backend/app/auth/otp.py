@@ -0,0 +1,131 @@
+import logging
+import hashlib
+import hmac
+import secrets
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+class OTPSender(ABC):
+    """Delivers a one-time password to a phone number"""
+
+    @abstractmethod
+    async def send(self, phone_no: str, code: str):
+        ...
+
+class ConsoleOTPSender(OTPSender):
+    """Local stand-in for an SMS gateway: writes the code to the server log"""
+
+    async def send(self, phone_no: str, code: str):
+        logger.info("OTP for %s: %s", phone_no, code)
+
+OTP_SENDERS = {
+    "console": ConsoleOTPSender
+}
+
+class TokenBucket:
+    """Per-key token buckets: `capacity` burst, refilled at `rate` tokens per second"""
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = 100000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str) -> float:
+        """Consume a token. Returns 0 on success, otherwise seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.capacity / self.rate
+        self._buckets = {
+            key: value for key, value in self._buckets.items()
+            if now - value[1] < full_after
+        }
+
+class OTPService:
+    """
+    One-time passwords kept hashed in the otp_codes collection (one per phone,
+    expired by a TTL index) with an attempt counter. Requests and verifications
+    are rate limited per phone in memory, so bursts are rejected before any
+    database access.
+    """
+
+    def __init__(self):
+        self.request_limiter = TokenBucket(settings.otp_request_burst, settings.otp_request_per_minute / 60)
+        self.verify_limiter = TokenBucket(settings.otp_verify_burst, settings.otp_verify_per_minute / 60)
+        self.sender: OTPSender = OTP_SENDERS[settings.otp_sender]()
+
+    def _hash(self, phone_no: str, code: str) -> str:
+        return hmac.new(settings.secret_key.encode(), f"{phone_no}:{code}".encode(), hashlib.sha256).hexdigest()
+
+    def _check_rate(self, limiter: TokenBucket, phone_no: str):
+        retry_after = limiter.take(phone_no)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many OTP attempts. Please try again later.",
+                headers={"Retry-After": str(int(retry_after) + 1)}
+            )
+
+    def check_request_rate(self, phone_no: str):
+        """Spend a send token for the phone; raises 429 when the bucket is empty"""
+        self._check_rate(self.request_limiter, phone_no)
+
+    async def request(self, phone_no: str):
+        """Generate, store and send a new code, replacing any previous one for the phone"""
+        code = f"{secrets.randbelow(10 ** settings.otp_length):0{settings.otp_length}d}"
+        now = datetime.now(timezone.utc)
+        await db.database.otp_codes.replace_one(
+            {"_id": phone_no},
+            {
+                "_id": phone_no,
+                "otp_hash": self._hash(phone_no, code),
+                "attempts": 0,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=settings.otp_ttl_seconds)
+            },
+            upsert=True
+        )
+        await self.sender.send(phone_no, code)
+
+    async def verify(self, phone_no: str, code: str) -> bool:
+        """Check a code; each stored code allows otp_max_attempts tries and is single use"""
+        self._check_rate(self.verify_limiter, phone_no)
+        if settings.otp_static_code and hmac.compare_digest(code.encode(), settings.otp_static_code.encode()):
+            return True
+        
+        # Count the attempt atomically; expired or exhausted codes never match
+        entry: Optional[Dict] = await db.database.otp_codes.find_one_and_update(
+            {
+                "_id": phone_no,
+                "attempts": {"$lt": settings.otp_max_attempts},
+                "expires_at": {"$gt": datetime.now(timezone.utc)}
+            },
+            {"$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if entry is None or not hmac.compare_digest(entry["otp_hash"], self._hash(phone_no, code)):
+            return False
+        await db.database.otp_codes.delete_one({"_id": phone_no, "otp_hash": entry["otp_hash"]})
+        return True
+
+# Global OTP service
+otp_service = OTPService()
@@ -0,0 +1,96 @@
+import logging
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+class RevocationList:
+    """
+    Users whose tokens issued before a given moment are no longer valid
+    (logout everywhere, deactivation), and users whose token claims are stale
+    because their profile version moved on. Held in memory so token checks never
+    touch the database, and re-synced from the revoked_sessions and
+    claim_versions collections so changes made by other processes take effect
+    within one interval.
+    """
+
+    def __init__(self, sync_seconds: float):
+        self.sync_seconds = sync_seconds
+        self._revoked: Dict[str, float] = {}
+        self._claim_versions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.sync()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Revocation list sync failed: %s", e)
+
+    async def sync(self):
+        revoked = {}
+        async for entry in db.database.revoked_sessions.find({}, {"revoked_at": 1}):
+            revoked[entry["_id"]] = entry["revoked_at"].replace(tzinfo=timezone.utc).timestamp()
+        self._revoked = revoked
+        claim_versions = {}
+        async for entry in db.database.claim_versions.find({}, {"version": 1}):
+            claim_versions[entry["_id"]] = entry["version"]
+        self._claim_versions = claim_versions
+
+    async def revoke(self, user_id: str):
+        """Invalidate every token issued to the user up to now"""
+        now = datetime.now(timezone.utc)
+        await db.database.revoked_sessions.update_one(
+            {"_id": user_id},
+            {"$set": {
+                "revoked_at": now,
+                # Once every access token issued before now has expired the entry is redundant
+                "expires_at": now + timedelta(minutes=settings.access_token_expire_minutes)
+            }},
+            upsert=True
+        )
+        self._revoked[user_id] = now.timestamp()
+
+    async def claims_changed(self, user_id: str, version: int):
+        """Mark access tokens carrying a profile version below `version` as stale"""
+        await db.database.claim_versions.update_one(
+            {"_id": user_id},
+            {
+                "$max": {"version": version},
+                # Tokens with older claims have all expired by then
+                "$set": {"expires_at": datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)}
+            },
+            upsert=True
+        )
+        self._claim_versions[user_id] = max(version, self._claim_versions.get(user_id, 0))
+
+    def claims_stale(self, user_id: str, profile_version: int) -> bool:
+        return profile_version < self._claim_versions.get(user_id, 0)
+
+    def is_revoked(self, user_id: str, issued_at: Optional[float]) -> bool:
+        revoked_at = self._revoked.get(user_id)
+        if revoked_at is None:
+            return False
+        # Tokens without an issue time predate revocation support
+        return issued_at is None or issued_at <= revoked_at
+
+# Global revocation list
+revocation_list = RevocationList(settings.revocation_sync_seconds)
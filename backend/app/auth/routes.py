@@ -1,13 +1,42 @@
+import logging
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form
-from datetime import timedelta
-from app.auth.models import UserRegistration, UserLogin, UserInDB, Token
-from app.auth.utils import get_password_hash, verify_password, create_access_token, verify_otp
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.auth.models import UserRegistration, UserLogin, UserInDB, Token, SetPasswordRequest, OTPRequest, RefreshTokenRequest
+from app.auth.utils import verify_token
+from app.auth.tokens import issue_session, rotate_refresh_token, revoke_refresh_token, revoke_user_sessions
+from app.auth.otp import otp_service
+from app.auth.credentials import credential_provisioner, DEFAULT_PASSWORD
 from app.database import get_database
 from app.config import settings
 from app.utils.file_handler import save_uploaded_file
+from app.utils.biometrics import extract_face_embedding
+from app.utils.face_index import face_index
+from app.utils.image_hashing import image_hash_index
+from app.users.search import build_search_fields
+from app.users.counters import user_counters, location_fields
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
 import os
 
+logger = logging.getLogger(__name__)
+
 auth_router = APIRouter()
+security = HTTPBearer()
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_database)):
+    user_id = verify_token(credentials.credentials)
+    user = await db.users.find_one({"user_id": user_id})
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+def duplicate_user_message(govt_id_conflict: bool) -> str:
+    if govt_id_conflict:
+        return "User with this government ID number already exists"
+    return "User with this email or phone number already exists"
 
 @auth_router.post("/register", response_model=dict)
 async def register_user(
@@ -34,26 +63,24 @@ async def register_user(
     - govt_id_number: Government ID number
     - govt_id_image: Government ID image file (required)
     """
-    # Check if user already exists
-    existing_user = await db.users.find_one({
-        "$or": [
-            {"email": email},
-            {"phone_no": phone_no}
-        ]
-    })
+    # Check if user already exists: one probe, each $or branch served by a unique index
+    existing_user = await db.users.find_one(
+        {
+            "$or": [
+                {"email": email},
+                {"phone_no": phone_no},
+                {"govt_id_number": govt_id_number}
+            ]
+        },
+        {"email": 1, "phone_no": 1, "govt_id_number": 1, "_id": 0}
+    )
     
     if existing_user:
+        # Only the government ID matched
+        govt_id_conflict = existing_user.get("email") != email and existing_user.get("phone_no") != phone_no
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this email or phone number already exists"
-        )
-    
-    # Check if govt_id_number already exists
-    existing_govt_id = await db.users.find_one({"govt_id_number": govt_id_number})
-    if existing_govt_id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this government ID number already exists"
+            detail=duplicate_user_message(govt_id_conflict)
         )
     
     # Save government ID image
@@ -67,33 +94,40 @@ async def register_user(
                 detail=f"Failed to upload government ID image: {str(e)}"
             )
     
-    # Create new user with default password "12345678"
-    default_password = "12345678"
+    # Screen the ID photo against all enrolled faces for duplicate identities
+    identity_screening = None
+    govt_id_embedding = None
+    if govt_id_filename and settings.biometric_checks_enabled:
+        govt_id_embedding = await extract_face_embedding(
+            os.path.join(settings.upload_dir, "govt_id_images", govt_id_filename)
+        )
+        if govt_id_embedding is not None:
+            identity_screening = {
+                "source": "govt_id_image",
+                "matches": face_index.search(govt_id_embedding, settings.face_duplicate_threshold),
+                "screened_at": datetime.now(timezone.utc)
+            }
+    
+    # Create new user; the default password stays valid until one is set, so nothing is hashed here
     user_in_db = UserInDB(
         name=name,
         email=email,
         phone_no=phone_no,
-        password_hash=get_password_hash(default_password),
         city=city,
         state=state,
         govt_id_type=govt_id_type,
         govt_id_number=govt_id_number,
-        govt_id_image=govt_id_filename
+        govt_id_image=govt_id_filename,
+        identity_screening=identity_screening
     )
     
     try:
-        result = await db.users.insert_one(user_in_db.dict())
-        print(f"Insert result: {result}")
-        print(f"Inserted ID: {result.inserted_id}")
-        
-        return {
-            "message": "User registered successfully with default password: 12345678. Please login with OTP.",
-            "user_id": user_in_db.user_id,
-            "char_id": user_in_db.char_id,
-            "redirect_to_login": True
-        }
+        user_document = user_in_db.dict()
+        user_document.update(build_search_fields(user_in_db.name, user_in_db.email, user_in_db.char_id))
+        user_document.update(location_fields(user_in_db.city, user_in_db.state))
+        result = await db.users.insert_one(user_document)
     except Exception as e:
-        print(f"Database error: {e}")
+        logger.exception("Error registering user")
         # If database insertion fails, delete the uploaded file
         if govt_id_filename:
             try:
@@ -101,15 +135,55 @@ async def register_user(
                 await delete_file(os.path.join(settings.upload_dir, "govt_id_images", govt_id_filename))
             except:
                 pass
+        # A concurrent registration won the race; the unique indexes are the final arbiter
+        if isinstance(e, DuplicateKeyError):
+            key_pattern = (e.details or {}).get("keyPattern", {})
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=duplicate_user_message("govt_id_number" in key_pattern)
+            )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
         )
+    
+    # The user is stored; counters and indexes are secondary and must not fail the registration
+    try:
+        await user_counters.user_added(user_document)
+        
+        # The ID photo is the reference face until a profile picture is uploaded
+        if govt_id_embedding is not None:
+            await face_index.enroll(user_in_db.user_id, govt_id_embedding, "govt_id_image")
+        if govt_id_filename:
+            await image_hash_index.register_many(user_in_db.user_id, {
+                "govt_id_image": os.path.join(settings.upload_dir, "govt_id_images", govt_id_filename)
+            })
+    except Exception:
+        logger.exception("Error indexing registered user %s", user_in_db.user_id)
+    
+    return {
+        "message": f"User registered successfully with default password: {DEFAULT_PASSWORD}. Please login with OTP.",
+        "user_id": user_in_db.user_id,
+        "char_id": user_in_db.char_id,
+        "redirect_to_login": True
+    }
+
+@auth_router.post("/request-otp")
+async def request_otp(otp_request: OTPRequest, db=Depends(get_database)):
+    """Send a one-time login code to a registered phone number"""
+    # Rate limited before the users lookup
+    otp_service.check_request_rate(otp_request.phone_no)
+    
+    # Same response whether or not the phone is registered, so numbers cannot be enumerated
+    user = await db.users.find_one({"phone_no": otp_request.phone_no}, {"_id": 1})
+    if user:
+        await otp_service.request(otp_request.phone_no)
+    return {"message": "If the phone number is registered, an OTP has been sent"}
 
 @auth_router.post("/login", response_model=Token)
 async def login_user(login_data: UserLogin, db=Depends(get_database)):
-    # Verify OTP
-    if not verify_otp(login_data.otp):
+    # Verify OTP (rate limited per phone before any database access)
+    if not await otp_service.verify(login_data.phone_no, login_data.otp):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid OTP"
@@ -123,16 +197,42 @@ async def login_user(login_data: UserLogin, db=Depends(get_database)):
             detail="User not found"
         )
     
-    # Create access token
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user["user_id"]}, 
-        expires_delta=access_token_expires
-    )
+    # Short-lived access token with signed claims plus a rotating refresh token
+    return await issue_session(user)
+
+@auth_router.post("/refresh", response_model=Token)
+async def refresh_session(request: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token and refresh token"""
+    return await rotate_refresh_token(request.refresh_token)
+
+@auth_router.post("/logout")
+async def logout(request: RefreshTokenRequest):
+    """End the session the refresh token belongs to"""
+    await revoke_refresh_token(request.refresh_token)
+    return {"message": "Logged out successfully"}
+
+@auth_router.post("/logout-all")
+async def logout_all(current_user=Depends(get_current_user)):
+    """End every session of the current user, including unexpired access tokens"""
+    await revoke_user_sessions(current_user["user_id"])
+    return {"message": "All sessions ended"}
+
+@auth_router.post("/set-password")
+async def set_password(
+    request: SetPasswordRequest,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Replace the current (or default) password with one chosen by the user"""
+    if not await credential_provisioner.verify_user_password(current_user, request.current_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Current password is incorrect"
+        )
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user_id": user["user_id"],
-        "char_id": user["char_id"]
-    }
\ No newline at end of file
+    password_hash = await credential_provisioner.hash_password(request.new_password)
+    await db.users.update_one(
+        {"user_id": current_user["user_id"]},
+        {"$set": {"password_hash": password_hash, "updated_at": datetime.now(timezone.utc)}}
+    )
+    return {"message": "Password updated successfully"}
@@ -0,0 +1,147 @@
+import hashlib
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pymongo import ReturnDocument
+from app.auth.revocation import revocation_list
+from app.auth.utils import create_access_token, decode_token
+from app.config import settings
+from app.database import db
+
+security = HTTPBearer()
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_session_access_token(user: Dict) -> str:
+    """Access token carrying the claims most handlers need, so they can skip the users lookup"""
+    return create_access_token(
+        data={
+            "sub": user["user_id"],
+            "name": user.get("name"),
+            "char_id": user.get("char_id"),
+            "is_admin": user.get("is_admin", False),
+            "pv": user.get("profile_version", 0),
+            "iat": time.time(),
+            "type": "access"
+        },
+        expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
+    )
+
+async def _store_refresh_token(user_id: str, family_id: str) -> str:
+    token = secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+    await db.database.refresh_tokens.insert_one({
+        "_id": _hash_refresh_token(token),
+        "user_id": user_id,
+        "family_id": family_id,
+        "used": False,
+        "created_at": now,
+        "expires_at": now + timedelta(days=settings.refresh_token_expire_days)
+    })
+    return token
+
+async def issue_session(user: Dict) -> Dict:
+    """Access token plus a refresh token starting a new rotation family"""
+    refresh_token = await _store_refresh_token(user["user_id"], uuid.uuid4().hex)
+    return {
+        "access_token": create_session_access_token(user),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.access_token_expire_minutes * 60,
+        "user_id": user["user_id"],
+        "char_id": user["char_id"]
+    }
+
+async def rotate_refresh_token(refresh_token: str) -> Dict:
+    """
+    Exchange a refresh token for a new session. Each refresh token is single use:
+    presenting one that was already rotated means it leaked, so its whole family
+    is revoked.
+    """
+    token_hash = _hash_refresh_token(refresh_token)
+    entry = await db.database.refresh_tokens.find_one_and_update(
+        {"_id": token_hash, "used": False, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"$set": {"used": True, "used_at": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER
+    )
+    if entry is None:
+        reused = await db.database.refresh_tokens.find_one({"_id": token_hash, "used": True}, {"family_id": 1})
+        if reused:
+            await db.database.refresh_tokens.delete_many({"family_id": reused["family_id"]})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Claims are refreshed from the user record on every rotation
+    user = await db.database.users.find_one({"user_id": entry["user_id"], "is_active": True})
+    if not user:
+        await db.database.refresh_tokens.delete_many({"family_id": entry["family_id"]})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    return {
+        "access_token": create_session_access_token(user),
+        "refresh_token": await _store_refresh_token(user["user_id"], entry["family_id"]),
+        "token_type": "bearer",
+        "expires_in": settings.access_token_expire_minutes * 60,
+        "user_id": user["user_id"],
+        "char_id": user["char_id"]
+    }
+
+async def revoke_refresh_token(refresh_token: str):
+    """End one session: its refresh token family can no longer be rotated"""
+    entry = await db.database.refresh_tokens.find_one({"_id": _hash_refresh_token(refresh_token)}, {"family_id": 1})
+    if entry:
+        await db.database.refresh_tokens.delete_many({"family_id": entry["family_id"]})
+
+async def claims_changed(user_id: str):
+    """
+    Bump the user's profile version after a change to data carried in token claims.
+    Access tokens with the old version are served from the user record until they
+    expire; the next refresh issues claims with the new version.
+    """
+    user = await db.database.users.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"profile_version": 1}},
+        projection={"profile_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if user:
+        await revocation_list.claims_changed(user_id, user["profile_version"])
+
+async def revoke_user_sessions(user_id: str):
+    """End every session of a user: access tokens via the revocation list, refresh tokens by deletion"""
+    await revocation_list.revoke(user_id)
+    await db.database.refresh_tokens.delete_many({"user_id": user_id})
+
+async def get_current_user_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict:
+    """
+    Current user from the signed access-token claims alone, without a users lookup.
+    Tokens issued before claims were added, or whose profile version is older than
+    the user's current one (profile or admin change), fall back to loading the user.
+    """
+    payload = decode_token(credentials.credentials)
+    if "name" not in payload or revocation_list.claims_stale(payload["sub"], payload.get("pv", 0)):
+        user = await db.database.users.find_one({"user_id": payload["sub"]})
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        return user
+    return {
+        "user_id": payload["sub"],
+        "name": payload["name"],
+        "char_id": payload.get("char_id"),
+        "is_admin": payload.get("is_admin", False),
+        "profile_version": payload.get("pv", 0)
+    }
@@ -9,6 +9,48 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     upload_dir: str = "uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    anchor_batch_size: int = 64  # Finalizations per Merkle anchor block
+    anchor_batch_window_seconds: float = 2.0  # Max wait before a partial batch is anchored
+    file_verify_concurrency: int = 8  # Files re-hashed in parallel by bulk verification
+    analysis_workers: int = 2  # Processes used for CPU-bound document/image analysis
+    forgery_score_threshold: float = 0.6  # Documents scoring at or above this fail the forgery check
+    forgery_cache_size: int = 1024  # Analysis reports cached by content digest
+    ela_max_dimension: int = 2048  # Images are downscaled to this size before error level analysis
+    verification_workers: int = 4  # Concurrent forgery-check workers for finalized uploads
+    verification_lease_seconds: int = 300  # A job whose owner has not renewed it for this long can be recovered by another process
+    biometric_checks_enabled: bool = True  # Reject selfies/eye scans without a detectable face/eye
+    biometric_workers: int = 2  # Processes running face/eye detection
+    biometric_max_dimension: int = 640  # Images are downscaled to this size before detection
+    face_match_threshold: float = 0.55  # Selfie vs enrolled face similarity below which the advisory face_match is flagged; uncalibrated, not an identity gate
+    face_duplicate_threshold: float = 0.9  # Similarity at which another account is listed for review in identity_screening; uncalibrated
+    face_index_batch_size: int = 4096  # Rows per batch when screening against all enrolled faces
+    signature_match_threshold: float = 0.75  # Similarity to the user's previous signatures below which the advisory signature_match is flagged; uncalibrated, not a gate
+    signature_history_size: int = 10  # Previous signatures kept per user as references
+    signature_cache_size: int = 4096  # Signature feature vectors cached by content digest
+    image_hash_max_distance: int = 6  # Max hamming distance (pHash and dHash) for duplicate images
+    user_export_batch_size: int = 1000  # Cursor batch size for the NDJSON user export
+    user_count_cache_seconds: float = 5.0  # In-process cache lifetime for user counters
+    user_count_reconcile_seconds: float = 300.0  # Interval for recomputing user counters from scratch
+    bcrypt_rounds: int = 12  # bcrypt cost factor for new password hashes
+    password_hash_workers: int = 2  # Threads dedicated to bcrypt hashing/verification
+    password_hash_max_pending: int = 32  # bcrypt jobs queued or running before callers wait
+    otp_sender: str = "console"  # OTP delivery backend (see app/auth/otp.py OTP_SENDERS)
+    otp_length: int = 6  # Digits per one-time password
+    otp_ttl_seconds: int = 300  # One-time password lifetime
+    otp_max_attempts: int = 5  # Wrong guesses allowed per one-time password
+    otp_request_burst: int = 3  # OTP sends allowed per phone in a burst
+    otp_request_per_minute: float = 1.0  # Sustained OTP sends per phone
+    otp_verify_burst: int = 10  # Login attempts allowed per phone in a burst
+    otp_verify_per_minute: float = 5.0  # Sustained login attempts per phone
+    otp_static_code: Optional[str] = None  # Development only: a code accepted for any phone; requires dev_mode
+    dev_mode: bool = False  # Local development; the server refuses to start with development-only settings otherwise
+    refresh_token_expire_days: int = 30  # Lifetime of a refresh token (rotated on every use)
+    revocation_sync_seconds: float = 30.0  # Interval for reloading revoked sessions from the database
+    pricing_refresh_seconds: float = 5.0  # Interval for checking the active pricing config for changes
+    log_level: str = "INFO"  # Root log level
+    log_levels: str = ""  # Per-module overrides, e.g. "app.documents=DEBUG,pymongo=WARNING"
+    log_json: bool = True  # One JSON object per line; plain text when false
+    log_debug_sample_rate: float = 0.01  # Fraction of requests whose debug lines are kept
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,12 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import IndexModel, ASCENDING
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
 from app.config import settings
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 class Database:
     client: AsyncIOMotorClient = None
     database = None
@@ -12,19 +16,20 @@ db = Database()
 async def connect_to_mongo():
     """Create database connection"""
     try:
-        print(f"Connecting to MongoDB at: {settings.mongodb_url}")
+        # The URL may carry credentials, so only the database name is logged
+        logger.info("Connecting to MongoDB database %s", settings.database_name)
         db.client = AsyncIOMotorClient(settings.mongodb_url)
         db.database = db.client[settings.database_name]
         
         # Test the connection
         await db.client.admin.command('ping')
-        print("MongoDB connection successful!")
+        logger.info("MongoDB connection successful")
         
         # Create indexes
         await create_indexes()
-        print("Database indexes created successfully!")
+        logger.info("Database indexes created")
     except Exception as e:
-        print(f"MongoDB connection error: {e}")
+        logger.error("MongoDB connection error: %s", e)
         raise e
 
 async def close_mongo_connection():
@@ -40,11 +45,62 @@ async def create_indexes():
     await users_collection.create_index([("phone_no", ASCENDING)], unique=True)
     await users_collection.create_index([("email", ASCENDING)], unique=True)
     await users_collection.create_index([("char_id", ASCENDING)], unique=True)
+    try:
+        await users_collection.create_index([("govt_id_number", ASCENDING)], unique=True)
+    except OperationFailure as e:
+        # Existing duplicate IDs must be resolved before the index can be built
+        logger.warning("Could not create unique govt_id_number index: %s", e)
+    await users_collection.create_index([("char_id_lower", ASCENDING)])
+    # User search: one compound index per match tier, read in (key, user_id) order
+    await users_collection.create_index([("name_lower", ASCENDING), ("user_id", ASCENDING)])
+    await users_collection.create_index([("email_lower", ASCENDING), ("user_id", ASCENDING)])
+    await users_collection.create_index([("search_tokens", ASCENDING), ("user_id", ASCENDING)])
+    # Keyset pagination for user listings: equality filters first, then the sort keys
+    await users_collection.create_index([("is_active", ASCENDING), ("created_at", DESCENDING), ("user_id", DESCENDING)])
+    await users_collection.create_index([("is_active", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("user_id", DESCENDING)])
     
     # Documents collection indexes
     docs_collection = db.database.documents
     await docs_collection.create_index([("char_id", ASCENDING)])
     await docs_collection.create_index([("involved_users", ASCENDING)])
+    await docs_collection.create_index([("involved_users", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)])
+    try:
+        await docs_collection.create_index([("document_code", ASCENDING)], unique=True)
+    except OperationFailure as e:
+        # Existing duplicate codes must be resolved before the index can be built
+        logger.warning("Could not create unique document_code index: %s", e)
+    
+    # Face embeddings collection indexes
+    face_embeddings_collection = db.database.face_embeddings
+    await face_embeddings_collection.create_index([("user_id", ASCENDING)], unique=True)
+    
+    # OTP codes expire through a TTL index on expires_at
+    otp_codes_collection = db.database.otp_codes
+    await otp_codes_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    
+    # Session tokens: refresh tokens and revocations expire through TTL indexes
+    refresh_tokens_collection = db.database.refresh_tokens
+    await refresh_tokens_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    await refresh_tokens_collection.create_index([("user_id", ASCENDING)])
+    await refresh_tokens_collection.create_index([("family_id", ASCENDING)])
+    revoked_sessions_collection = db.database.revoked_sessions
+    await revoked_sessions_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    claim_versions_collection = db.database.claim_versions
+    await claim_versions_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    
+    # Image hashes collection indexes
+    image_hashes_collection = db.database.image_hashes
+    await image_hashes_collection.create_index([("user_id", ASCENDING)])
+    await image_hashes_collection.create_index([("flagged", ASCENDING), ("created_at", DESCENDING)])
+    
+    # Verification jobs collection indexes
+    verification_jobs_collection = db.database.verification_jobs
+    await verification_jobs_collection.create_index([("document_id", ASCENDING), ("created_at", DESCENDING)])
+    await verification_jobs_collection.create_index([("status", ASCENDING)])
+    
+    # Document state transition audit trail
+    document_events_collection = db.database.document_events
+    await document_events_collection.create_index([("document_id", ASCENDING), ("created_at", DESCENDING)])
     
     # Messages collection indexes
     messages_collection = db.database.messages
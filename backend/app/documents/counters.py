@@ -0,0 +1,160 @@
+import logging
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument, UpdateOne
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+# Fields that decide which dashboard bucket a document falls in, and for whom
+TRACKED_FIELDS = {"status": 1, "payment_status": 1, "involved_users": 1}
+
+DASHBOARD_BUCKETS = [
+    "drafts",
+    "pending_approval",
+    "awaiting_payment",
+    "ready_to_finalize",
+    "in_verification",
+    "finalized",
+    "rejected",
+    "other"
+]
+
+def dashboard_bucket(document: Dict) -> str:
+    status = document.get("status", "draft")
+    if status == "draft":
+        return "drafts"
+    if status in ("pending", "pending_approval"):
+        return "pending_approval"
+    if status in ("approved", "payment_pending"):
+        return "ready_to_finalize" if document.get("payment_status") == "completed" else "awaiting_payment"
+    if status == "payment_completed":
+        return "ready_to_finalize"
+    if status == "pending_verification":
+        return "in_verification"
+    if status in ("finalized", "rejected"):
+        return status
+    return "other"
+
+def _values(operand) -> List:
+    if isinstance(operand, dict):
+        return list(operand.get("$each", operand.get("$in", [])))
+    return [operand]
+
+def apply_tracked_update(before: Dict, update: Dict) -> Dict:
+    """The tracked fields of a document after `update`, derived from its pre-image"""
+    after = {
+        "status": before.get("status"),
+        "payment_status": before.get("payment_status"),
+        "involved_users": list(before.get("involved_users", []))
+    }
+    for field in ("status", "payment_status"):
+        if field in update.get("$set", {}):
+            after[field] = update["$set"][field]
+    if "involved_users" in update.get("$addToSet", {}):
+        for user_id in _values(update["$addToSet"]["involved_users"]):
+            if user_id not in after["involved_users"]:
+                after["involved_users"].append(user_id)
+    if "involved_users" in update.get("$pull", {}):
+        removed = set(_values(update["$pull"]["involved_users"]))
+        after["involved_users"] = [user_id for user_id in after["involved_users"] if user_id not in removed]
+    return after
+
+class DocumentCounters:
+    """
+    Per-user dashboard counts (drafts, pending approvals, awaiting payment,
+    finalized, ...) kept in document_counters, one document per user. Every
+    status or participant change applies $inc deltas, so the dashboard is a
+    single _id lookup. rebuild() recomputes everything from the documents.
+    """
+
+    def __init__(self):
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    async def record_change(self, before: Optional[Dict], after: Optional[Dict]):
+        deltas: Dict[tuple, int] = {}
+        if before:
+            bucket = dashboard_bucket(before)
+            for user_id in before.get("involved_users", []):
+                deltas[(user_id, bucket)] = deltas.get((user_id, bucket), 0) - 1
+        if after:
+            bucket = dashboard_bucket(after)
+            for user_id in after.get("involved_users", []):
+                deltas[(user_id, bucket)] = deltas.get((user_id, bucket), 0) + 1
+        operations = [
+            UpdateOne(
+                {"_id": user_id},
+                {"$inc": {f"buckets.{bucket}": delta}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+            for (user_id, bucket), delta in deltas.items() if delta
+        ]
+        if operations:
+            await db.database.document_counters.bulk_write(operations, ordered=False)
+
+    async def get(self, user_id: str) -> Dict[str, int]:
+        entry = await db.database.document_counters.find_one({"_id": user_id}, {"buckets": 1})
+        buckets = (entry or {}).get("buckets", {})
+        return {bucket: max(0, buckets.get(bucket, 0)) for bucket in DASHBOARD_BUCKETS}
+
+    async def rebuild(self) -> int:
+        """Recompute every user's counters from the documents collection"""
+        pipeline = [
+            {"$project": TRACKED_FIELDS},
+            {"$unwind": "$involved_users"}
+        ]
+        counts: Dict[str, Dict[str, int]] = {}
+        async for row in db.database.documents.aggregate(pipeline):
+            buckets = counts.setdefault(row["involved_users"], {})
+            bucket = dashboard_bucket(row)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne({"_id": user_id}, {"$set": {"buckets": buckets, "updated_at": now, "rebuilt_at": now}}, upsert=True)
+            for user_id, buckets in counts.items()
+        ]
+        if operations:
+            await db.database.document_counters.bulk_write(operations, ordered=False)
+        await db.database.document_counters.delete_many({"_id": {"$nin": list(counts)}})
+        logger.info("Rebuilt document counters for %d users", len(counts))
+        return len(counts)
+
+    def start_rebuild(self) -> bool:
+        """Schedule a rebuild in the background. Returns False if one is already running."""
+        if self._rebuild_task and not self._rebuild_task.done():
+            return False
+        self._rebuild_task = asyncio.create_task(self._run_rebuild())
+        return True
+
+    async def _run_rebuild(self):
+        try:
+            await self.rebuild()
+        except Exception as e:
+            logger.exception("Document counter rebuild failed")
+
+    async def start(self):
+        # Seed the counters the first time the service runs against existing documents
+        if await db.database.document_counters.estimated_document_count() == 0:
+            self.start_rebuild()
+
+# Global document counters
+document_counters = DocumentCounters()
+
+async def update_document_tracked(query: Dict, update: Dict) -> Optional[Dict]:
+    """
+    update_one for writes that may change a document's status, payment status or
+    participants. The pre-image comes back atomically with the write, so the
+    dashboard counters move by exactly this change. Returns the pre-image, or
+    None if nothing matched.
+    """
+    before = await db.database.documents.find_one_and_update(
+        query,
+        update,
+        projection=TRACKED_FIELDS,
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is not None:
+        await document_counters.record_change(before, apply_tracked_update(before, update))
+    return before
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union
+from typing import List, Optional, Union, Dict
 from datetime import datetime
 import secrets
 import string
@@ -44,11 +44,33 @@ class DocumentResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+class DocumentSummary(BaseModel):
+    """Lightweight list view; full details come from GET /api/documents/{document_id}"""
+    id: str = Field(alias="_id")
+    name: str = ""
+    document_code: str = ""
+    status: str = "draft"
+    role: str = "participant"  # primary or participant, relative to the requesting user
+    primary_user: str = ""
+    involved_users: List[str] = []
+    location: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    total_amount: Optional[float] = None
+    payment_status: Optional[str] = "pending"
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        populate_by_name = True
+
 class DocumentInDB(BaseModel):
     involved_users: List[str]
     primary_user: str
     upload_raw_docs: List[str] = []
+    upload_raw_docs_digests: Optional[List[Dict[str, str]]] = Field(default_factory=list, description="SHA-256 of each raw upload as {path, digest} entries")
     final_docs: Optional[List[str]] = None
+    final_docs_digests: Optional[List[Dict[str, str]]] = Field(default_factory=list, description="SHA-256 of each final document as {path, digest} entries")
     datetime: datetime
     location: Optional[str] = None
     start_date: Optional[str] = None
@@ -57,7 +79,7 @@ class DocumentInDB(BaseModel):
     document_code: str = Field(default_factory=generate_document_code)
     ai_forgery_check: bool = False
     blockchain: bool = False
-    status: str = "draft"  # draft, pending_approval, approved, payment_pending, payment_completed, finalized
+    status: str = "draft"  # draft, pending_approval, approved, payment_pending, payment_completed, pending_verification, finalized
     is_active: bool = True
     is_primary: bool = False
     daily_rate: float = 1.0  # Dynamic daily rate from pricing config
@@ -66,11 +88,24 @@ class DocumentInDB(BaseModel):
     payment_status: str = "pending"
     # User approval tracking - track who has approved
     user_approvals: Optional[dict] = Field(default_factory=dict, description="Track user approval status: {user_id: {approved: bool, approved_at: datetime}}")
+    # Approval quorum, kept in step with user_approvals so approval never rescans it
+    approved_count: int = 0
+    required_count: int = 0
     # Verification documents collected fresh for each document operation
     verification_documents: Optional[dict] = Field(default_factory=dict, description="Fresh verification documents for this document")
+    # Face/eye detection results per user for the verification images
+    biometric_checks: Optional[dict] = Field(default_factory=dict, description="Biometric detection results: {user_id: {profile_pic: ..., eye: ...}}")
     created_at: datetime
     updated_at: datetime
 
+class FileVerificationRequest(BaseModel):
+    document_ids: List[str] = Field(..., min_length=1, max_length=200, description="Document IDs or codes")
+    include_raw: bool = False
+
+class BulkParticipantsRequest(BaseModel):
+    char_ids: List[str] = Field(default_factory=list, max_length=100, description="Participants by char_id")
+    user_ids: List[str] = Field(default_factory=list, max_length=100, description="Participants by user_id")
+
 class JoinDocumentRequest(BaseModel):
     document_code: str
 
@@ -83,6 +118,7 @@ class InitiateAgreementRequest(BaseModel):
 class PricingConfig(BaseModel):
     daily_rate: float = Field(..., gt=0, description="Daily rate in coins per day")
     is_active: bool = True
+    version: int = 0  # Incremented on every change to the active config
     created_at: datetime
     updated_at: datetime
     created_by: Optional[str] = None  # Track who created it
@@ -0,0 +1,123 @@
+import logging
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAILY_RATE = 1.0
+
+class PricingService:
+    """
+    The active pricing configuration, held in process memory so document
+    creation reads it without any I/O. Every write bumps a version number on
+    the config; a background task polls that version so changes made by other
+    processes are picked up within one interval, and writes made through this
+    service refresh the cache immediately.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._config: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def config(self) -> Dict:
+        if self._config is None:
+            # No active config yet: serve the default pricing
+            now = datetime.now(timezone.utc)
+            return {"daily_rate": DEFAULT_DAILY_RATE, "is_active": True, "version": 0, "created_at": now, "updated_at": now}
+        return self._config
+
+    @property
+    def daily_rate(self) -> float:
+        return self.config.get("daily_rate", DEFAULT_DAILY_RATE)
+
+    @property
+    def version(self) -> int:
+        return self.config.get("version", 0)
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning("Pricing refresh failed: %s", e)
+
+    async def _active(self, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return await db.database.pricing_config.find_one(
+            {"is_active": True},
+            projection,
+            sort=[("created_at", -1)]
+        )
+
+    async def poll(self):
+        """Reload only when the active config or its version changed"""
+        current = await self._active({"_id": 1, "version": 1})
+        cached = self._config
+        if current is None and cached is None:
+            return
+        if current and cached and current["_id"] == cached["_id"] and current.get("version", 0) == cached.get("version", 0):
+            return
+        await self.refresh()
+
+    async def refresh(self):
+        self._config = await self._active()
+
+    async def create(self, daily_rate: float, user_id: str) -> Dict:
+        """Replace the active config with a new one"""
+        # Deactivate all existing pricing configs
+        await db.database.pricing_config.update_many(
+            {"is_active": True},
+            {"$set": {"is_active": False}}
+        )
+        current_time = datetime.now(timezone.utc)
+        new_pricing = {
+            "daily_rate": daily_rate,
+            "is_active": True,
+            "version": self.version + 1,
+            "created_at": current_time,
+            "updated_at": current_time,
+            "created_by": user_id  # Track who created it
+        }
+        await db.database.pricing_config.insert_one(new_pricing)
+        self._config = new_pricing
+        return new_pricing
+
+    async def update(self, daily_rate: float, user_id: str) -> Optional[Dict]:
+        """Change the active config in place. Returns None when there is none."""
+        current_pricing = await self._active({"_id": 1})
+        if not current_pricing:
+            return None
+        await db.database.pricing_config.update_one(
+            {"_id": current_pricing["_id"]},
+            {
+                "$set": {
+                    "daily_rate": daily_rate,
+                    "updated_at": datetime.now(timezone.utc),
+                    "updated_by": user_id  # Track who updated it
+                },
+                "$inc": {"version": 1}
+            }
+        )
+        await self.refresh()
+        return self._config
+
+# Global pricing service
+pricing_service = PricingService(settings.pricing_refresh_seconds)
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional
+from bson import ObjectId
+from fastapi import Depends, HTTPException, status
+from app.database import get_database
+
+def document_lookup_filter(document_id: str) -> Dict:
+    """
+    Filter matching a document by ObjectId or document_code in one query.
+    Document codes are 8 characters, so they never collide with 24-character ObjectIds.
+    """
+    if ObjectId.is_valid(document_id):
+        return {"$or": [{"_id": ObjectId(document_id)}, {"document_code": document_id}]}
+    return {"document_code": document_id}
+
+class Document(dict):
+    """A documents collection record. Still a dict, so existing handlers index it as before."""
+
+    @property
+    def id(self) -> str:
+        return str(self["_id"])
+
+    @property
+    def document_code(self) -> str:
+        return self.get("document_code", "")
+
+    @property
+    def status(self) -> str:
+        return self.get("status", "")
+
+    @property
+    def primary_user(self) -> Optional[str]:
+        return self.get("primary_user")
+
+    @property
+    def involved_users(self) -> List[str]:
+        return self.get("involved_users", [])
+
+    @property
+    def is_locked(self) -> bool:
+        return self.get("status") == "finalized" or bool(self.get("is_locked"))
+
+    def is_participant(self, user_id: str) -> bool:
+        return user_id in self.involved_users
+
+class DocumentResolver:
+    """
+    Resolves document ids or codes with a single indexed query and caches the
+    result for the rest of the request, keyed by both ObjectId and code.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._cache: Dict[str, Document] = {}
+
+    async def get(self, document_id: str) -> Optional[Document]:
+        cached = self._cache.get(document_id)
+        if cached is not None:
+            return cached
+        record = await self.db.documents.find_one(document_lookup_filter(document_id))
+        if record is None:
+            return None
+        document = Document(record)
+        self._cache[document.id] = document
+        if document.document_code:
+            self._cache[document.document_code] = document
+        return document
+
+    async def require(self, document_id: str) -> Document:
+        """Like get, but raises 404 when there is no such document"""
+        document = await self.get(document_id)
+        if document is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Document not found"
+            )
+        return document
+
+    def invalidate(self, document: Optional[Document] = None):
+        """Drop cached records after a write so later lookups in the request re-read them"""
+        if document is None:
+            self._cache.clear()
+            return
+        self._cache.pop(document.id, None)
+        self._cache.pop(document.document_code, None)
+
+def get_document_resolver(db=Depends(get_database)) -> DocumentResolver:
+    # FastAPI caches dependencies per request, so every use within a request shares one resolver
+    return DocumentResolver(db)
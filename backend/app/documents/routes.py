@@ -1,25 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, Form, UploadFile
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, File, Form, UploadFile, Query, Response
 from fastapi.responses import FileResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List, Optional
-from app.documents.models import DocumentCreate, DocumentResponse, DocumentInDB, JoinDocumentRequest, InitiateAgreementRequest
+from typing import Dict, List, Optional
+from app.documents.models import DocumentCreate, DocumentResponse, DocumentSummary, DocumentInDB, JoinDocumentRequest, InitiateAgreementRequest, FileVerificationRequest, BulkParticipantsRequest
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_filter, next_cursor
 from app.auth.utils import verify_token
 from app.database import get_database
-from app.utils.file_handler import save_uploaded_file
-from app.utils.ai_forgery import check_document_authenticity
-from app.utils.blockchain import add_to_blockchain
+from app.utils.file_handler import save_uploaded_file, save_uploaded_file_with_digest, verify_file_digests, digest_entries
+from app.documents.verification import verification_queue
+from app.documents.resolver import DocumentResolver, get_document_resolver
+from app.documents.counters import document_counters
+from app.documents.pricing import pricing_service
+from app.documents.state_machine import approve_participant, approve_participants, participant_removal, record_event, transition
+from app.utils.biometrics import check_verification_images
+from app.utils.face_index import face_index
+from app.utils.signatures import compare_signature
+from app.utils.image_hashing import image_hash_index
+from app.utils.blockchain import verify_blockchain_integrity, start_full_audit, blockchain
+from app.utils.anchoring import anchor_service, compute_document_digest, verify_document_anchor
 from app.config import settings
 from bson import ObjectId
 from datetime import datetime, timezone
 import os
+import hashlib
 from app.documents.models import PricingConfig, PricingConfigCreate, PricingConfigUpdate
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # Optional heavy deps are imported lazily inside endpoints
 
 documents_router = APIRouter()
 security = HTTPBearer()
 
+# Keyset sort for document listings; the cursor encodes these fields of the last document on a page
+MY_DOCUMENTS_SORT = [("updated_at", -1), ("_id", -1)]
+
+async def resolve_participants(db, request: BulkParticipantsRequest) -> List[tuple]:
+    """
+    Look up every requested participant with one $in query. Returns
+    (requested id, user or None) pairs in request order, without duplicates.
+    """
+    if not request.char_ids and not request.user_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide at least one char_id or user_id"
+        )
+    users = await db.users.find(
+        {"$or": [{"char_id": {"$in": request.char_ids}}, {"user_id": {"$in": request.user_ids}}]},
+        {"_id": 0, "user_id": 1, "char_id": 1, "name": 1}
+    ).to_list(length=None)
+    by_char_id = {user["char_id"]: user for user in users}
+    by_user_id = {user["user_id"]: user for user in users}
+    resolved = [(char_id, by_char_id.get(char_id)) for char_id in dict.fromkeys(request.char_ids)]
+    resolved += [(user_id, by_user_id.get(user_id)) for user_id in dict.fromkeys(request.user_ids)]
+    return resolved
+
+def participant_result(requested: str, user: Optional[dict], result: str) -> dict:
+    entry = {"requested": requested, "result": result}
+    if user:
+        entry.update({"user_id": user["user_id"], "char_id": user["char_id"], "name": user["name"]})
+    return entry
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_database)):
     user_id = verify_token(credentials.credentials)
     user = await db.users.find_one({"user_id": user_id})
@@ -30,6 +73,73 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     return user
 
+def signature_references(user: dict) -> List[dict]:
+    """The user's previous signatures ({path, digest}), falling back to the profile signature"""
+    references = [{"path": entry["path"], "digest": entry.get("digest")} for entry in user.get("signature_history", [])]
+    if not references and user.get("signature_pic"):
+        references = [{"path": user["signature_pic"], "digest": None}]
+    return references
+
+async def record_signature(db, user_id: str, signature_path: str, digest: Optional[str] = None):
+    """Keep the most recent accepted signatures, with their content digests, as references for the next comparison"""
+    await db.users.update_one(
+        {"user_id": user_id},
+        {"$push": {"signature_history": {
+            "$each": [{"path": signature_path, "digest": digest, "added_at": datetime.now(timezone.utc)}],
+            "$slice": -settings.signature_history_size
+        }}}
+    )
+
+async def run_biometric_checks(
+    user: dict,
+    profile_pic_path: Optional[str],
+    eye_path: Optional[str],
+    signature_path: Optional[str] = None,
+    signature_digest: Optional[str] = None
+) -> dict:
+    """
+    Face/eye detection on freshly uploaded verification images, plus advisory 1:1
+    scores of the selfie against the user's enrolled face and of the signature
+    against the user's previous signatures. Raises 400 when a detection fails.
+    """
+    if not settings.biometric_checks_enabled:
+        return {}
+    check = await check_verification_images(profile_pic_path, eye_path)
+    errors = list(check["errors"])
+    results = check["results"]
+    
+    if check["embedding"] is not None:
+        # Advisory only: the LBP embedding is not calibrated to tell people apart,
+        # so a low score is recorded for review but never rejects the request
+        score = face_index.similarity(user["user_id"], check["embedding"])
+        results["face_match"] = {
+            "enrolled": score is not None,
+            "score": score,
+            "advisory": True,
+            "below_threshold": score is not None and score < settings.face_match_threshold
+        }
+    
+    if signature_path:
+        references = signature_references(user)
+        # Advisory like face_match: the signature features are not calibrated to tell
+        # signers apart, so a low score is recorded for review but never rejects
+        signature_check = await compare_signature(
+            signature_path,
+            [reference["path"] for reference in references],
+            [reference["digest"] for reference in references],
+            signature_digest
+        )
+        results["signature_match"] = signature_check
+        if not signature_check["strokes_found"]:
+            errors.append("No signature strokes found")
+    
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Biometric verification failed: {', '.join(errors)}"
+        )
+    return results
+
 @documents_router.post("/create", response_model=dict, 
                        summary="Create Document with Verification",
                        description="Create a new document with required verification documents",
@@ -60,21 +170,7 @@ async def create_document(
     
     All verification documents are collected fresh for each document operation.
     """
-    print(f"=== Document Creation Request ===")
-    print(f"Current User: {current_user['user_id']}")
-    
-    # Use the parameters directly from FastAPI
-    print(f"=== Received Parameters ===")
-    print(f"Name: {name}")
-    print(f"Location: {location}")
-    print(f"Start Date: {start_date}")
-    print(f"End Date: {end_date}")
-    print(f"Raw Documents Count: {len(raw_documents)}")
-    print(f"Verification Documents:")
-    print(f"  - Profile Pic: {profile_pic.filename if profile_pic else 'None'}")
-    print(f"  - Thumb: {thumb.filename if thumb else 'None'}")
-    print(f"  - Sign: {sign.filename if sign else 'None'}")
-    print(f"  - Eye: {eye.filename if eye else 'None'}")
+    logger.debug("Creating document with %d files for user %s", len(raw_documents or []), current_user["user_id"])
     
     # Validate required fields
     if not name:
@@ -105,9 +201,6 @@ async def create_document(
             detail=f"Verification documents required: {', '.join(verification_errors)}"
         )
     
-    for i, file in enumerate(raw_documents):
-        print(f"File {i+1}: {file.filename}, Content-Type: {file.content_type}, Size: {file.size if hasattr(file, 'size') else 'unknown'}")
-    
     # Parse dates if provided
     parsed_start_date = None
     parsed_end_date = None
@@ -117,9 +210,8 @@ async def create_document(
     if end_date:
         parsed_end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
     
-    # Get current pricing configuration
-    pricing_config = await db.pricing_config.find_one({"is_active": True})
-    daily_rate = pricing_config.get("daily_rate", 1.0) if pricing_config else 1.0
+    # Get current pricing configuration (held in memory, no database read)
+    daily_rate = pricing_service.daily_rate
     
     # Calculate total days and amount automatically
     total_days = 1  # Default to 1 day
@@ -128,18 +220,14 @@ async def create_document(
         # Calculate the difference in days
         date_diff = parsed_end_date - parsed_start_date
         total_days = max(1, date_diff.days + 1)  # +1 to include both start and end dates
-    elif parsed_start_date or parsed_end_date:
-        # If only one date is provided, default to 1 day
-        print("Only one date provided, defaulting to 1 day")
-    else:
-        print("No dates provided, defaulting to 1 day")
+    # If one or no date is provided, default to 1 day
     
     # Calculate total amount based on daily rate
     total_amount = daily_rate * total_days
-    print(f"Calculated: {total_days} days × {daily_rate} coins/day = {total_amount} coins")
     
     # Save verification documents
     verification_files = {}
+    verification_digests = {}
     verification_upload_dirs = {
         'profile_pic': 'profile_pics',
         'thumb': 'fingerprints',
@@ -151,74 +239,74 @@ async def create_document(
                         ('sign', sign), ('eye', eye)]:
         if file:
             try:
-                filename = await save_uploaded_file(file, verification_upload_dirs[field])
+                filename, digest = await save_uploaded_file_with_digest(file, verification_upload_dirs[field])
                 verification_files[field] = f"/uploads/{verification_upload_dirs[field]}/{filename}"
-                print(f"Saved {field}: {filename}")
+                verification_digests[field] = digest
             except Exception as e:
-                print(f"Error saving {field}: {e}")
+                logger.warning("Error saving %s: %s", field, e)
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Error saving {field}: {str(e)}"
                 )
     
-    # Save uploaded documents
-    print(f"Processing {len(raw_documents)} uploaded files")
+    # Make sure the selfie shows a face, the eye scan an eye and the signature has strokes
+    biometric_results = await run_biometric_checks(
+        current_user,
+        verification_files.get("profile_pic"),
+        verification_files.get("eye"),
+        verification_files.get("sign"),
+        verification_digests.get("sign")
+    )
+    
+    # Flag images already submitted by other accounts
+    await image_hash_index.register_many(current_user["user_id"], {
+        "profile_pic": verification_files.get("profile_pic"),
+        "fingerprint": verification_files.get("thumb"),
+        "signature": verification_files.get("sign"),
+        "eye_scan": verification_files.get("eye")
+    })
     
-    # Check and create upload directory
+    # Save uploaded documents
     upload_dir = os.path.join(settings.upload_dir, "documents")
-    print(f"Upload directory: {upload_dir}")
-    print(f"Absolute upload directory: {os.path.abspath(upload_dir)}")
     
     # Create directory if it doesn't exist
     try:
         os.makedirs(upload_dir, exist_ok=True)
-        print(f"Upload directory created/exists: {upload_dir}")
-        print(f"Upload directory is writable: {os.access(upload_dir, os.W_OK)}")
     except Exception as e:
-        print(f"Error creating upload directory: {e}")
+        logger.error("Error creating upload directory %s: %s", upload_dir, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating upload directory: {str(e)}"
         )
     
     uploaded_files = []
+    uploaded_file_digests = []
     for i, file in enumerate(raw_documents):
-        print(f"Processing file {i+1}: {file.filename}, size: {file.size if hasattr(file, 'size') else 'unknown'}")
         try:
-            # Save the file and get the filename
-            filename = await save_uploaded_file(file, "documents")
-            print(f"File saved with filename: {filename}")
+            # Save the file and get the filename; the content digest is computed while streaming
+            filename, digest = await save_uploaded_file_with_digest(file, "documents")
             
             # Create the file path for storage in database
             file_path = f"/uploads/documents/{filename}"
             uploaded_files.append(file_path)
-            print(f"File path for database: {file_path}")
+            uploaded_file_digests.append({"path": file_path, "digest": digest})
             
             # Verify file was actually saved
             full_file_path = os.path.join(upload_dir, filename)
-            print(f"Full file path on disk: {full_file_path}")
-            print(f"File exists after save: {os.path.exists(full_file_path)}")
             if os.path.exists(full_file_path):
                 file_size = os.path.getsize(full_file_path)
-                print(f"File size on disk: {file_size} bytes")
                 
                 # Verify file is not empty
                 if file_size == 0:
-                    print(f"WARNING: File {filename} is empty (0 bytes)")
                     raise Exception(f"File {filename} is empty after save")
                     
         except Exception as e:
-            print(f"Error saving file {file.filename}: {e}")
-            print(f"Error type: {type(e)}")
-            print(f"Error details: {str(e)}")
+            logger.warning("Error saving document file %d: %s", i + 1, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error saving file {file.filename}: {str(e)}"
             )
     
-    print(f"Total uploaded files: {len(uploaded_files)}")
-    print(f"Uploaded files list: {uploaded_files}")
-    
     # Verify we have files to store
     if not uploaded_files:
         raise HTTPException(
@@ -242,6 +330,7 @@ async def create_document(
         involved_users=[current_user["user_id"]],
         primary_user=current_user["user_id"],
         upload_raw_docs=uploaded_files,
+        upload_raw_docs_digests=uploaded_file_digests,
         final_docs=[],
         datetime=current_time,
         name=name,
@@ -259,28 +348,24 @@ async def create_document(
         payment_status="pending",
         # Initialize user approval tracking
         user_approvals=user_approvals,
+        approved_count=1,
+        required_count=1,
         # Store verification documents for this specific document operation
         verification_documents=verification_files,
+        biometric_checks={current_user["user_id"]: biometric_results},
         created_at=current_time,
         updated_at=current_time
     )
     
-    print(f"Document object created with upload_raw_docs: {document.upload_raw_docs}")
-    print(f"Document dict: {document.dict()}")
-    
     try:
         document_dict = document.dict()
-        print(f"Inserting document with upload_raw_docs: {document_dict.get('upload_raw_docs', [])}")
         
         result = await db.documents.insert_one(document_dict)
-        print(f"Document created successfully with ID: {result.inserted_id}")
-        
-        # Verify the document was saved correctly
-        saved_document = await db.documents.find_one({"_id": result.inserted_id})
-        if saved_document:
-            print(f"Saved document upload_raw_docs: {saved_document.get('upload_raw_docs', [])}")
-        else:
-            print("Could not retrieve saved document")
+        await document_counters.record_change(None, document_dict)
+        await record_event(document_dict, "create", current_user["user_id"], None)
+        logger.info("Document %s created with %d files", result.inserted_id, len(uploaded_files))
+        if verification_files.get("sign"):
+            await record_signature(db, current_user["user_id"], verification_files["sign"], verification_digests["sign"])
         
         return {
             "message": "Document created successfully",
@@ -288,7 +373,7 @@ async def create_document(
             "document_code": document.document_code
         }
     except Exception as e:
-        print(f"Error creating document: {e}")
+        logger.exception("Error creating document")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating document: {str(e)}"
@@ -321,14 +406,7 @@ async def join_document(
     
     All verification documents are collected fresh for each document operation.
     """
-    print(f"=== Document Join Request ===")
-    print(f"Document Code: {document_code}")
-    print(f"Current User: {current_user['user_id']}")
-    print(f"Verification Documents:")
-    print(f"  - Profile Pic: {profile_pic.filename if profile_pic else 'None'}")
-    print(f"  - Thumb: {thumb.filename if thumb else 'None'}")
-    print(f"  - Sign: {sign.filename if sign else 'None'}")
-    print(f"  - Eye: {eye.filename if eye else 'None'}")
+    logger.debug("Joining document %s by user %s", document_code, current_user["user_id"])
     
     # Validate verification documents (thumb is now optional)
     verification_errors = []
@@ -363,6 +441,7 @@ async def join_document(
     
     # Save verification documents
     verification_files = {}
+    verification_digests = {}
     verification_upload_dirs = {
         'profile_pic': 'profile_pics',
         'thumb': 'fingerprints',
@@ -374,33 +453,58 @@ async def join_document(
                         ('sign', sign), ('eye', eye)]:
         if file:
             try:
-                filename = await save_uploaded_file(file, verification_upload_dirs[field])
+                filename, digest = await save_uploaded_file_with_digest(file, verification_upload_dirs[field])
                 verification_files[field] = f"/uploads/{verification_upload_dirs[field]}/{filename}"
-                print(f"Saved {field}: {filename}")
+                verification_digests[field] = digest
             except Exception as e:
-                print(f"Error saving {field}: {e}")
+                logger.warning("Error saving %s: %s", field, e)
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Error saving {field}: {str(e)}"
                 )
     
-    # Add user to involved_users (pending approval) with verification documents
-    await db.documents.update_one(
-        {"_id": document["_id"]},
+    # Make sure the selfie shows a face, the eye scan an eye and the signature has strokes
+    biometric_results = await run_biometric_checks(
+        current_user,
+        verification_files.get("profile_pic"),
+        verification_files.get("eye"),
+        verification_files.get("sign"),
+        verification_digests.get("sign")
+    )
+    
+    # Flag images already submitted by other accounts
+    await image_hash_index.register_many(current_user["user_id"], {
+        "profile_pic": verification_files.get("profile_pic"),
+        "fingerprint": verification_files.get("thumb"),
+        "signature": verification_files.get("sign"),
+        "eye_scan": verification_files.get("eye")
+    })
+    
+    # Add user to involved_users (pending approval) with verification documents;
+    # the document now needs approval from every participant
+    await transition(
+        document["_id"],
+        "join",
+        current_user["user_id"],
         {
             "$addToSet": {"involved_users": current_user["user_id"]},
+            "$inc": {"required_count": 1},
             "$set": {
-                "updated_at": datetime.now(timezone.utc), 
-                "status": "pending_approval",  # Document now needs approval from both users
                 f"verification_documents.{current_user['user_id']}": verification_files,
+                f"biometric_checks.{current_user['user_id']}": biometric_results,
                 f"user_approvals.{current_user['user_id']}": {
                     "approved": False,
                     "approved_at": None,
                     "is_primary": False
                 }
             }
-        }
+        },
+        conditions={"involved_users": {"$ne": current_user["user_id"]}},
+        conflict_detail="You are already part of this document",
+        details={"user_id": current_user["user_id"]}
     )
+    if verification_files.get("sign"):
+        await record_signature(db, current_user["user_id"], verification_files["sign"], verification_digests["sign"])
     
     return {"message": "Join request sent successfully"}
 
@@ -409,64 +513,25 @@ async def approve_user_join(
     document_id: str,
     user_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
-    print(f"=== Approve User Join Request ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"User ID to approve: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    # Check if document_id is a valid ObjectId
-    try:
-        if ObjectId.is_valid(document_id):
-            print(f"Searching by ObjectId: {document_id}")
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-            if document:
-                print(f"Found document by ObjectId: {document.get('_id')}")
-        else:
-            print(f"Not a valid ObjectId, searching by document_code: {document_id}")
-    except Exception as e:
-        print(f"Error checking ObjectId validity: {e}")
-        pass
-    
-    # If not found by ObjectId, try to find by document_code
-    if not document:
-        print(f"Searching by document_code: {document_id}")
-        document = await db.documents.find_one({"document_code": document_id})
-        if document:
-            print(f"Found document by document_code: {document.get('document_code')}")
-    
-    if not document:
-        print(f"Document not found with ID/code: {document_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    logger.debug("Approving user %s on document %s by user %s", user_id, document_id, current_user["user_id"])
     
-    print(f"Found document: {document.get('_id')} with code: {document.get('document_code')}")
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     if document["primary_user"] != current_user["user_id"]:
-        print(f"Access denied: {current_user['user_id']} is not primary user")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only primary user can approve join requests"
         )
     
-    print(f"User {current_user['user_id']} is primary user, proceeding with approval")
-    
-    # Update document status - use the actual document _id from the found document
-    document_object_id = document["_id"]
-    print(f"Updating document with ObjectId: {document_object_id}")
-    
-    await db.documents.update_one(
-        {"_id": document_object_id},
-        {"$set": {"updated_at": datetime.now(timezone.utc), "status": "approved"}}
-    )
+    # Update document status - the transition only applies while approval is still pending;
+    # approving an already approved document again is a no-op so client retries succeed
+    await transition(document["_id"], "approve", current_user["user_id"], details={"user_id": user_id}, repeatable=True)
     
-    print(f"Successfully approved user {user_id} for document {document_id}")
+    logger.info("Document %s approved by user %s", document_id, current_user["user_id"])
     return {"message": "User approved successfully"}
 
 # User Management Endpoints - Simple Add/Remove/Approve
@@ -475,36 +540,14 @@ async def add_user_to_document(
     document_id: str,
     target_user_char_id: str = Form(...),
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Add a user to a document (Primary user only) - Can add users anytime after creation"""
-    print(f"=== Add User to Document ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Target User Char ID: {target_user_char_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Adding user %s to document %s by user %s", target_user_char_id, document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    # Block edits after finalization
-    if document.get("status") == "finalized" or document.get("is_locked"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Document is finalized and cannot be edited"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -521,20 +564,16 @@ async def add_user_to_document(
             detail="Target user not found"
         )
     
-    # Check if user is already involved
-    if target_user["user_id"] in document["involved_users"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is already part of this document"
-        )
-    
-    # Add user to involved_users (automatically approved - no pending state)
-    await db.documents.update_one(
-        {"_id": document["_id"]},
-        {
-            "$addToSet": {"involved_users": target_user["user_id"]},
-            "$set": {"updated_at": datetime.now(timezone.utc)}
-        }
+    # Add user to involved_users (automatically approved - no pending state); edits are
+    # refused once the document is finalized
+    await transition(
+        document["_id"],
+        "add_participant",
+        current_user["user_id"],
+        {"$addToSet": {"involved_users": target_user["user_id"]}},
+        conditions={"involved_users": {"$ne": target_user["user_id"]}},
+        conflict_detail="User is already part of this document",
+        details={"user_id": target_user["user_id"]}
     )
     
     return {
@@ -551,36 +590,14 @@ async def approve_user_join(
     document_id: str,
     user_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Approve a user's join request (Primary user only)"""
-    print(f"=== Approve User Join Request ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"User ID to approve: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Approving user %s on document %s by user %s", user_id, document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    # Block edits after finalization
-    if document.get("status") == "finalized" or document.get("is_locked"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Document is finalized and cannot be edited"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -589,48 +606,13 @@ async def approve_user_join(
             detail="Only primary user can approve join requests"
         )
     
-    # Check if user is in involved_users
-    if user_id not in document["involved_users"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is not in the document's involved users list"
-        )
-    
-    # Update user approval status
-    await db.documents.update_one(
-        {"_id": document["_id"]},
-        {
-            "$set": {
-                f"user_approvals.{user_id}.approved": True,
-                f"user_approvals.{user_id}.approved_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
-            }
-        }
-    )
-    
-    # Check if all users have approved
-    updated_document = await db.documents.find_one({"_id": document["_id"]})
-    user_approvals = updated_document.get("user_approvals", {})
-    
-    all_approved = all(
-        approval.get("approved", False) 
-        for approval in user_approvals.values()
-    )
+    # Record the approval; the same update moves the document to approved (enabling
+    # payment) once approved_count reaches required_count
+    updated_document = await approve_participant(document["_id"], user_id, current_user["user_id"])
+    all_approved = updated_document["approved_count"] >= updated_document["required_count"]
     
     if all_approved:
-        # All users approved, change status to approved and enable payment
-        await db.documents.update_one(
-            {"_id": document["_id"]},
-            {
-                "$set": {
-                    "status": "approved",
-                    "updated_at": datetime.now(timezone.utc)
-                }
-            }
-        )
-        print(f"All users approved for document {document_id}, status changed to approved")
-    else:
-        print(f"User {user_id} approved, but waiting for other users. Current status: {updated_document.get('status')}")
+        logger.info("All users approved for document %s, status is %s", document_id, updated_document.status)
     
     # Get user details for response
     user = await db.users.find_one({"user_id": user_id})
@@ -638,8 +620,10 @@ async def approve_user_join(
     
     return {
         "message": f"User {user_name} approved successfully",
-        "document_status": "approved" if all_approved else "pending_approval",
-        "all_users_approved": all_approved
+        "document_status": updated_document.status,
+        "all_users_approved": all_approved,
+        "approved_count": updated_document["approved_count"],
+        "required_count": updated_document["required_count"]
     }
 
 @documents_router.delete("/{document_id}/remove-user/{user_id}")
@@ -647,36 +631,14 @@ async def remove_user_from_document(
     document_id: str,
     user_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Remove a user from a document (Primary user only) - Can remove from pending or approved"""
-    print(f"=== Remove User from Document ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"User ID to remove: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Removing user %s from document %s by user %s", user_id, document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    # Block edits after finalization
-    if document.get("status") == "finalized" or document.get("is_locked"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Document is finalized and cannot be edited"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -692,20 +654,16 @@ async def remove_user_from_document(
             detail="Cannot remove the primary user from the document"
         )
     
-    # Check if user is in involved_users
-    if user_id not in document["involved_users"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is not in the document's involved users list"
-        )
-    
     # Remove user from involved_users (works for both pending and approved users)
-    await db.documents.update_one(
-        {"_id": document["_id"]},
-        {
-            "$pull": {"involved_users": user_id},
-            "$set": {"updated_at": datetime.now(timezone.utc)}
-        }
+    update, conditions = participant_removal(document, [user_id])
+    await transition(
+        document["_id"],
+        "remove_participant",
+        current_user["user_id"],
+        update,
+        conditions=conditions,
+        conflict_detail="User is not in the document's involved users list",
+        details={"user_id": user_id}
     )
     
     # Get user details for response
@@ -721,30 +679,14 @@ async def invite_user_to_document(
     document_id: str,
     target_user_char_id: str = Form(...),
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Invite a user to join a document (Primary user only)"""
-    print(f"=== Invite User to Document ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Target User Char ID: {target_user_char_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Inviting user %s to document %s by user %s", target_user_char_id, document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -761,20 +703,15 @@ async def invite_user_to_document(
             detail="Target user not found"
         )
     
-    # Check if user is already involved
-    if target_user["user_id"] in document["involved_users"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is already part of this document"
-        )
-    
     # Add user to involved_users (pending approval)
-    await db.documents.update_one(
-        {"_id": document["_id"]},
-        {
-            "$addToSet": {"involved_users": target_user["user_id"]},
-            "$set": {"updated_at": datetime.now(timezone.utc)}
-        }
+    await transition(
+        document["_id"],
+        "invite_participant",
+        current_user["user_id"],
+        {"$addToSet": {"involved_users": target_user["user_id"]}},
+        conditions={"involved_users": {"$ne": target_user["user_id"]}},
+        conflict_detail="User is already part of this document",
+        details={"user_id": target_user["user_id"]}
     )
     
     return {
@@ -790,29 +727,14 @@ async def invite_user_to_document(
 async def get_pending_users(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Get list of users who joined but need approval (Primary user only)"""
-    print(f"=== Get Pending Users ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Listing pending users of document %s for user %s", document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -847,30 +769,14 @@ async def reject_user_join(
     document_id: str,
     user_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Reject a user's join request (Primary user only)"""
-    print(f"=== Reject User Join Request ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"User ID to reject: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Rejecting user %s on document %s by user %s", user_id, document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -879,20 +785,16 @@ async def reject_user_join(
             detail="Only primary user can reject join requests"
         )
     
-    # Check if user is in involved_users
-    if user_id not in document["involved_users"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is not in the document's involved users list"
-        )
-    
     # Remove user from involved_users
-    await db.documents.update_one(
-        {"_id": document["_id"]},
-        {
-            "$pull": {"involved_users": user_id},
-            "$set": {"updated_at": datetime.now(timezone.utc)}
-        }
+    update, conditions = participant_removal(document, [user_id])
+    await transition(
+        document["_id"],
+        "reject_participant",
+        current_user["user_id"],
+        update,
+        conditions=conditions,
+        conflict_detail="User is not in the document's involved users list",
+        details={"user_id": user_id}
     )
     
     # Get user details for response
@@ -909,30 +811,14 @@ async def remove_user_from_document(
     document_id: str,
     user_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Remove a user from a document (Primary user only)"""
-    print(f"=== Remove User from Document ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"User ID to remove: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Removing user %s from document %s by user %s", user_id, document_id, current_user["user_id"])
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -948,20 +834,16 @@ async def remove_user_from_document(
             detail="Cannot remove the primary user from the document"
         )
     
-    # Check if user is in involved_users
-    if user_id not in document["involved_users"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is not in the document's involved users list"
-        )
-    
     # Remove user from involved_users
-    await db.documents.update_one(
-        {"_id": document["_id"]},
-        {
-            "$pull": {"involved_users": user_id},
-            "$set": {"updated_at": datetime.now(timezone.utc)}
-        }
+    update, conditions = participant_removal(document, [user_id])
+    await transition(
+        document["_id"],
+        "remove_participant",
+        current_user["user_id"],
+        update,
+        conditions=conditions,
+        conflict_detail="User is not in the document's involved users list",
+        details={"user_id": user_id}
     )
     
     # Get user details for response
@@ -973,55 +855,282 @@ async def remove_user_from_document(
         "document_status": "updated"
     }
 
-@documents_router.get("/my-documents", response_model=List[DocumentResponse])
-async def get_my_documents(current_user=Depends(get_current_user), db=Depends(get_database)):
+# Bulk participant endpoints - one lookup, one $in query and one conditional update per request
+async def add_participants(document_id: str, request: BulkParticipantsRequest, action: str, current_user: dict, db, documents: DocumentResolver) -> dict:
+    verb = "invited" if action == "invite_participant" else "added"
+    document = await documents.require(document_id)
+    
+    # Check if current user is primary user
+    if document["primary_user"] != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Only primary user can {'invite' if verb == 'invited' else 'add'} users"
+        )
+    
+    results = []
+    to_add = []
+    for requested, user in await resolve_participants(db, request):
+        if user is None:
+            results.append(participant_result(requested, None, "not_found"))
+        elif user["user_id"] in document.involved_users or user["user_id"] in to_add:
+            results.append(participant_result(requested, user, "already_participant"))
+        else:
+            to_add.append(user["user_id"])
+            results.append(participant_result(requested, user, verb))
+    
+    # $addToSet is idempotent, so the batch needs no precondition beyond the document status
+    document_status = document.status
+    if to_add:
+        updated_document = await transition(
+            document["_id"],
+            action,
+            current_user["user_id"],
+            {"$addToSet": {"involved_users": {"$each": to_add}}},
+            details={"user_ids": to_add}
+        )
+        document_status = updated_document.status
+    
+    return {
+        "message": f"{len(to_add)} of {len(results)} users {verb}",
+        "document_status": document_status,
+        "results": results
+    }
+
+@documents_router.post("/{document_id}/add-users")
+async def add_users_to_document(
+    document_id: str,
+    request: BulkParticipantsRequest,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Add several users to a document at once (Primary user only)"""
+    return await add_participants(document_id, request, "add_participant", current_user, db, documents)
+
+@documents_router.post("/{document_id}/invite-users")
+async def invite_users_to_document(
+    document_id: str,
+    request: BulkParticipantsRequest,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Invite several users to join a document at once (Primary user only)"""
+    return await add_participants(document_id, request, "invite_participant", current_user, db, documents)
+
+@documents_router.put("/{document_id}/approve-users")
+async def approve_users_join(
+    document_id: str,
+    request: BulkParticipantsRequest,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Approve several users' join requests in one update (Primary user only)"""
+    document = await documents.require(document_id)
+    
+    # Check if current user is primary user
+    if document["primary_user"] != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only primary user can approve join requests"
+        )
+    
+    user_approvals = document.get("user_approvals", {})
+    results = []
+    to_approve = []
+    for requested, user in await resolve_participants(db, request):
+        if user is None:
+            results.append(participant_result(requested, None, "not_found"))
+        elif user["user_id"] not in document.involved_users:
+            results.append(participant_result(requested, user, "not_participant"))
+        elif (user_approvals.get(user["user_id"]) or {}).get("approved") or user["user_id"] in to_approve:
+            results.append(participant_result(requested, user, "already_approved"))
+        else:
+            to_approve.append(user["user_id"])
+            results.append(participant_result(requested, user, "approved"))
+    
+    if not to_approve:
+        return {
+            "message": "No users to approve",
+            "document_status": document.status,
+            "all_users_approved": document.get("approved_count", 0) >= document.get("required_count", 0),
+            "results": results
+        }
+    
+    updated_document = await approve_participants(document["_id"], to_approve, current_user["user_id"])
+    return {
+        "message": f"{len(to_approve)} users approved successfully",
+        "document_status": updated_document.status,
+        "all_users_approved": updated_document["approved_count"] >= updated_document["required_count"],
+        "approved_count": updated_document["approved_count"],
+        "required_count": updated_document["required_count"],
+        "results": results
+    }
+
+@documents_router.post("/{document_id}/remove-users")
+async def remove_users_from_document(
+    document_id: str,
+    request: BulkParticipantsRequest,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Remove several users from a document in one update (Primary user only)"""
+    document = await documents.require(document_id)
+    
+    # Check if current user is primary user
+    if document["primary_user"] != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only primary user can remove users"
+        )
+    
+    results = []
+    to_remove = []
+    for requested, user in await resolve_participants(db, request):
+        if user is None:
+            results.append(participant_result(requested, None, "not_found"))
+        elif user["user_id"] == document["primary_user"]:
+            results.append(participant_result(requested, user, "primary_user"))
+        elif user["user_id"] not in document.involved_users or user["user_id"] in to_remove:
+            results.append(participant_result(requested, user, "not_participant"))
+        else:
+            to_remove.append(user["user_id"])
+            results.append(participant_result(requested, user, "removed"))
+    
+    document_status = document.status
+    if to_remove:
+        update, conditions = participant_removal(document, to_remove)
+        updated_document = await transition(
+            document["_id"],
+            "remove_participant",
+            current_user["user_id"],
+            update,
+            conditions=conditions,
+            conflict_detail="Participants changed while removing, please retry",
+            details={"user_ids": to_remove},
+            conflict_status=status.HTTP_409_CONFLICT
+        )
+        document_status = updated_document.status
+    
+    return {
+        "message": f"{len(to_remove)} of {len(results)} users removed from document",
+        "document_status": document_status,
+        "results": results
+    }
+
+@documents_router.get("/my-documents", response_model=List[DocumentSummary])
+async def get_my_documents(
+    response: Response,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    role: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """
+    Summaries of the documents the current user is involved in, most recently updated first
+    
+    Parameters:
+    - status: Comma-separated statuses to include (e.g. 'draft,pending_approval')
+    - role: 'primary' for documents the user created, 'participant' for the rest
+    - limit: Maximum number of documents to return (default: 100, max: 200)
+    - cursor: Continuation token from the X-Next-Cursor header of the previous page
+    """
+    if limit < 1 or limit > 200:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Limit must be between 1 and 200"
+        )
+    if role not in (None, "primary", "participant"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Role must be 'primary' or 'participant'"
+        )
+    
+    user_id = current_user["user_id"]
+    query_filter = {"involved_users": user_id}
+    if status_filter:
+        query_filter["status"] = {"$in": [value.strip() for value in status_filter.split(",") if value.strip()]}
+    if role == "primary":
+        query_filter["primary_user"] = user_id
+    elif role == "participant":
+        query_filter["primary_user"] = {"$ne": user_id}
+    if cursor:
+        # Keyset pagination on the (involved_users, updated_at, _id) index
+        query_filter.update(keyset_filter(MY_DOCUMENTS_SORT, decode_cursor(cursor, len(MY_DOCUMENTS_SORT))))
+    
     try:
-        print(f"Fetching documents for user: {current_user['user_id']}")
         documents = await db.documents.find(
-            {"involved_users": current_user["user_id"]}
-        ).to_list(None)
-        
-        print(f"Found {len(documents)} documents")
-        
-        result = []
-        for doc in documents:
-            try:
-                print(f"Processing document: {doc.get('_id', 'unknown')}")
-                # Ensure all required fields are present with defaults
-                doc_data = {
-                    "_id": str(doc["_id"]) if doc.get("_id") else "",
-                    "involved_users": doc.get("involved_users", []),
-                    "primary_user": doc.get("primary_user", ""),
-                    "upload_raw_docs": doc.get("upload_raw_docs", []),
-                    "final_docs": doc.get("final_docs", []),
-                    "datetime": doc.get("datetime", datetime.now(timezone.utc)),
-                    "location": doc.get("location"),
-                    "start_date": doc.get("start_date"),
-                    "end_date": doc.get("end_date"),
-                    "name": doc.get("name", ""),
-                    "document_code": doc.get("document_code", ""),
-                    "ai_forgery_check": doc.get("ai_forgery_check", False),
-                    "blockchain": doc.get("blockchain", False),
-                    "status": doc.get("status", "draft"),
-                    "is_active": doc.get("is_active", True),
-                    "is_primary": doc.get("is_primary", False),
-                    "created_at": doc.get("created_at", datetime.now(timezone.utc)),
-                    "updated_at": doc.get("updated_at", datetime.now(timezone.utc))
-                }
-                result.append(DocumentResponse(**doc_data))
-                print(f"Successfully processed document: {doc.get('_id', 'unknown')}")
-            except Exception as e:
-                print(f"Error processing document {doc.get('_id', 'unknown')}: {e}")
-                continue
-        
-        print(f"Returning {len(result)} processed documents")
-        return result
+            query_filter,
+            {
+                "name": 1,
+                "document_code": 1,
+                "status": 1,
+                "primary_user": 1,
+                "involved_users": 1,
+                "location": 1,
+                "start_date": 1,
+                "end_date": 1,
+                "total_amount": 1,
+                "payment_status": 1,
+                "created_at": 1,
+                "updated_at": 1
+            }
+        ).sort(MY_DOCUMENTS_SORT).limit(limit).to_list(None)
     except Exception as e:
-        print(f"Error in get_my_documents: {e}")
+        logger.exception("Error listing documents")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching documents: {str(e)}"
         )
+    
+    next_page = next_cursor(documents, limit, MY_DOCUMENTS_SORT)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+    
+    summaries = []
+    for doc in documents:
+        # Legacy documents may lack timestamps; the ObjectId records when they were inserted
+        created_at = doc.get("created_at") or doc["_id"].generation_time
+        summaries.append(DocumentSummary(
+            _id=str(doc["_id"]),
+            name=doc.get("name", ""),
+            document_code=doc.get("document_code", ""),
+            status=doc.get("status", "draft"),
+            role="primary" if doc.get("primary_user") == user_id else "participant",
+            primary_user=doc.get("primary_user", ""),
+            involved_users=doc.get("involved_users", []),
+            location=doc.get("location"),
+            start_date=doc.get("start_date"),
+            end_date=doc.get("end_date"),
+            total_amount=doc.get("total_amount"),
+            payment_status=doc.get("payment_status", "pending"),
+            created_at=created_at,
+            updated_at=doc.get("updated_at") or created_at
+        ))
+    return summaries
+
+@documents_router.get("/dashboard")
+async def get_document_dashboard(current_user=Depends(get_current_user)):
+    """Document counts per dashboard bucket for the current user"""
+    return {
+        "user_id": current_user["user_id"],
+        "counts": await document_counters.get(current_user["user_id"])
+    }
+
+@documents_router.post("/dashboard/rebuild")
+async def rebuild_document_dashboard(current_user=Depends(get_current_user)):
+    """Recompute every user's dashboard counters from the documents collection (admin only)"""
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    started = document_counters.start_rebuild()
+    return {"message": "Rebuild started" if started else "Rebuild already running"}
 
 # Pricing Configuration Endpoints
 @documents_router.get("/pricing", response_model=PricingConfig)
@@ -1031,48 +1140,11 @@ async def get_pricing_config(
 ):
     """Get the current active pricing configuration"""
     try:
-        # Get the most recent active pricing config
-        pricing_config = await db.pricing_config.find_one(
-            {"is_active": True},
-            sort=[("created_at", -1)]
-        )
-        
-        if not pricing_config:
-            # Return default pricing if none exists
-            return PricingConfig(
-                daily_rate=1.0,
-                is_active=True,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            )
-        
-        # Add user tracking info if available
-        pricing_data = pricing_config.copy()
-        if "created_by" in pricing_data:
-            # Try to get user info for display
-            try:
-                created_user = await db.users.find_one({"user_id": pricing_data["created_by"]})
-                if created_user:
-                    pricing_data["created_by_name"] = created_user.get("name", "Unknown")
-                else:
-                    pricing_data["created_by_name"] = "Unknown"
-            except:
-                pricing_data["created_by_name"] = "Unknown"
-        
-        if "updated_by" in pricing_data:
-            try:
-                updated_user = await db.users.find_one({"user_id": pricing_data["updated_by"]})
-                if updated_user:
-                    pricing_data["updated_by_name"] = updated_user.get("name", "Unknown")
-                else:
-                    pricing_data["updated_by_name"] = "Unknown"
-            except:
-                pricing_data["updated_by_name"] = "Unknown"
-        
-        return PricingConfig(**pricing_data)
+        # Served from the in-memory pricing service; default pricing if none exists
+        return PricingConfig(**pricing_service.config)
         
     except Exception as e:
-        print(f"Error fetching pricing config: {e}")
+        logger.exception("Error fetching pricing config")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch pricing configuration"
@@ -1086,32 +1158,18 @@ async def create_pricing_config(
 ):
     """Create a new pricing configuration (Any authenticated user)"""
     try:
-        # Deactivate all existing pricing configs
-        await db.pricing_config.update_many(
-            {"is_active": True},
-            {"$set": {"is_active": False}}
-        )
-        
-        # Create new pricing config
-        current_time = datetime.now(timezone.utc)
-        new_pricing = {
-            "daily_rate": request.daily_rate,
-            "is_active": True,
-            "created_at": current_time,
-            "updated_at": current_time,
-            "created_by": current_user["user_id"]  # Track who created it
-        }
-        
-        result = await db.pricing_config.insert_one(new_pricing)
+        # Deactivates existing configs, creates the new one and refreshes the cache
+        new_pricing = await pricing_service.create(request.daily_rate, current_user["user_id"])
         
         return {
             "message": "Pricing configuration created successfully",
-            "pricing_id": str(result.inserted_id),
-            "daily_rate": request.daily_rate
+            "pricing_id": str(new_pricing["_id"]),
+            "daily_rate": request.daily_rate,
+            "version": new_pricing["version"]
         }
         
     except Exception as e:
-        print(f"Error creating pricing config: {e}")
+        logger.exception("Error creating pricing config")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create pricing configuration"
@@ -1125,8 +1183,8 @@ async def update_pricing_config(
 ):
     """Update the current active pricing configuration (Any authenticated user)"""
     try:
-        # Get current active pricing config
-        current_pricing = await db.pricing_config.find_one({"is_active": True})
+        # Update the current pricing config; the cache is refreshed immediately
+        current_pricing = await pricing_service.update(request.daily_rate, current_user["user_id"])
         
         if not current_pricing:
             raise HTTPException(
@@ -1134,68 +1192,112 @@ async def update_pricing_config(
                 detail="No active pricing configuration found"
             )
         
-        # Update the current pricing config
-        await db.pricing_config.update_one(
-            {"_id": current_pricing["_id"]},
-            {
-                "$set": {
-                    "daily_rate": request.daily_rate,
-                    "updated_at": datetime.now(timezone.utc),
-                    "updated_by": current_user["user_id"]  # Track who updated it
-                }
-            }
-        )
-        
         return {
             "message": "Pricing configuration updated successfully",
-            "daily_rate": request.daily_rate
+            "daily_rate": request.daily_rate,
+            "version": current_pricing.get("version", 0)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error updating pricing config: {e}")
+        logger.exception("Error updating pricing config")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update pricing configuration"
         )
 
+@documents_router.post("/verify-files")
+async def verify_document_files(
+    request: FileVerificationRequest,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Re-hash the stored files of many documents and compare them with the digests
+    recorded at upload time. Files are read with bounded parallelism.
+    """
+    object_ids = [ObjectId(doc_id) for doc_id in request.document_ids if ObjectId.is_valid(doc_id)]
+    documents = await db.documents.find(
+        {
+            "$or": [
+                {"_id": {"$in": object_ids}},
+                {"document_code": {"$in": request.document_ids}}
+            ],
+            "involved_users": current_user["user_id"]
+        },
+        {"document_code": 1, "final_docs_digests": 1, "upload_raw_docs_digests": 1}
+    ).to_list(None)
+    
+    expected = []
+    owners = {}
+    for document in documents:
+        entries = digest_entries(document.get("final_docs_digests"))
+        if request.include_raw:
+            entries += digest_entries(document.get("upload_raw_docs_digests"))
+        for entry in entries:
+            if entry["path"] not in owners:
+                expected.append(entry)
+                owners[entry["path"]] = str(document["_id"])
+    
+    file_results = await verify_file_digests(expected, settings.file_verify_concurrency)
+    
+    results = {}
+    for document in documents:
+        results[str(document["_id"])] = {
+            "document_code": document.get("document_code", ""),
+            "files": {}
+        }
+    for path, result in file_results.items():
+        results[owners[path]]["files"][path] = result
+    for result in results.values():
+        result["verified"] = all(f["status"] == "ok" for f in result["files"].values())
+    
+    found = {str(d["_id"]) for d in documents} | {d.get("document_code") for d in documents}
+    return {
+        "documents": results,
+        "files_checked": len(file_results),
+        "not_found": [doc_id for doc_id in request.document_ids if doc_id not in found]
+    }
+
+@documents_router.get("/blockchain/integrity")
+async def get_blockchain_integrity(
+    full: bool = False,
+    current_user=Depends(get_current_user)
+):
+    """
+    Verify the document blockchain.
+
+    By default only blocks appended after the last signed checkpoint are re-hashed.
+    Pass full=true to schedule a complete audit in a background worker (admin only);
+    its report is returned as last_audit on subsequent calls.
+    """
+    if full:
+        if not current_user.get("is_admin"):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        scheduled = start_full_audit()
+        return {
+            "message": "Full audit scheduled" if scheduled else "Full audit already running",
+            "audit_scheduled": scheduled,
+            "last_audit": blockchain.last_audit
+        }
+
+    report = await verify_blockchain_integrity()
+    report["last_audit"] = blockchain.last_audit
+    return report
+
 @documents_router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
-    print(f"Getting document with ID/code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    # Check if document_id is a valid ObjectId
-    try:
-        if ObjectId.is_valid(document_id):
-            print(f"Searching by ObjectId: {document_id}")
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-            if document:
-                print(f"Found document by ObjectId: {document.get('_id')}")
-        else:
-            print(f"Not a valid ObjectId, searching by document_code: {document_id}")
-    except Exception as e:
-        print(f"Error checking ObjectId validity: {e}")
-        pass
-    
-    # If not found by ObjectId, try to find by document_code
-    if not document:
-        print(f"Searching by document_code: {document_id}")
-        document = await db.documents.find_one({"document_code": document_id})
-        if document:
-            print(f"Found document by document_code: {document.get('document_code')}")
-    
-    if not document:
-        print(f"Document not found with ID/code: {document_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     # Check if user is involved in the document
     if current_user["user_id"] not in document["involved_users"]:
@@ -1205,7 +1307,6 @@ async def get_document(
         )
     
     try:
-        print(f"Processing document: {document.get('_id', 'unknown')}")
         # Ensure all required fields are present with defaults
         doc_data = {
             "_id": str(document["_id"]) if document.get("_id") else "",
@@ -1231,10 +1332,9 @@ async def get_document(
             "created_at": document.get("created_at", datetime.now(timezone.utc)),
             "updated_at": document.get("updated_at", datetime.now(timezone.utc))
         }
-        print(f"Successfully processed document data")
         return DocumentResponse(**doc_data)
     except Exception as e:
-        print(f"Error processing document {document_id}: {e}")
+        logger.exception("Error processing document %s", document_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing document: {str(e)}"
@@ -1245,55 +1345,22 @@ async def finalize_document(
     document_id: str,
     final_documents: Optional[List[UploadFile]] = File(None),
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
-    print(f"=== Finalize Document Request ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    # Check if document_id is a valid ObjectId
-    try:
-        if ObjectId.is_valid(document_id):
-            print(f"Searching by ObjectId: {document_id}")
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-            if document:
-                print(f"Found document by ObjectId: {document.get('_id')}")
-        else:
-            print(f"Not a valid ObjectId, searching by document_code: {document_id}")
-    except Exception as e:
-        print(f"Error checking ObjectId validity: {e}")
-        pass
+    logger.debug("Finalizing document %s by user %s", document_id, current_user["user_id"])
     
-    # If not found by ObjectId, try to find by document_code
-    if not document:
-        print(f"Searching by document_code: {document_id}")
-        document = await db.documents.find_one({"document_code": document_id})
-        if document:
-            print(f"Found document by document_code: {document.get('document_code')}")
-    
-    if not document:
-        print(f"Document not found with ID/code: {document_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    
-    print(f"Found document: {document.get('_id')} with code: {document.get('document_code')}")
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     if document["primary_user"] != current_user["user_id"]:
-        print(f"Access denied: {current_user['user_id']} is not primary user")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only primary user can finalize documents"
         )
     
-    print(f"User {current_user['user_id']} is primary user, proceeding with finalization")
     
     # Check payment status before finalization
-    print(f"Checking payment status for document {document_id}")
     
     # Check if document is approved by all users before allowing finalization
     if document.get("status") != "approved":
@@ -1332,49 +1399,57 @@ async def finalize_document(
             detail=f"Payment not completed. Remaining amount: ₹{remaining_amount:.2f}. Please complete all payments before finalizing."
         )
     
-    print(f"Payment verification successful. Total paid: ₹{total_paid:.2f}")
+    logger.debug("Payment verified for document %s, total paid %.2f", document_id, total_paid)
     
     # Save final documents if provided; otherwise auto-generate server-side
     final_files = []
+    final_file_digests = []
     if final_documents and len(final_documents) > 0:
         for file in final_documents:
-            filename = await save_uploaded_file(file, "documents")
+            filename, digest = await save_uploaded_file_with_digest(file, "documents")
             file_path = f"/uploads/documents/{filename}"
             final_files.append(file_path)
-            # Run AI forgery check
-            is_authentic = await check_document_authenticity(file_path)
-            if not is_authentic:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Document failed AI forgery check"
-                )
+            final_file_digests.append({"path": file_path, "digest": digest})
+        
+        # Uploaded files are forgery-checked in the background; the document stays
+        # pending_verification until every file has been analyzed
+        await transition(
+            document["_id"],
+            "submit_for_verification",
+            current_user["user_id"],
+            {
+                "$set": {
+                    "final_docs": final_files,
+                    "final_docs_digests": final_file_digests
+                }
+            },
+            details={"files": len(final_files)}
+        )
+        job_id = await verification_queue.submit(document, final_file_digests, current_user["user_id"])
+        await db.documents.update_one(
+            {"_id": document["_id"]},
+            {"$set": {"verification_job_id": job_id}}
+        )
+        
+        return {
+            "message": "Document submitted for verification",
+            "status": "pending_verification",
+            "job_id": job_id
+        }
     else:
         # Generate composed final PDF and store it
         try:
-            # Reuse final-pdf generator endpoint logic by calling function indirectly
-            from PyPDF2 import PdfReader
-            from reportlab.pdfgen import canvas
-            # Generate composed pdf to disk
-            # Call our own final-pdf to ensure it exists
-            _ = await get_final_document_pdf(document_id, current_user, db)
-            # Save path from generated output
-            upload_root = Path(settings.upload_dir)
-            output_dir = upload_root / "generated"
-            # Find the most recent generated file for this document
-            candidates = sorted(output_dir.glob(f"final_*{document_id}*.pdf"), key=lambda p: p.stat().st_mtime, reverse=True)
-            if not candidates:
-                # Fallback: any final_*.pdf
-                candidates = sorted(output_dir.glob("final_*.pdf"), key=lambda p: p.stat().st_mtime, reverse=True)
-            if not candidates:
-                raise HTTPException(status_code=500, detail="Failed to compose final PDF")
-            composed = candidates[0]
+            # Same composition as the final-pdf endpoint, on the document resolved above
+            composed = await compose_final_pdf(db, document)
             # Move/copy into uploads/documents for consistency
             dest_dir = Path(settings.upload_dir) / "documents"
             dest_dir.mkdir(parents=True, exist_ok=True)
             dest_path = dest_dir / composed.name
+            composed_bytes = composed.read_bytes()
             if composed.resolve() != dest_path.resolve():
-                dest_path.write_bytes(composed.read_bytes())
+                dest_path.write_bytes(composed_bytes)
             final_files.append(f"/uploads/documents/{dest_path.name}")
+            final_file_digests.append({"path": f"/uploads/documents/{dest_path.name}", "digest": hashlib.sha256(composed_bytes).hexdigest()})
         except HTTPException:
             raise
         except Exception as e:
@@ -1382,37 +1457,115 @@ async def finalize_document(
     
     # Update document - use the actual document _id from the found document
     document_object_id = document["_id"]
-    print(f"Updating document with ObjectId: {document_object_id}")
     
-    await db.documents.update_one(
-        {"_id": document_object_id},
+    anchor_digest = compute_document_digest(str(document_object_id), final_files, final_file_digests)
+    await transition(
+        document_object_id,
+        "finalize",
+        current_user["user_id"],
         {
             "$set": {
                 "final_docs": final_files,
+                "final_docs_digests": final_file_digests,
                 "ai_forgery_check": True,
-                "status": "finalized",
                 "is_locked": True,
-                "updated_at": datetime.now(timezone.utc)
+                "anchor_digest": anchor_digest
             }
-        }
+        },
+        details={"files": len(final_files)}
     )
     
-    # Add to blockchain
-    blockchain_hash = await add_to_blockchain(str(document_object_id), final_files)
-    await db.documents.update_one(
-        {"_id": document_object_id},
-        {"$set": {"blockchain": True, "blockchain_hash": blockchain_hash}}
-    )
+    # Queue for the next Merkle anchor batch; the anchor service records the proof on the document
+    anchor_service.submit(str(document_object_id), anchor_digest)
     
-    return {"message": "Document finalized successfully"}
+    return {"message": "Document finalized successfully", "blockchain_status": "queued"}
 
-@documents_router.get("/{document_id}/final-pdf")
-async def get_final_document_pdf(
+@documents_router.get("/{document_id}/verification-status")
+async def get_verification_status(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
-    """Generate a composed final PDF with background and a summary page, and return it as a file.
+    """Progress of the latest forgery-check job for a document, per file"""
+    document = await documents.require(document_id)
+
+    if current_user["user_id"] not in document.get("involved_users", []):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    job = await db.verification_jobs.find_one(
+        {"document_id": str(document["_id"])},
+        sort=[("created_at", -1)]
+    )
+    if not job:
+        return {
+            "document_id": str(document["_id"]),
+            "document_status": document.get("status"),
+            "job": None
+        }
+
+    return {
+        "document_id": str(document["_id"]),
+        "document_status": document.get("status"),
+        "job": {
+            "job_id": str(job["_id"]),
+            "status": job["status"],
+            "completed_files": job["completed_files"],
+            "total_files": job["total_files"],
+            "progress": job["completed_files"] / job["total_files"] if job["total_files"] else 1.0,
+            "files": [
+                {
+                    "path": entry["path"],
+                    "status": entry["status"],
+                    "report": entry.get("report")
+                }
+                for entry in job["files"]
+            ],
+            "created_at": job["created_at"],
+            "completed_at": job.get("completed_at")
+        }
+    }
+
+@documents_router.get("/{document_id}/events")
+async def get_document_events(
+    document_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Status transitions and participant changes for a document, newest first"""
+    document = await documents.require(document_id)
+
+    if current_user["user_id"] not in document.get("involved_users", []):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    events = await db.document_events.find(
+        {"document_id": str(document["_id"])},
+        {"_id": 0}
+    ).sort("created_at", -1).limit(limit).to_list(length=limit)
+    return {"document_id": str(document["_id"]), "events": events}
+
+@documents_router.get("/{document_id}/verify-anchor")
+async def verify_document_blockchain_anchor(
+    document_id: str,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Verify a finalized document against its Merkle inclusion proof without walking the chain"""
+    document = await documents.require(document_id)
+
+    if current_user["user_id"] not in document.get("involved_users", []):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    result = await verify_document_anchor(document)
+    result["document_id"] = str(document["_id"])
+    result["document_code"] = document.get("document_code", "")
+    return result
+
+async def compose_final_pdf(db, document: Dict) -> Path:
+    """Compose the final PDF for an already resolved document and return its path.
     Final PDF = All raw documents composited onto bg.pdf + one summary page with participant details and payments.
     """
     try:
@@ -1424,22 +1577,6 @@ async def get_final_document_pdf(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF dependencies missing: {e}")
 
-    # Find document by id or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception:
-        pass
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-
-    # Ensure current user is involved
-    if current_user["user_id"] not in document.get("involved_users", []):
-        raise HTTPException(status_code=403, detail="Access denied")
-
     # Background asset and output dir
     bg_path = Path("app/assets/bg.pdf")
     if not bg_path.exists():
@@ -1448,7 +1585,7 @@ async def get_final_document_pdf(
     upload_root = Path(settings.upload_dir)
     output_dir = upload_root / "generated"
     output_dir.mkdir(parents=True, exist_ok=True)
-    output_pdf_path = output_dir / f"final_{document.get('_id', document_id)}.pdf"
+    output_pdf_path = output_dir / f"final_{document['_id']}.pdf"
 
     # Build participants info
     users = []
@@ -1549,11 +1686,11 @@ async def get_final_document_pdf(
                 reader = PdfReader(str(raw_abs))
                 for p in reader.pages:
                     writer.add_page(p)
-            except Exception:
-                print(f"Failed to append raw pdf {raw_abs}: {e}")
+            except Exception as e:
+                logger.warning("Failed to append raw pdf %s: %s", raw_abs, e)
 
     # Create summary page content via ReportLab (same size as bg)
-    summary_pdf_path = output_dir / f"summary_{document.get('_id', document_id)}.pdf"
+    summary_pdf_path = output_dir / f"summary_{document['_id']}.pdf"
     c = canvas.Canvas(str(summary_pdf_path), pagesize=(bg_w, bg_h))
     width, height = bg_w, bg_h
 
@@ -1727,7 +1864,7 @@ async def get_final_document_pdf(
             _merge_compat(bg_page, sum_page, scale, tx, ty)
             writer.add_page(bg_page)
     except Exception as e:
-        print(f"Error adding summary page: {e}")
+        logger.exception("Error adding summary page")
 
     # Write final composed pdf
     # Add page numbers to every page (bottom center)
@@ -1756,6 +1893,24 @@ async def get_final_document_pdf(
     with open(output_pdf_path, "wb") as f:
         numbered_pages.write(f)
 
+    return output_pdf_path
+
+@documents_router.get("/{document_id}/final-pdf")
+async def get_final_document_pdf(
+    document_id: str,
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
+):
+    """Generate a composed final PDF with background and a summary page, and return it as a file."""
+    # Find document by id or code
+    document = await documents.require(document_id)
+
+    # Ensure current user is involved
+    if current_user["user_id"] not in document.get("involved_users", []):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    output_pdf_path = await compose_final_pdf(db, document)
     return FileResponse(path=str(output_pdf_path), filename=output_pdf_path.name, media_type="application/pdf")
 
 @documents_router.post("/initiate-agreement", response_model=dict)
@@ -1764,9 +1919,7 @@ async def initiate_agreement(
     current_user=Depends(get_current_user),
     db=Depends(get_database)
 ):
-    print(f"=== Initiate Agreement Request ===")
-    print(f"Initiator: {current_user['user_id']}")
-    print(f"Target User Char ID: {request.target_user_char_id}")
+    logger.debug("Initiating agreement with %s by user %s", request.target_user_char_id, current_user["user_id"])
     
     # Find target user by char_id
     target_user = await db.users.find_one({"char_id": request.target_user_char_id})
@@ -1776,7 +1929,6 @@ async def initiate_agreement(
             detail="Target user not found"
         )
     
-    print(f"Found target user: {target_user['user_id']} ({target_user['char_id']})")
     
     # Check if user is trying to initiate agreement with themselves
     if target_user["user_id"] == current_user["user_id"]:
@@ -1809,7 +1961,9 @@ async def initiate_agreement(
     try:
         document_dict = document.dict()
         result = await db.documents.insert_one(document_dict)
-        print(f"Document created successfully with ID: {result.inserted_id}")
+        await document_counters.record_change(None, document_dict)
+        await record_event(document_dict, "create", current_user["user_id"], None)
+        logger.info("Agreement %s initiated", result.inserted_id)
         
         return {
             "message": "Agreement initiated successfully",
@@ -1826,7 +1980,7 @@ async def initiate_agreement(
         }
         
     except Exception as e:
-        print(f"Error creating agreement: {e}")
+        logger.exception("Error creating agreement")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating agreement: {str(e)}"
@@ -1841,17 +1995,15 @@ async def respond_to_agreement(
     sign: Optional[UploadFile] = File(None, description="Signature image for verification (required if accepting)"),
     eye: Optional[UploadFile] = File(None, description="Eye scan for verification (required if accepting)"),
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """
     Accept or reject an agreement request.
     This endpoint allows users to respond to agreement requests initiated by other users.
     When accepting, verification documents are required.
     """
-    print(f"=== Agreement Response Request ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
-    print(f"Response: {response}")
+    logger.debug("Responding %s to agreement %s by user %s", response, document_id, current_user["user_id"])
     
     if response not in ['accept', 'reject']:
         raise HTTPException(
@@ -1860,21 +2012,7 @@ async def respond_to_agreement(
         )
     
     # Find document by ObjectId or code
-    document = None
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception as e:
-        print(f"Error finding document: {e}")
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    document = await documents.require(document_id)
     
     # Check if current user is the target user (not the initiator)
     if document["primary_user"] == current_user["user_id"]:
@@ -1890,7 +2028,7 @@ async def respond_to_agreement(
             detail="You are not part of this agreement"
         )
     
-    # Check if document is in pending status
+    # Check if document is in pending status; the transition re-checks this atomically
     if document.get("status") != "pending":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1919,7 +2057,7 @@ async def respond_to_agreement(
                 verification_files["fingerprint"] = thumb_path
             
             if sign:
-                sign_path = await save_uploaded_file(sign, "signatures")
+                sign_path, sign_digest = await save_uploaded_file_with_digest(sign, "signatures")
                 verification_files["signature"] = sign_path
             
             if eye:
@@ -1927,67 +2065,82 @@ async def respond_to_agreement(
                 verification_files["eye_scan"] = eye_path
                 
         except Exception as e:
-            print(f"Error saving verification files: {e}")
+            logger.exception("Error saving verification files")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to save verification documents"
             )
         
-        # Accept the agreement
-        await db.documents.update_one(
-            {"_id": document["_id"]},
+        # Make sure the selfie shows a face, the eye scan an eye and the signature has strokes
+        biometric_results = await run_biometric_checks(
+            current_user,
+            os.path.join(settings.upload_dir, "profile_pics", verification_files["profile_pic"]),
+            os.path.join(settings.upload_dir, "eye_scans", verification_files["eye_scan"]),
+            f"/uploads/signatures/{verification_files['signature']}",
+            sign_digest
+        )
+        await record_signature(db, current_user["user_id"], f"/uploads/signatures/{verification_files['signature']}", sign_digest)
+        await image_hash_index.register_many(current_user["user_id"], {
+            "profile_pic": f"/uploads/profile_pics/{verification_files['profile_pic']}",
+            "fingerprint": f"/uploads/fingerprints/{verification_files['fingerprint']}",
+            "signature": f"/uploads/signatures/{verification_files['signature']}",
+            "eye_scan": f"/uploads/eye_scans/{verification_files['eye_scan']}"
+        })
+        
+        # Accept the agreement, recording the primary user's approval in the same write
+        updated_document = await transition(
+            document["_id"],
+            "accept_agreement",
+            current_user["user_id"],
             {
                 "$set": {
-                    "status": "approved",
-                    "updated_at": current_time,
                     f"user_approvals.{current_user['user_id']}": {
                         "approved": True,
                         "approved_at": current_time,
                         "is_primary": False,
                         "verification_files": verification_files
-                    }
-                }
-            }
-        )
-        
-        # Update primary user's approval status as well
-        await db.documents.update_one(
-            {"_id": document["_id"]},
-            {
-                "$set": {
+                    },
                     f"user_approvals.{document['primary_user']}": {
                         "approved": True,
                         "approved_at": current_time,
                         "is_primary": True
-                    }
-                }
-            }
+                    },
+                    f"biometric_checks.{current_user['user_id']}": biometric_results
+                },
+                "$inc": {"approved_count": 2, "required_count": 2}
+            },
+            conditions={
+                "involved_users": current_user["user_id"],
+                f"user_approvals.{current_user['user_id']}": {"$exists": False},
+                f"user_approvals.{document['primary_user']}": {"$exists": False}
+            },
+            conflict_detail="This agreement has already been answered"
         )
         
         message = "Agreement accepted successfully! The agreement is now active."
-        status = "approved"
         
     else:  # reject
         # Reject the agreement - remove current user from involved users
-        await db.documents.update_one(
-            {"_id": document["_id"]},
+        updated_document = await transition(
+            document["_id"],
+            "reject_agreement",
+            current_user["user_id"],
             {
                 "$pull": {"involved_users": current_user["user_id"]},
                 "$set": {
-                    "status": "rejected",
-                    "updated_at": current_time,
                     "rejected_by": current_user["user_id"],
                     "rejected_at": current_time
                 }
-            }
+            },
+            conditions={"involved_users": current_user["user_id"]},
+            conflict_detail="You are not part of this agreement"
         )
         
         message = "Agreement rejected successfully."
-        status = "rejected"
     
     return {
         "message": message,
-        "document_status": status,
+        "document_status": updated_document.status,
         "response": response,
         "document_id": str(document["_id"]),
         "document_code": document.get("document_code", "")
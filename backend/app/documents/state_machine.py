@@ -0,0 +1,319 @@
+import logging
+import copy
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from app.database import db
+from app.documents.counters import document_counters
+from app.documents.resolver import Document
+from app.websocket.manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+# Statuses in which participants and approvals may still change
+OPEN_STATUSES = ["draft", "pending", "pending_approval", "approved", "payment_pending", "payment_completed"]
+
+# action -> (statuses the document may be in, status it moves to; None keeps the current status)
+TRANSITIONS: Dict[str, Tuple[List[str], Optional[str]]] = {
+    "join": (OPEN_STATUSES, "pending_approval"),
+    "add_participant": (OPEN_STATUSES, None),
+    "invite_participant": (OPEN_STATUSES, None),
+    "remove_participant": (OPEN_STATUSES, None),
+    "reject_participant": (OPEN_STATUSES, None),
+    "approve_participant": (OPEN_STATUSES, None),
+    "approve": (["draft", "pending", "pending_approval"], "approved"),
+    "accept_agreement": (["pending"], "approved"),
+    "reject_agreement": (["pending"], "rejected"),
+    "submit_for_verification": (["approved"], "pending_verification"),
+    "finalize": (["approved"], "finalized"),
+    "verification_passed": (["pending_verification"], "finalized"),
+    "verification_failed": (["pending_verification"], "approved")
+}
+
+# Statuses from which a complete approval quorum moves the document to approved
+APPROVABLE_STATUSES = TRANSITIONS["approve"][0]
+
+def _operand_values(operand) -> List:
+    if isinstance(operand, dict):
+        return list(operand.get("$each", operand.get("$in", [])))
+    return [operand]
+
+def _parent(document: Dict, path: str) -> Tuple[Dict, str]:
+    *parents, field = path.split(".")
+    node = document
+    for key in parents:
+        node = node.setdefault(key, {})
+    return node, field
+
+def apply_update(document: Dict, update: Dict) -> Dict:
+    """
+    The document after `update`, computed from its pre-image. Covers the
+    operators transitions use ($set, $unset, $inc, $addToSet, $pull).
+    """
+    after = copy.deepcopy(document)
+    for path, value in update.get("$set", {}).items():
+        node, field = _parent(after, path)
+        node[field] = value
+    for path in update.get("$unset", {}):
+        node, field = _parent(after, path)
+        node.pop(field, None)
+    for path, value in update.get("$inc", {}).items():
+        node, field = _parent(after, path)
+        node[field] = node.get(field, 0) + value
+    for path, operand in update.get("$addToSet", {}).items():
+        node, field = _parent(after, path)
+        values = node.setdefault(field, [])
+        for value in _operand_values(operand):
+            if value not in values:
+                values.append(value)
+    for path, operand in update.get("$pull", {}).items():
+        node, field = _parent(after, path)
+        removed = _operand_values(operand)
+        node[field] = [value for value in node.get(field, []) if value not in removed]
+    return after
+
+async def _conflict(
+    document_id: ObjectId,
+    action: str,
+    from_statuses: List[str],
+    detail: Optional[str],
+    detail_status: int = status.HTTP_400_BAD_REQUEST
+) -> HTTPException:
+    # Only reached when the conditional update matched nothing, to explain why.
+    # Invalid states and failed preconditions are 400 as before; 409 means the
+    # request lost a race and may succeed if retried.
+    current = await db.database.documents.find_one({"_id": document_id}, {"status": 1, "is_locked": 1})
+    if current is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    current_status = current.get("status", "draft")
+    if current.get("is_locked") or current_status == "finalized":
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Document is finalized and cannot be edited"
+        )
+    if current_status not in from_statuses:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot {action.replace('_', ' ')} a document that is {current_status.replace('_', ' ')}"
+        )
+    if detail:
+        return HTTPException(status_code=detail_status, detail=detail)
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Document was changed by another request, please retry"
+    )
+
+async def transition(
+    document_id: ObjectId,
+    action: str,
+    actor: Optional[str],
+    update: Optional[Dict] = None,
+    conditions: Optional[Dict] = None,
+    conflict_detail: Optional[str] = None,
+    details: Optional[Dict] = None,
+    conflict_status: int = status.HTTP_400_BAD_REQUEST,
+    repeatable: bool = False
+) -> Document:
+    """
+    Apply `action` to a document in one find_one_and_update. The allowed source
+    statuses and any extra `conditions` are part of the filter, so concurrent
+    requests cannot both pass a check that only one of them should. When nothing
+    matches, raises 400 for an invalid status or failed condition (described by
+    `conflict_detail`, sent with `conflict_status`) and 409 when the document
+    changed underneath the request; otherwise records an audit event, notifies
+    the participants and returns the updated document. With `repeatable`, a retry
+    of an action that already moved the document to its target status succeeds
+    as a no-op and returns the document unchanged.
+    """
+    from_statuses, to_status = TRANSITIONS[action]
+    now = datetime.now(timezone.utc)
+
+    update = dict(update or {})
+    update["$set"] = {**update.get("$set", {}), "updated_at": now}
+    if to_status:
+        update["$set"]["status"] = to_status
+
+    query = {
+        "_id": document_id,
+        "status": {"$in": from_statuses},
+        "is_locked": {"$ne": True},
+        **(conditions or {})
+    }
+    before = await db.database.documents.find_one_and_update(query, update, return_document=ReturnDocument.BEFORE)
+    if before is None:
+        if repeatable and to_status:
+            current = await db.database.documents.find_one({
+                "_id": document_id,
+                "status": to_status,
+                "is_locked": {"$ne": True},
+                **(conditions or {})
+            })
+            if current is not None:
+                return Document(current)
+        raise await _conflict(document_id, action, from_statuses, conflict_detail, conflict_status)
+
+    after = Document(apply_update(before, update))
+    await _record(before, after, action, actor, details, now)
+    return after
+
+async def approve_participants(document_id: ObjectId, user_ids: List[str], actor: Optional[str]) -> Document:
+    """
+    Mark participants approved and, in the same pipeline update, move the
+    document to approved once approved_count reaches required_count. A user
+    without an approval entry (added rather than joined) becomes required and
+    approved at once.
+    """
+    from_statuses, _ = TRANSITIONS["approve_participant"]
+    now = datetime.now(timezone.utc)
+
+    approvals = {}
+    new_entries = []
+    query = {
+        "_id": document_id,
+        "status": {"$in": from_statuses},
+        "is_locked": {"$ne": True},
+        "involved_users": {"$all": user_ids}
+    }
+    for user_id in user_ids:
+        approval = f"$user_approvals.{user_id}"
+        approvals[f"user_approvals.{user_id}"] = {"$mergeObjects": [
+            {"is_primary": False},
+            {"$ifNull": [approval, {}]},
+            {"approved": True, "approved_at": now}
+        ]}
+        new_entries.append({"$cond": [{"$eq": [{"$type": approval}, "missing"]}, 1, 0]})
+        query[f"user_approvals.{user_id}.approved"] = {"$ne": True}
+
+    pipeline = [
+        {"$set": {
+            **approvals,
+            "approved_count": {"$add": [{"$ifNull": ["$approved_count", 0]}, len(user_ids)]},
+            "required_count": {"$add": [{"$ifNull": ["$required_count", 0]}, *new_entries]},
+            "updated_at": now
+        }},
+        {"$set": {
+            "status": {"$cond": [
+                {"$and": [
+                    {"$in": ["$status", APPROVABLE_STATUSES]},
+                    {"$gte": ["$approved_count", "$required_count"]}
+                ]},
+                "approved",
+                "$status"
+            ]}
+        }}
+    ]
+    before = await db.database.documents.find_one_and_update(query, pipeline, return_document=ReturnDocument.BEFORE)
+    if before is None:
+        if len(user_ids) == 1:
+            raise await _conflict(document_id, "approve_participant", from_statuses, "User is not awaiting approval on this document")
+        raise await _conflict(
+            document_id, "approve_participant", from_statuses,
+            "Participants changed while approving, please retry", status.HTTP_409_CONFLICT
+        )
+
+    # Mirror the pipeline on the pre-image rather than reading the document back
+    after = Document(copy.deepcopy(before))
+    entries = after.setdefault("user_approvals", {})
+    added = sum(1 for user_id in user_ids if user_id not in entries)
+    for user_id in user_ids:
+        entries[user_id] = {"is_primary": False, **(entries.get(user_id) or {}), "approved": True, "approved_at": now}
+    after["approved_count"] = before.get("approved_count", 0) + len(user_ids)
+    after["required_count"] = before.get("required_count", 0) + added
+    after["updated_at"] = now
+    if after.status in APPROVABLE_STATUSES and after["approved_count"] >= after["required_count"]:
+        after["status"] = "approved"
+
+    details = {"user_id": user_ids[0]} if len(user_ids) == 1 else {"user_ids": user_ids}
+    await _record(before, after, "approve_participant", actor, details, now)
+    return after
+
+async def approve_participant(document_id: ObjectId, user_id: str, actor: Optional[str]) -> Document:
+    return await approve_participants(document_id, [user_id], actor)
+
+def participant_removal(document: Dict, user_ids: List[str]) -> Tuple[Dict, Dict]:
+    """
+    Update and precondition that drop participants together with their approval
+    entries and their share of the quorum counts. The precondition pins each
+    entry to the state it had in `document`, so the counts cannot drift under a
+    concurrent approval.
+    """
+    update = {"$pull": {"involved_users": {"$in": user_ids}}}
+    conditions = {"involved_users": {"$all": user_ids}}
+    unset = {}
+    required = approved = 0
+    for user_id in user_ids:
+        approval = document.get("user_approvals", {}).get(user_id)
+        if approval is None:
+            conditions[f"user_approvals.{user_id}"] = {"$exists": False}
+            continue
+        unset[f"user_approvals.{user_id}"] = ""
+        required -= 1
+        if approval.get("approved"):
+            approved -= 1
+            conditions[f"user_approvals.{user_id}.approved"] = True
+        else:
+            conditions[f"user_approvals.{user_id}.approved"] = {"$ne": True}
+    if unset:
+        update["$unset"] = unset
+        update["$inc"] = {"required_count": required, "approved_count": approved}
+    return update, conditions
+
+async def _record(before: Dict, after: Document, action: str, actor: Optional[str], details: Optional[Dict], at: datetime):
+    await document_counters.record_change(before, after)
+    # Removed participants are told too, so their clients drop the document
+    recipients = list(dict.fromkeys(before.get("involved_users", []) + after.get("involved_users", [])))
+    await record_event(after, action, actor, before.get("status"), details, at, recipients)
+
+async def record_event(
+    document: Dict,
+    action: str,
+    actor: Optional[str],
+    from_status: Optional[str],
+    details: Optional[Dict] = None,
+    at: Optional[datetime] = None,
+    recipients: Optional[List[str]] = None
+):
+    """Append to the document's audit trail and push the change to its participants"""
+    event = {
+        "document_id": str(document["_id"]),
+        "action": action,
+        "actor": actor,
+        "from_status": from_status,
+        "to_status": document.get("status"),
+        "details": details or {},
+        "created_at": at or datetime.now(timezone.utc)
+    }
+    await db.database.document_events.insert_one(event)
+    await connection_manager.broadcast(
+        {
+            "type": "document_status_changed",
+            "document_id": event["document_id"],
+            "document_code": document.get("document_code", ""),
+            "action": action,
+            "actor": actor,
+            "from_status": from_status,
+            "to_status": event["to_status"],
+            "details": event["details"]
+        },
+        recipients if recipients is not None else document.get("involved_users", [])
+    )
+
+async def backfill_approval_counts() -> int:
+    """Derive approved_count and required_count for documents written before they were tracked"""
+    # Only approval entries of current participants count towards the quorum
+    approvals = {"$filter": {
+        "input": {"$objectToArray": {"$ifNull": ["$user_approvals", {}]}},
+        "cond": {"$in": ["$$this.k", {"$ifNull": ["$involved_users", []]}]}
+    }}
+    result = await db.database.documents.update_many(
+        {"required_count": {"$exists": False}},
+        [{"$set": {
+            "required_count": {"$size": approvals},
+            "approved_count": {"$size": {"$filter": {"input": approvals, "cond": {"$eq": ["$$this.v.approved", True]}}}}
+        }}]
+    )
+    if result.modified_count:
+        logger.info("Backfilled approval counts for %d documents", result.modified_count)
+    return result.modified_count
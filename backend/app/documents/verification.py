@@ -0,0 +1,239 @@
+import logging
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.config import settings
+from app.database import db
+from fastapi import HTTPException
+from app.documents.state_machine import transition
+from app.utils.ai_forgery import analyze_document
+from app.utils.anchoring import anchor_service, compute_document_digest
+from app.websocket.manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+class VerificationQueue:
+    """
+    Runs forgery checks for finalized uploads in the background.
+
+    A job is stored in the verification_jobs collection with one entry per file.
+    Workers pull (job_id, file_index) items and analyze files in parallel; the
+    worker that completes the last file flips the document status and notifies
+    the participants over the websocket.
+
+    Each job carries a lease (lease_owner, lease_expires) renewed whenever one
+    of its files is picked up, so after a restart only jobs whose lease has
+    lapsed are recovered, and by exactly one process.
+    """
+
+    def __init__(self, workers: int, lease_seconds: int):
+        self.worker_count = workers
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        await self._recover_jobs()
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _lease(self) -> Dict:
+        return {
+            "lease_owner": self.owner,
+            "lease_expires": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+        }
+
+    async def _recover_jobs(self):
+        """Re-queue files of jobs that were interrupted by a restart"""
+        jobs = db.database.verification_jobs
+        recovered = 0
+        while True:
+            # Claim one lapsed job at a time so concurrent processes never re-queue the same job
+            job = await jobs.find_one_and_update(
+                {
+                    "status": {"$in": ["pending", "running"]},
+                    "$or": [
+                        {"lease_expires": {"$exists": False}},
+                        {"lease_expires": {"$lt": datetime.now(timezone.utc)}}
+                    ]
+                },
+                {"$set": self._lease()},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            recovered += 1
+            for index, entry in enumerate(job["files"]):
+                if entry["status"] not in ("passed", "failed"):
+                    self.queue.put_nowait((job["_id"], index))
+        if recovered:
+            logger.info("Recovered %d verification jobs", recovered)
+
+    async def submit(self, document: Dict, files: List[Dict[str, str]], requested_by: str) -> str:
+        """Create a job for the given [{path, digest}] files and queue every file"""
+        now = datetime.now(timezone.utc)
+        job = {
+            "document_id": str(document["_id"]),
+            "document_code": document.get("document_code", ""),
+            "involved_users": document.get("involved_users", []),
+            "requested_by": requested_by,
+            "status": "pending",
+            "total_files": len(files),
+            "completed_files": 0,
+            "files": [
+                {"path": entry["path"], "digest": entry["digest"], "status": "queued", "report": None}
+                for entry in files
+            ],
+            "created_at": now,
+            "updated_at": now,
+            **self._lease()
+        }
+        result = await db.database.verification_jobs.insert_one(job)
+        for index in range(len(files)):
+            self.queue.put_nowait((result.inserted_id, index))
+        return str(result.inserted_id)
+
+    async def _worker(self):
+        while True:
+            job_id, index = await self.queue.get()
+            try:
+                await self._process(job_id, index)
+            except Exception as e:
+                logger.exception("Verification worker error for job %s file %s", job_id, index)
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, job_id: ObjectId, index: int):
+        jobs = db.database.verification_jobs
+        # A file another process already finished is not analyzed or counted again
+        job = await jobs.find_one_and_update(
+            {"_id": job_id, f"files.{index}.status": {"$nin": ["passed", "failed"]}},
+            {"$set": {
+                f"files.{index}.status": "running",
+                "status": "running",
+                "updated_at": datetime.now(timezone.utc),
+                **self._lease()
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            return
+        entry = job["files"][index]
+
+        try:
+            report = await analyze_document(entry["path"], entry["digest"])
+            file_status = "passed" if report["authentic"] else "failed"
+            summary = {"score": report["score"], "authentic": report["authentic"], "findings": report["findings"]}
+        except Exception as e:
+            file_status = "failed"
+            summary = {"score": None, "authentic": False, "findings": [{"check": "engine", "severity": "high", "detail": str(e)}]}
+
+        job = await jobs.find_one_and_update(
+            {"_id": job_id},
+            {
+                "$set": {
+                    f"files.{index}.status": file_status,
+                    f"files.{index}.report": summary,
+                    "updated_at": datetime.now(timezone.utc)
+                },
+                "$inc": {"completed_files": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            # The job was removed while the file was analyzed
+            return
+
+        await connection_manager.broadcast(
+            {
+                "type": "document_verification_progress",
+                "document_id": job["document_id"],
+                "job_id": str(job_id),
+                "completed_files": job["completed_files"],
+                "total_files": job["total_files"]
+            },
+            job["involved_users"]
+        )
+
+        if job["completed_files"] >= job["total_files"]:
+            await self._complete(job)
+
+    async def _transition(self, document_id: ObjectId, action: str, job: Dict, update: Dict) -> bool:
+        try:
+            await transition(document_id, action, None, update, details={"job_id": str(job["_id"])})
+            return True
+        except HTTPException as e:
+            # The document left pending_verification while the job ran
+            logger.warning("Verification job %s could not %s: %s", job["_id"], action, e.detail)
+            return False
+
+    async def _complete(self, job: Dict):
+        # Only one worker may complete a job
+        passed = all(entry["status"] == "passed" for entry in job["files"])
+        job = await db.database.verification_jobs.find_one_and_update(
+            {"_id": job["_id"], "status": {"$nin": ["completed", "failed"]}},
+            {"$set": {
+                "status": "completed" if passed else "failed",
+                "completed_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            return
+
+        document_object_id = ObjectId(job["document_id"])
+        # A list like final_docs_digests: paths contain dots, so they are never field names
+        reports = [{"path": entry["path"], "report": entry["report"]} for entry in job["files"]]
+
+        if passed:
+            document = await db.database.documents.find_one({"_id": document_object_id})
+            if not document:
+                logger.warning("Verification job %s completed for a deleted document %s", job["_id"], job["document_id"])
+                return
+            anchor_digest = compute_document_digest(
+                job["document_id"],
+                document.get("final_docs") or [],
+                document.get("final_docs_digests")
+            )
+            if not await self._transition(document_object_id, "verification_passed", job, {"$set": {
+                "is_locked": True,
+                "ai_forgery_check": True,
+                "ai_forgery_reports": reports,
+                "anchor_digest": anchor_digest
+            }}):
+                return
+            anchor_service.submit(job["document_id"], anchor_digest)
+            document_status = "finalized"
+        else:
+            # Send the document back so the primary user can upload corrected files
+            if not await self._transition(document_object_id, "verification_failed", job, {"$set": {
+                "ai_forgery_check": False,
+                "ai_forgery_reports": reports
+            }}):
+                return
+            document_status = "approved"
+
+        await connection_manager.broadcast(
+            {
+                "type": "document_verification_completed",
+                "document_id": job["document_id"],
+                "job_id": str(job["_id"]),
+                "passed": passed,
+                "document_status": document_status
+            },
+            job["involved_users"]
+        )
+
+# Global verification queue instance
+verification_queue = VerificationQueue(settings.verification_workers, settings.verification_lease_seconds)
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
@@ -7,8 +8,23 @@ import os
 from typing import Optional
 from fastapi import File, UploadFile
 
-from app.database import connect_to_mongo, close_mongo_connection
+from app.database import connect_to_mongo, close_mongo_connection, db
 from app.config import settings
+from app.utils.logger import RequestContextMiddleware, setup_logging, shutdown_logging
+from app.utils.metrics import MetricsMiddleware, metrics
+from app.utils.anchoring import anchor_service, backfill_file_digests
+from app.utils.blockchain import blockchain
+from app.utils import ai_forgery, biometrics
+from app.utils.face_index import face_index
+from app.utils.image_hashing import image_hash_index
+from app.users.search import backfill_search_fields
+from app.users.counters import user_counters, backfill_user_fields
+from app.auth.credentials import credential_provisioner
+from app.auth.revocation import revocation_list
+from app.documents.counters import document_counters
+from app.documents.state_machine import backfill_approval_counts
+from app.documents.pricing import pricing_service
+from app.documents.verification import verification_queue
 
 from app.auth.routes import auth_router
 from app.users.routes import users_router
@@ -18,9 +34,14 @@ from app.payments.routes import payments_router
 from app.wallet.routes import wallet_router
 from app.websocket.manager import websocket_router
 
+# Structured, queued logging; handlers only enqueue records
+setup_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    if settings.otp_static_code and not settings.dev_mode:
+        raise RuntimeError("OTP_STATIC_CODE accepts one code for every phone number; it is only allowed with DEV_MODE=true")
     await connect_to_mongo()
     
     # Create upload directories
@@ -31,10 +52,46 @@ async def lifespan(app: FastAPI):
     os.makedirs(f"{settings.upload_dir}/documents", exist_ok=True)
     os.makedirs(f"{settings.upload_dir}/govt_id_images", exist_ok=True)
     
+    # Fill search fields for users created before indexed search, status and location
+    # keys for the user counters, approval quorum counts for documents created before
+    # they were tracked, and convert digests and forgery reports stored keyed by path
+    await backfill_search_fields(db.database)
+    await backfill_user_fields()
+    await backfill_approval_counts()
+    await backfill_file_digests()
+    
+    # Load enrolled face embeddings and image hashes into memory
+    await face_index.load()
+    await image_hash_index.load()
+    
+    # Load the stored blockchain, then start batching anchors and forgery-check workers
+    await blockchain.load()
+    await anchor_service.start()
+    await verification_queue.start()
+    
+    # Maintained user counts with periodic reconciliation, and per-user document counters
+    await user_counters.start()
+    await document_counters.start()
+    
+    # Revoked sessions are checked in memory on every request
+    await revocation_list.start()
+    
+    # Active pricing is served from memory and re-checked in the background
+    await pricing_service.start()
+    
     yield
     
     # Shutdown
+    await pricing_service.stop()
+    await revocation_list.stop()
+    await user_counters.stop()
+    await verification_queue.stop()
+    await anchor_service.stop()
+    ai_forgery.shutdown_executor()
+    biometrics.shutdown_executor()
+    credential_provisioner.shutdown()
     await close_mongo_connection()
+    shutdown_logging()
 
 app = FastAPI(
     title="Document Agreement System",
@@ -98,6 +155,12 @@ async def add_cors_headers(request, call_next):
     response.headers["Access-Control-Allow-Credentials"] = "true"
     return response
 
+# Per-route latency, size and status metrics, served at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Request ids for log correlation; added last so it wraps every other middleware
+app.add_middleware(RequestContextMiddleware)
+
 # Custom OpenAPI schema for better file upload recognition
 def custom_openapi():
     if app.openapi_schema:
@@ -153,6 +216,10 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-cors")
 async def test_cors():
     return {
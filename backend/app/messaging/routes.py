@@ -1,26 +1,20 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Body
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional
 from app.messaging.models import MessageCreate, MessageResponse, MessageInDB
-from app.auth.utils import verify_token
+from app.auth.tokens import get_current_user_claims
 from app.database import get_database
 from app.websocket.manager import connection_manager
 from app.utils.file_handler import save_uploaded_file
 from bson import ObjectId
 from datetime import datetime, timezone
 
+logger = logging.getLogger(__name__)
+
 messaging_router = APIRouter()
-security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_database)):
-    user_id = verify_token(credentials.credentials)
-    user = await db.users.find_one({"user_id": user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    return user
+# Authorized from the signed access-token claims; handlers here only need user_id and name
+get_current_user = get_current_user_claims
 
 @messaging_router.post("/send", response_model=dict)
 async def send_message(
@@ -31,7 +25,6 @@ async def send_message(
     current_user=Depends(get_current_user),
     db=Depends(get_database)
 ):
-    print(f"=== Send Message Request ===")
     # Support both form-data and raw JSON body
     if payload:
         if not receiver_id:
@@ -39,9 +32,6 @@ async def send_message(
         if not content:
             content = payload.content
 
-    print(f"Receiver ID/Char ID: {receiver_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
     # Validate required fields after merging sources
     if not receiver_id or not content:
         raise HTTPException(
@@ -51,25 +41,16 @@ async def send_message(
     
     # Try to find receiver by user_id first, then by char_id (no length assumptions)
     receiver = None
-    print(f"Searching receiver by user_id: {receiver_id}")
     receiver = await db.users.find_one({"user_id": receiver_id})
-    if receiver:
-        print(f"Found receiver by user_id: {receiver.get('user_id')}")
     if not receiver:
-        print(f"Receiver not found by user_id, searching by char_id: {receiver_id}")
         receiver = await db.users.find_one({"char_id": receiver_id})
-        if receiver:
-            print(f"Found receiver by char_id: {receiver.get('char_id')}")
     
     if not receiver:
-        print(f"Receiver not found with ID/char_id: {receiver_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Receiver not found"
         )
     
-    print(f"Found receiver: {receiver.get('user_id')} with char_id: {receiver.get('char_id')}")
-    
     # Handle file upload if provided
     attachment_path = None
     if attachment:
@@ -78,7 +59,7 @@ async def send_message(
     
     # Create message - use the actual user_id from the found receiver
     actual_receiver_id = receiver["user_id"]
-    print(f"Creating message with receiver_id: {actual_receiver_id}")
+    logger.debug("Sending message from %s to %s", current_user["user_id"], actual_receiver_id)
     
     message = MessageInDB(
         sender_id=current_user["user_id"],
@@ -114,31 +95,19 @@ async def get_conversation(
     current_user=Depends(get_current_user),
     db=Depends(get_database)
 ):
-    print(f"=== Get Conversation Request ===")
-    print(f"User ID/Char ID: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
     # Try to find user by user_id first, then by char_id (no length assumptions)
     target_user = None
-    print(f"Searching user by user_id: {user_id}")
     target_user = await db.users.find_one({"user_id": user_id})
-    if target_user:
-        print(f"Found user by user_id: {target_user.get('user_id')}")
     if not target_user:
-        print(f"User not found by user_id, searching by char_id: {user_id}")
         target_user = await db.users.find_one({"char_id": user_id})
-        if target_user:
-            print(f"Found user by char_id: {target_user.get('char_id')}")
     
     if not target_user:
-        print(f"User not found with ID/char_id: {user_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
     actual_user_id = target_user["user_id"]
-    print(f"Found user: {actual_user_id} with char_id: {target_user.get('char_id')}")
     
     # Get conversation between current user and specified user
     messages = await db.messages.find({
@@ -167,10 +136,10 @@ async def get_conversation(
                 "is_read": bool(msg.get("is_read", False))
             })
         except Exception as e:
-            print(f"Error serializing message {msg.get('_id', 'unknown')}: {e}")
+            logger.warning("Skipping malformed message %s: %s", msg.get("_id", "unknown"), e)
             continue
 
-    print(f"Returning {len(response_messages)} messages")
+    logger.debug("Returning %d messages between %s and %s", len(response_messages), current_user["user_id"], actual_user_id)
     return response_messages
 
 @messaging_router.get("/unread-count")
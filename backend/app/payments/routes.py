@@ -1,42 +1,34 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List
 from app.payments.models import (
     PaymentCreate, PaymentResponse, PaymentInDB, PaymentStatus,
     PaymentDistribution, DocumentPaymentSetup, PaymentCalculationResponse
 )
-from app.auth.utils import verify_token
+from app.auth.tokens import get_current_user_claims
 from app.database import get_database
+from app.documents.resolver import DocumentResolver, get_document_resolver
+from app.documents.counters import update_document_tracked
 from bson import ObjectId
 from datetime import datetime, timezone
 import uuid
 
+logger = logging.getLogger(__name__)
+
 payments_router = APIRouter()
-security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_database)):
-    user_id = verify_token(credentials.credentials)
-    user = await db.users.find_one({"user_id": user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    return user
+# Authorized from the signed access-token claims; handlers here only need user_id
+get_current_user = get_current_user_claims
 
 @payments_router.post("/create", response_model=dict)
 async def create_payment(
     payment_data: PaymentCreate,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     # Verify document exists and user is involved
-    document = await db.documents.find_one({"_id": ObjectId(payment_data.document_id)})
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    document = await documents.require(payment_data.document_id)
     
     if current_user["user_id"] not in document["involved_users"]:
         raise HTTPException(
@@ -135,29 +127,14 @@ async def get_my_payments(current_user=Depends(get_current_user), db=Depends(get
 async def calculate_document_payment(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Calculate payment amount for a document (₹1 per day)"""
-    print(f"=== Calculate Document Payment ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Calculating payment for document %s by user %s", document_id, current_user["user_id"])
     
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception:
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     # Check if user is involved in the document
     if current_user["user_id"] not in document["involved_users"]:
@@ -187,7 +164,7 @@ async def calculate_document_payment(
     # Calculate total amount using the actual daily rate
     total_amount = duration_days * daily_rate
     
-    print(f"Duration: {duration_days} days, Daily Rate: ₹{daily_rate}, Total Amount: ₹{total_amount}")
+    logger.debug("Payment for %s: %d days at %s/day = %s", document_id, duration_days, daily_rate, total_amount)
     
     # Check payment status
     payment_status = "pending"
@@ -231,44 +208,14 @@ async def setup_payment_distribution(
     document_id: str,
     payment_setup: DocumentPaymentSetup,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Setup payment distribution for a document (primary user only)"""
-    print(f"=== Setup Payment Distribution ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    # Check if document_id is a valid ObjectId
-    try:
-        if ObjectId.is_valid(document_id):
-            print(f"Searching by ObjectId: {document_id}")
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-            if document:
-                print(f"Found document by ObjectId: {document.get('_id')}")
-        else:
-            print(f"Not a valid ObjectId, searching by document_code: {document_id}")
-    except Exception as e:
-        print(f"Error checking ObjectId validity: {e}")
-        pass
-    
-    # If not found by ObjectId, try to find by document_code
-    if not document:
-        print(f"Searching by document_code: {document_id}")
-        document = await db.documents.find_one({"document_code": document_id})
-        if document:
-            print(f"Found document by document_code: {document.get('document_code')}")
-    
-    if not document:
-        print(f"Document not found with ID/code: {document_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    logger.debug("Setting up payment distribution for document %s by user %s", document_id, current_user["user_id"])
     
-    print(f"Found document: {document.get('_id')} with code: {document.get('document_code')}")
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     # Check if current user is primary user
     if document["primary_user"] != current_user["user_id"]:
@@ -327,36 +274,21 @@ async def setup_payment_distribution(
         upsert=True
     )
     
-    print(f"Payment distribution setup successfully for document {document_id}")
+    logger.info("Payment distribution set up for document %s", document["_id"])
     return {"message": "Payment distribution setup successfully"}
 
 @payments_router.get("/document/{document_id}/payment-status")
 async def get_document_payment_status(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Get payment status for a document"""
-    print(f"=== Get Document Payment Status ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception:
-        pass
+    logger.debug("Payment status of document %s by user %s", document_id, current_user["user_id"])
     
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     # Check if user is involved in the document
     if current_user["user_id"] not in document["involved_users"]:
@@ -418,29 +350,14 @@ async def get_document_payment_status(
 async def make_document_payment(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """Make payment for a document based on assigned distribution"""
-    print(f"=== Make Document Payment ===")
-    print(f"Document ID/Code: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Payment for document %s by user %s", document_id, current_user["user_id"])
     
-    # Try to find document by ObjectId first, then by document_code
-    document = None
-    
-    try:
-        if ObjectId.is_valid(document_id):
-            document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        else:
-            document = await db.documents.find_one({"document_code": document_id})
-    except Exception:
-        pass
-    
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
+    # Find document by ObjectId or code in one indexed query
+    document = await documents.require(document_id)
     
     # Check if user is involved in the document
     if current_user["user_id"] not in document["involved_users"]:
@@ -547,7 +464,7 @@ async def make_document_payment(
     # Check if all payments are completed and update document status
     all_payments_completed = await check_all_payments_completed(str(document["_id"]), db)
     if all_payments_completed:
-        await db.documents.update_one(
+        await update_document_tracked(
             {"_id": document["_id"]},
             {
                 "$set": {
@@ -556,9 +473,9 @@ async def make_document_payment(
                 }
             }
         )
-        print(f"All payments completed for document {document_id}, updated document status to completed")
+        logger.info("All payments completed for document %s", document["_id"])
     
-    print(f"Payment completed successfully for user {current_user['user_id']}: ₹{user_distribution['amount']:.2f}")
+    logger.info("Payment %s of %.2f completed by user %s", payment_id, user_distribution["amount"], current_user["user_id"])
     
     return {
         "message": "Payment completed successfully",
@@ -593,27 +510,17 @@ async def check_all_payments_completed(document_id: str, db) -> bool:
 async def get_document_payments(
     document_id: str,
     current_user=Depends(get_current_user),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    documents: DocumentResolver = Depends(get_document_resolver)
 ):
     """
     Get all payments for a specific document
     """
-    print(f"=== Get Document Payments ===")
-    print(f"Document ID: {document_id}")
-    print(f"Current user: {current_user['user_id']}")
+    logger.debug("Listing payments of document %s by user %s", document_id, current_user["user_id"])
     
     try:
         # Verify document exists and user is involved
-        document = await db.documents.find_one({"_id": ObjectId(document_id)})
-        if not document:
-            # Try searching by document_code if ObjectId fails
-            document = await db.documents.find_one({"document_code": document_id})
-        
-        if not document:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Document not found"
-            )
+        document = await documents.require(document_id)
         
         if current_user["user_id"] not in document["involved_users"]:
             raise HTTPException(
@@ -625,8 +532,6 @@ async def get_document_payments(
         cursor = db.payments.find({"document_id": str(document["_id"])})
         payments = await cursor.to_list(length=None)
         
-        print(f"Found {len(payments)} payments for document {document_id}")
-        
         # Transform payments to response format
         payment_responses = []
         for payment in payments:
@@ -651,9 +556,9 @@ async def get_document_payments(
         return payment_responses
         
     except Exception as e:
-        print(f"Error fetching document payments: {e}")
         if isinstance(e, HTTPException):
             raise e
+        logger.exception("Error fetching payments of document %s", document_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch document payments"
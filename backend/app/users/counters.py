@@ -0,0 +1,177 @@
+import logging
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from app.config import settings
+from app.database import db
+from app.users.search import normalize
+
+logger = logging.getLogger(__name__)
+
+TOTAL_KEY = "total"
+
+# Bucket for users without a status; backfill_user_fields assigns one to legacy users
+UNKNOWN_STATUS = "unknown"
+
+def location_fields(city: Optional[str] = None, state: Optional[str] = None) -> Dict:
+    """Normalized city/state stored on each user; counters and exact counts both use them"""
+    fields = {}
+    if city is not None:
+        fields["city_key"] = normalize(city)
+    if state is not None:
+        fields["state_key"] = normalize(state)
+    return fields
+
+def counter_key(field: str, value: str) -> str:
+    """Counter document id for a status, city or state filter value"""
+    return f"{field}:{value if field == 'status' else normalize(value)}"
+
+def counter_keys(user: Dict) -> List[str]:
+    """Counter documents an active user contributes to"""
+    if not user.get("is_active", True):
+        return []
+    status = user.get("status")
+    keys = [TOTAL_KEY, counter_key("status", UNKNOWN_STATUS if status is None else status)]
+    if user.get("city"):
+        keys.append(counter_key("city", user["city"]))
+    if user.get("state"):
+        keys.append(counter_key("state", user["state"]))
+    return keys
+
+class UserCounters:
+    """
+    Active-user counts per status, city and state, kept in the user_counters
+    collection (one document per key). Registration and profile updates adjust
+    them with $inc; a periodic reconciliation recomputes them from the users
+    collection so drift from failed writes does not accumulate.
+    """
+
+    def __init__(self, cache_seconds: float, reconcile_seconds: float):
+        self.cache_seconds = cache_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self._cache: Dict[str, Tuple[float, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_reconciled: Optional[datetime] = None
+
+    async def start(self):
+        # Counters are seeded from the users collection the first time the service runs
+        if await db.database.user_counters.find_one({"_id": TOTAL_KEY}) is None:
+            await self.reconcile()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.warning("User counter reconciliation failed: %s", e)
+
+    async def _apply(self, deltas: Dict[str, int]):
+        operations = [
+            UpdateOne({"_id": key}, {"$inc": {"count": delta}}, upsert=True)
+            for key, delta in deltas.items() if delta
+        ]
+        if operations:
+            await db.database.user_counters.bulk_write(operations, ordered=False)
+            for key in deltas:
+                self._cache.pop(key, None)
+
+    async def user_added(self, user: Dict):
+        await self._apply({key: 1 for key in counter_keys(user)})
+
+    async def user_changed(self, before: Dict, after: Dict):
+        """Move a user between buckets after an update; `after` only needs the changed fields"""
+        deltas: Dict[str, int] = {}
+        for key in counter_keys(before):
+            deltas[key] = deltas.get(key, 0) - 1
+        for key in counter_keys({**before, **after}):
+            deltas[key] = deltas.get(key, 0) + 1
+        await self._apply(deltas)
+
+    async def get(self, key: str) -> int:
+        """Counter value by key: one _id lookup, cached briefly in process"""
+        cached = self._cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.cache_seconds:
+            return cached[1]
+        document = await db.database.user_counters.find_one({"_id": key}, {"count": 1})
+        count = max(0, document["count"]) if document else 0
+        self._cache[key] = (now, count)
+        return count
+
+    async def estimated_total(self) -> int:
+        """Collection-metadata count of all users, active or not"""
+        return await db.database.users.estimated_document_count()
+
+    async def reconcile(self):
+        """Recompute every counter from the users collection in one aggregation"""
+        pipeline = [
+            {"$match": {"is_active": True}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "status": [{"$group": {"_id": {"$ifNull": ["$status", UNKNOWN_STATUS]}, "count": {"$sum": 1}}}],
+                # Grouped on the stored normalized keys, so the buckets match counter_keys exactly
+                "city": [{"$group": {"_id": "$city_key", "count": {"$sum": 1}}}],
+                "state": [{"$group": {"_id": "$state_key", "count": {"$sum": 1}}}]
+            }}
+        ]
+        result = (await db.database.users.aggregate(pipeline).to_list(1))[0]
+        counts = {TOTAL_KEY: result["total"][0]["count"] if result["total"] else 0}
+        for field in ("status", "city", "state"):
+            for group in result[field]:
+                if group["_id"]:
+                    counts[f"{field}:{group['_id']}"] = group["count"]
+
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne({"_id": key}, {"$set": {"count": count, "reconciled_at": now}}, upsert=True)
+            for key, count in counts.items()
+        ]
+        await db.database.user_counters.bulk_write(operations, ordered=False)
+        # Buckets that no longer have any users
+        await db.database.user_counters.delete_many({"_id": {"$nin": list(counts)}})
+        self._cache.clear()
+        self.last_reconciled = now
+
+async def backfill_user_fields(batch_size: int = 500) -> int:
+    """
+    Give legacy users the status every user is reported with ("active") and the
+    normalized location keys the counters group on
+    """
+    result = await db.database.users.update_many({"status": {"$exists": False}}, {"$set": {"status": "active"}})
+    updated = result.modified_count
+    cursor = db.database.users.find(
+        {"$or": [{"city_key": {"$exists": False}}, {"state_key": {"$exists": False}}]},
+        {"_id": 1, "city": 1, "state": 1}
+    )
+    operations = []
+    async for user in cursor:
+        operations.append(UpdateOne(
+            {"_id": user["_id"]},
+            {"$set": location_fields(user.get("city") or "", user.get("state") or "")}
+        ))
+        if len(operations) >= batch_size:
+            await db.database.users.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await db.database.users.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    if updated:
+        logger.info("Backfilled status and location keys for %d users", updated)
+    return updated
+
+# Global user counters
+user_counters = UserCounters(settings.user_count_cache_seconds, settings.user_count_reconcile_seconds)
@@ -1,19 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 import os
+import json
 import uuid
 from datetime import datetime, timezone
 from app.users.models import UserProfile, UserProfileResponse, UserListResponse
 from app.auth.utils import verify_token
+from app.auth.routes import duplicate_user_message
+from app.auth.tokens import claims_changed, revoke_user_sessions
 from app.database import get_database
 from app.config import settings
-from app.utils.file_handler import save_uploaded_file, delete_file
+from app.utils.file_handler import save_uploaded_file, save_uploaded_file_with_digest, delete_file
+from app.utils.biometrics import extract_face_embedding
+from app.utils.face_index import face_index
+from app.utils.image_hashing import image_hash_index
+from app.users import search as search_index
+from app.users.counters import user_counters, location_fields, counter_key, TOTAL_KEY, UNKNOWN_STATUS
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_filter, next_cursor
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
 
 users_router = APIRouter()
 security = HTTPBearer()
 
+# Keyset sort orders; the cursor encodes these fields of the last item on a page
+USER_LIST_SORT = [("created_at", -1), ("user_id", -1)]
+SEARCH_SORT = [("search_tier", 1), ("search_key", 1), ("user_id", 1)]
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_database)):
     user_id = verify_token(credentials.credentials)
     user = await db.users.find_one({"user_id": user_id})
@@ -26,18 +44,6 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 @users_router.get("/profile", response_model=UserProfileResponse)
 async def get_user_profile(current_user=Depends(get_current_user)):
-    print(f"=== Get Profile Request ===")
-    print(f"Current user: {current_user['user_id']}")
-    print(f"User data from DB:")
-    print(f"  name: {current_user.get('name')}")
-    print(f"  email: {current_user.get('email')}")
-    print(f"  phone_no: {current_user.get('phone_no')}")
-    print(f"  city: {current_user.get('city')}")
-    print(f"  state: {current_user.get('state')}")
-    print(f"  govt_id_type: {current_user.get('govt_id_type')}")
-    print(f"  govt_id_number: {current_user.get('govt_id_number')}")
-    print(f"  govt_id_image: {current_user.get('govt_id_image')}")
-    
     # Ensure all required fields are present
     user_data = {
         "_id": current_user["user_id"],  # Use user_id as the id
@@ -60,9 +66,6 @@ async def get_user_profile(current_user=Depends(get_current_user)):
         "updated_at": current_user["updated_at"]
     }
     
-    print(f"=== Response Data ===")
-    print(f"Response user_data: {user_data}")
-    
     return UserProfileResponse(**user_data)
 
 @users_router.put("/profile")
@@ -82,46 +85,61 @@ async def update_user_profile(
     current_user=Depends(get_current_user),
     db=Depends(get_database)
 ):
-    print(f"=== Update Profile Request ===")
-    print(f"Current user: {current_user['user_id']}")
-    print(f"Received fields:")
-    print(f"  name: {name}")
-    print(f"  email: {email}")
-    print(f"  phone_no: {phone_no}")
-    print(f"  city: {city}")
-    print(f"  state: {state}")
-    print(f"  govt_id_type: {govt_id_type}")
-    print(f"  govt_id_number: {govt_id_number}")
-    
     update_data = {
         "name": name,
         "email": email,
         "updated_at": datetime.now(timezone.utc)
     }
+    # Keep the normalized search fields in step with name and email
+    update_data.update(search_index.build_search_fields(name, email, current_user.get("char_id")))
     
     if phone_no:
         update_data["phone_no"] = phone_no
-        print(f"Adding phone_no: {phone_no}")
     if city:
         update_data["city"] = city
-        print(f"Adding city: {city}")
     if state:
         update_data["state"] = state
-        print(f"Adding state: {state}")
+    update_data.update(location_fields(city or None, state or None))
     if govt_id_type:
         update_data["govt_id_type"] = govt_id_type
-        print(f"Adding govt_id_type: {govt_id_type}")
     if govt_id_number:
         update_data["govt_id_number"] = govt_id_number
-        print(f"Adding govt_id_number: {govt_id_number}")
+    
+    # Reject IDs, emails and phones of other accounts before any file is saved
+    unique_fields = [{field: update_data[field]} for field in ("email", "phone_no", "govt_id_number") if field in update_data]
+    existing_user = await db.users.find_one(
+        {"user_id": {"$ne": current_user["user_id"]}, "$or": unique_fields},
+        {"email": 1, "phone_no": 1, "_id": 0}
+    )
+    if existing_user:
+        govt_id_conflict = existing_user.get("email") != email and existing_user.get("phone_no") != update_data.get("phone_no")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_user_message(govt_id_conflict)
+        )
     
     # Handle file uploads
+    profile_embedding = None
     if profile_pic:
         filename = await save_uploaded_file(profile_pic, "profile_pics")
         update_data["profile_pic"] = f"/uploads/profile_pics/{filename}"
+        
+        # Screen the new profile face against other accounts before enrolling it
+        if settings.biometric_checks_enabled:
+            profile_embedding = await extract_face_embedding(update_data["profile_pic"])
+            if profile_embedding is not None:
+                update_data["identity_screening"] = {
+                    "source": "profile_pic",
+                    "matches": face_index.search(
+                        profile_embedding,
+                        settings.face_duplicate_threshold,
+                        exclude_user_id=current_user["user_id"]
+                    ),
+                    "screened_at": datetime.now(timezone.utc)
+                }
     
     if signature_pic:
-        filename = await save_uploaded_file(signature_pic, "signatures")
+        filename, signature_digest = await save_uploaded_file_with_digest(signature_pic, "signatures")
         update_data["signature_pic"] = f"/uploads/signatures/{filename}"
     
     if eye_pic:
@@ -139,22 +157,34 @@ async def update_user_profile(
                 old_file_path = os.path.join(settings.upload_dir, "govt_id_images", current_user["govt_id_image"])
                 await delete_file(old_file_path)
             except Exception as e:
-                print(f"Warning: Failed to delete old govt_id_image: {e}")
+                logger.warning("Failed to delete old govt_id_image of user %s: %s", current_user["user_id"], e)
         
         filename = await save_uploaded_file(govt_id_image, "govt_id_images")
         update_data["govt_id_image"] = filename
     
-    print(f"=== Database Update ===")
-    print(f"Update query: {{'user_id': '{current_user['user_id']}'}}")
-    print(f"Update data: {update_data}")
+    # Field names only: the values are personal data
+    logger.debug("Updating profile of user %s: %s", current_user["user_id"], sorted(update_data))
     
     # Update user in database
-    result = await db.users.update_one(
-        {"user_id": current_user["user_id"]},
-        {"$set": update_data}
-    )
-    
-    print(f"Update result: {result.modified_count} documents modified")
+    update_query = {"$set": update_data}
+    if "signature_pic" in update_data:
+        # A new profile signature becomes a reference for later signature matching
+        update_query["$push"] = {"signature_history": {
+            "$each": [{"path": update_data["signature_pic"], "digest": signature_digest, "added_at": datetime.now(timezone.utc)}],
+            "$slice": -settings.signature_history_size
+        }}
+    try:
+        result = await db.users.update_one(
+            {"user_id": current_user["user_id"]},
+            update_query
+        )
+    except DuplicateKeyError as e:
+        # A concurrent registration or update took the value; the unique indexes are the final arbiter
+        key_pattern = (e.details or {}).get("keyPattern", {})
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_user_message("govt_id_number" in key_pattern)
+        )
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -162,50 +192,57 @@ async def update_user_profile(
             detail="Failed to update profile"
         )
     
-    print("Profile updated successfully")
+    # Access tokens carrying the old name are served from the user record from now on
+    await claims_changed(current_user["user_id"])
+    
+    # Move the user between city/state counters if their location changed
+    if any(field in update_data and update_data[field] != current_user.get(field) for field in ("city", "state")):
+        await user_counters.user_changed(current_user, update_data)
+    
+    # The profile picture becomes the enrolled reference face
+    if profile_embedding is not None:
+        await face_index.enroll(current_user["user_id"], profile_embedding, "profile_pic")
+    
+    # Flag verification images already submitted by other accounts
+    await image_hash_index.register_many(current_user["user_id"], {
+        "profile_pic": update_data.get("profile_pic"),
+        "signature": update_data.get("signature_pic"),
+        "eye_scan": update_data.get("eye_pic"),
+        "fingerprint": update_data.get("fingerprint")
+    })
+    
     return {"message": "Profile updated successfully"}
 
 @users_router.get("/all", response_model=list[UserListResponse])
 async def get_all_users(
+    response: Response,
     current_user=Depends(get_current_user), 
     db=Depends(get_database),
-    limit: Optional[int] = 100,
-    skip: Optional[int] = 0,
-    status: Optional[str] = None
+    limit: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    cursor: Optional[str] = None
 ):
     """
     Get all registered users (basic information only)
     
     Parameters:
-    - limit: Maximum number of users to return (default: 100, max: 1000)
-    - skip: Number of users to skip for pagination (default: 0)
+    - limit: Maximum number of users to return (default: 20, max: 100)
+    - skip: Number of users to skip for pagination (default: 0, ignored when cursor is given)
     - status: Filter by user status (e.g., 'active', 'pending', 'suspended')
+    - cursor: Continuation token from the X-Next-Cursor header of the previous page
     """
-    print(f"=== Get All Users Request ===")
-    print(f"Current user: {current_user['user_id']}")
-    print(f"Limit: {limit}, Skip: {skip}, Status filter: {status}")
-    
-    # Validate parameters
-    if limit and (limit < 1 or limit > 1000):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Limit must be between 1 and 1000"
-        )
-    
-    if skip and skip < 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Skip must be non-negative"
-        )
-    
     try:
         # Build query filter
         query_filter = {"is_active": True}
-        if status:
-            query_filter["status"] = status
+        if status_filter:
+            query_filter["status"] = status_filter
+        if cursor:
+            # Keyset pagination: continue after the last (created_at, user_id) of the previous page
+            query_filter.update(keyset_filter(USER_LIST_SORT, decode_cursor(cursor, len(USER_LIST_SORT))))
         
         # Find users with pagination and filtering
-        cursor = db.users.find(
+        users_cursor = db.users.find(
             query_filter,
             {
                 "user_id": 1,
@@ -220,17 +257,18 @@ async def get_all_users(
                 "created_at": 1,
                 "_id": 0  # Exclude MongoDB _id
             }
-        ).sort("created_at", -1)  # Sort by creation date, newest first
+        ).sort(USER_LIST_SORT)  # Sort by creation date, newest first
         
         # Apply pagination
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+        if skip and not cursor:
+            users_cursor = users_cursor.skip(skip)
+        users_cursor = users_cursor.limit(limit)
         
-        users = await cursor.to_list(length=None)
+        users = await users_cursor.to_list(length=None)
         
-        print(f"Found {len(users)} users (filter: {query_filter})")
+        next_page = next_cursor(users, limit, USER_LIST_SORT)
+        if next_page:
+            response.headers[NEXT_CURSOR_HEADER] = next_page
         
         # Transform the data to match the response model
         user_list = []
@@ -251,8 +289,10 @@ async def get_all_users(
         
         return user_list
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error fetching all users: {e}")
+        logger.exception("Error fetching all users")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch users"
@@ -262,36 +302,54 @@ async def get_all_users(
 async def get_users_count(
     current_user=Depends(get_current_user), 
     db=Depends(get_database),
-    status: Optional[str] = None
+    status_filter: Optional[str] = Query(None, alias="status"),
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    exact: bool = False,
+    estimate: bool = False
 ):
     """
     Get total count of users (for pagination)
     
     Parameters:
     - status: Filter by user status (e.g., 'active', 'pending', 'suspended')
+    - city / state: Filter by location
+    - exact: Count the users collection instead of reading the maintained counters
+    - estimate: Without filters, return the collection-metadata estimate of all users
     """
-    print(f"=== Get Users Count Request ===")
-    print(f"Current user: {current_user['user_id']}")
-    print(f"Status filter: {status}")
-    
     try:
         # Build query filter
         query_filter = {"is_active": True}
-        if status:
-            query_filter["status"] = status
-        
-        # Count users
-        count = await db.users.count_documents(query_filter)
+        # Same normalization as the counters, so exact counts and counters agree
+        if status_filter:
+            query_filter["status"] = {"$in": [None, UNKNOWN_STATUS]} if status_filter == UNKNOWN_STATUS else status_filter
+        if city:
+            query_filter.update(location_fields(city=city))
+        if state:
+            query_filter.update(location_fields(state=state))
+        filters = [("status", status_filter), ("city", city), ("state", state)]
+        filters = [(field, value) for field, value in filters if value]
         
-        print(f"Total users count: {count} (filter: {query_filter})")
+        if estimate and not filters:
+            count = await user_counters.estimated_total()
+            source = "estimate"
+        elif exact or len(filters) > 1:
+            # Counters are kept per single dimension; combinations need a real count
+            count = await db.users.count_documents(query_filter)
+            source = "exact"
+        else:
+            key = counter_key(*filters[0]) if filters else TOTAL_KEY
+            count = await user_counters.get(key)
+            source = "counter"
         
         return {
             "total_users": count,
-            "filter": query_filter
+            "filter": query_filter,
+            "source": source
         }
         
     except Exception as e:
-        print(f"Error counting users: {e}")
+        logger.exception("Error counting users")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to count users"
@@ -299,85 +357,43 @@ async def get_users_count(
 
 @users_router.get("/search", response_model=list[UserListResponse])
 async def search_users(
+    response: Response,
     current_user=Depends(get_current_user), 
     db=Depends(get_database),
     q: str = None,
-    limit: Optional[int] = 50,
-    skip: Optional[int] = 0
+    limit: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None
 ):
     """
     Search users by name, email, or char_id
     
     Parameters:
     - q: Search query (name, email, or char_id)
-    - limit: Maximum number of users to return (default: 50, max: 100)
-    - skip: Number of users to skip for pagination (default: 0)
+    - limit: Maximum number of users to return (default: 20, max: 100)
+    - skip: Number of users to skip for pagination (default: 0, ignored when cursor is given)
+    - cursor: Continuation token from the X-Next-Cursor header of the previous page
     """
-    print(f"=== Search Users Request ===")
-    print(f"Current user: {current_user['user_id']}")
-    print(f"Search query: {q}, Limit: {limit}, Skip: {skip}")
-    
     if not q or not q.strip():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Search query is required"
         )
     
-    # Validate parameters
-    if limit and (limit < 1 or limit > 100):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Limit must be between 1 and 100"
-        )
-    
-    if skip and skip < 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Skip must be non-negative"
-        )
-    
     try:
         # Clean search query
         search_query = q.strip()
         
-        # Build search filter using regex for partial matching
-        search_filter = {
-            "is_active": True,
-            "$or": [
-                {"name": {"$regex": search_query, "$options": "i"}},  # Case-insensitive name search
-                {"email": {"$regex": search_query, "$options": "i"}},  # Case-insensitive email search
-                {"char_id": {"$regex": f"^{search_query}$", "$options": "i"}},  # Exact char_id match
-                {"user_id": {"$regex": f"^{search_query}$", "$options": "i"}}   # Exact user_id match
-            ]
-        }
-        
-        # Find users with search filter
-        cursor = db.users.find(
-            search_filter,
-            {
-                "user_id": 1,
-                "char_id": 1,
-                "name": 1,
-                "email": 1,
-                "phone_no": 1,
-                "city": 1,
-                "state": 1,
-                "status": 1,
-                "is_active": 1,
-                "created_at": 1,
-                "_id": 0  # Exclude MongoDB _id
-            }
-        ).sort("created_at", -1)  # Sort by creation date, newest first
-        
-        # Apply pagination
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+        # Exact ids, then name prefix, email prefix and word matches, each an indexed range scan
+        after = decode_cursor(cursor, len(SEARCH_SORT)) if cursor else None
+        users = await search_index.search_users(db, search_query, limit, 0 if cursor else skip, after)
         
-        users = await cursor.to_list(length=None)
+        next_page = next_cursor(users, limit, SEARCH_SORT)
+        if next_page:
+            response.headers[NEXT_CURSOR_HEADER] = next_page
         
-        print(f"Found {len(users)} users matching search query: {search_query}")
+        # Search terms are often names or emails, so only their length is logged
+        logger.debug("Search of %d characters matched %d users", len(search_query), len(users))
         
         # Transform the data to match the response model
         user_list = []
@@ -398,23 +414,162 @@ async def search_users(
         
         return user_list
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error searching users: {e}")
+        logger.exception("Error searching users")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to search users"
         )
 
+@users_router.get("/duplicate-images")
+async def get_duplicate_images(
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    user_id: Optional[str] = None,
+    limit: Optional[int] = 50
+):
+    """
+    Verification images that closely match images submitted by other accounts (admin only)
+    
+    Parameters:
+    - user_id: Only show images uploaded by this user
+    - limit: Maximum number of flagged images to return (default: 50, max: 500)
+    """
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    if limit < 1 or limit > 500:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Limit must be between 1 and 500"
+        )
+    
+    query_filter = {"flagged": True}
+    if user_id:
+        query_filter["user_id"] = user_id
+    
+    entries = await db.image_hashes.find(query_filter, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(None)
+    return {
+        "count": len(entries),
+        "duplicates": entries
+    }
+
+@users_router.get("/export")
+async def export_users(
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+    status_filter: Optional[str] = Query(None, alias="status")
+):
+    """
+    Stream all active users as newline-delimited JSON (admin only)
+    
+    Parameters:
+    - status: Filter by user status (e.g., 'active', 'pending', 'suspended')
+    """
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    query_filter = {"is_active": True}
+    if status_filter:
+        query_filter["status"] = status_filter
+    
+    async def generate():
+        # One index-ordered cursor streamed in batches; memory stays flat for any user count
+        users_cursor = db.users.find(
+            query_filter,
+            {
+                "user_id": 1,
+                "char_id": 1,
+                "name": 1,
+                "email": 1,
+                "phone_no": 1,
+                "city": 1,
+                "state": 1,
+                "status": 1,
+                "is_active": 1,
+                "created_at": 1,
+                "_id": 0
+            },
+            batch_size=settings.user_export_batch_size
+        ).sort(USER_LIST_SORT)
+        async for user in users_cursor:
+            yield json.dumps(user, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)) + "\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=users.ndjson"}
+    )
+
+@users_router.put("/{user_id}/access")
+async def update_user_access(
+    user_id: str,
+    is_active: Optional[bool] = Form(None),
+    is_admin: Optional[bool] = Form(None),
+    current_user=Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Activate or deactivate a user, or change their admin flag (admin only)
+    
+    Deactivation ends every session of the user. Any change makes access tokens
+    issued with the old claims fall back to the user record until they expire.
+    """
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    update_data = {}
+    if is_active is not None:
+        update_data["is_active"] = is_active
+    if is_admin is not None:
+        update_data["is_admin"] = is_admin
+    if not update_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing to update"
+        )
+    
+    user = await db.users.find_one({"user_id": user_id})
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    await db.users.update_one(
+        {"user_id": user_id},
+        {"$set": {**update_data, "updated_at": datetime.now(timezone.utc)}}
+    )
+    await claims_changed(user_id)
+    if is_active is False:
+        await revoke_user_sessions(user_id)
+    if is_active is not None and is_active != user.get("is_active", True):
+        await user_counters.user_changed(user, update_data)
+    
+    return {
+        "message": "User access updated successfully",
+        "user_id": user_id,
+        "is_active": update_data.get("is_active", user.get("is_active", True)),
+        "is_admin": update_data.get("is_admin", user.get("is_admin", False))
+    }
+
 @users_router.get("/{user_id}", response_model=UserProfileResponse)
 async def get_user_by_id(user_id: str, current_user=Depends(get_current_user), db=Depends(get_database)):
     """
     Get user by user_id or char_id
     Supports both 16-character user_id and 8-character char_id
     """
-    print(f"=== Get User by ID Request ===")
-    print(f"User ID/Char ID: {user_id}")
-    print(f"Current user: {current_user['user_id']}")
-    
     if not user_id or not user_id.strip():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -430,25 +585,15 @@ async def get_user_by_id(user_id: str, current_user=Depends(get_current_user), d
     # Check if user_id is a valid user_id (16-character hex string)
     try:
         if len(user_id) == 16 and all(c in '0123456789abcdefABCDEF' for c in user_id):
-            print(f"Searching by user_id: {user_id}")
             user = await db.users.find_one({"user_id": user_id})
-            if user:
-                print(f"Found user by user_id: {user.get('user_id')}")
-        else:
-            print(f"Not a valid user_id, searching by char_id: {user_id}")
     except Exception as e:
-        print(f"Error checking user_id validity: {e}")
-        pass
+        logger.warning("Error looking up user_id %s: %s", user_id, e)
     
     # If not found by user_id, try to find by char_id
     if not user:
-        print(f"Searching by char_id: {user_id}")
         user = await db.users.find_one({"char_id": user_id})
-        if user:
-            print(f"Found user by char_id: {user.get('char_id')}")
     
     if not user:
-        print(f"User not found with ID/char_id: {user_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User not found with ID or Char ID: {user_id}"
@@ -461,8 +606,6 @@ async def get_user_by_id(user_id: str, current_user=Depends(get_current_user), d
             detail="User account is deactivated"
         )
     
-    print(f"Found user: {user.get('user_id')} with char_id: {user.get('char_id')}")
-    
     # Ensure all required fields are present
     user_data = {
         "_id": user["user_id"],  # Use user_id as the id
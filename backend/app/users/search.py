@@ -0,0 +1,152 @@
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from app.utils.pagination import keyset_filter
+
+logger = logging.getLogger(__name__)
+
+# Edge n-grams are indexed from this length up to MAX_PREFIX_LENGTH characters
+MIN_PREFIX_LENGTH = 1
+MAX_PREFIX_LENGTH = 20
+
+USER_LIST_PROJECTION = {
+    "user_id": 1,
+    "char_id": 1,
+    "name": 1,
+    "email": 1,
+    "phone_no": 1,
+    "city": 1,
+    "state": 1,
+    "status": 1,
+    "is_active": 1,
+    "created_at": 1,
+    "name_lower": 1,
+    "email_lower": 1,
+    "_id": 0  # Exclude MongoDB _id
+}
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, accent-folded, whitespace-collapsed form used for indexing and queries"""
+    if not text:
+        return ""
+    folded = unicodedata.normalize("NFKD", text)
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(folded.lower().split())
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.split(r"[^\w]+", text) if word]
+
+def _prefixes(word: str) -> List[str]:
+    return [word[:length] for length in range(MIN_PREFIX_LENGTH, min(len(word), MAX_PREFIX_LENGTH) + 1)]
+
+def build_search_fields(name: Optional[str], email: Optional[str], char_id: Optional[str] = None) -> Dict:
+    """Normalized fields and edge n-gram tokens stored on each user for indexed search"""
+    name_lower = normalize(name)
+    email_lower = normalize(email)
+    tokens = set()
+    for word in _words(name_lower):
+        tokens.update(_prefixes(word))
+    # The email local part is searchable word by word, like a name
+    for word in _words(email_lower.split("@")[0]):
+        tokens.update(_prefixes(word))
+    fields = {
+        "name_lower": name_lower,
+        "email_lower": email_lower,
+        "search_tokens": sorted(tokens)
+    }
+    if char_id:
+        fields["char_id_lower"] = char_id.lower()
+    return fields
+
+# Upper bound of a prefix range: sorts after every string that starts with the prefix
+PREFIX_RANGE_END = "\U0010ffff"
+
+def _prefix_range(prefix: str) -> Dict:
+    return {"$gte": prefix, "$lt": prefix + PREFIX_RANGE_END}
+
+def search_tiers(query: str) -> List[Tuple[Dict, Optional[str]]]:
+    """
+    Indexed (filter, key field) per match tier, best first: exact user_id/char_id,
+    name prefix, email prefix, then name/email words matched by edge n-grams. Each
+    tier excludes the users of the tiers before it and is read in (key field,
+    user_id) order from its compound index, so it can be paged with a keyset filter.
+    """
+    query_lower = normalize(query)
+    prefix = _prefix_range(query_lower)
+    not_exact = {"user_id": {"$ne": query_lower}, "char_id_lower": {"$ne": query_lower}}
+    tiers = [
+        ({"is_active": True, "$or": [{"user_id": query_lower}, {"char_id_lower": query_lower}]}, None),
+        ({"is_active": True, **not_exact, "name_lower": prefix}, "name_lower"),
+        ({"is_active": True, **not_exact, "name_lower": {"$not": prefix}, "email_lower": prefix}, "email_lower")
+    ]
+    words = [word[:MAX_PREFIX_LENGTH] for word in _words(query_lower)]
+    if words:
+        tiers.append(({
+            "is_active": True,
+            **not_exact,
+            "name_lower": {"$not": prefix},
+            "email_lower": {"$not": prefix},
+            "search_tokens": {"$all": words}
+        }, None))
+    return tiers
+
+def _tier_sort(key_field: Optional[str]) -> List[Tuple[str, int]]:
+    return [(key_field, 1), ("user_id", 1)] if key_field else [("user_id", 1)]
+
+async def search_users(db, query: str, limit: int, skip: int = 0, after: Optional[List] = None) -> List[Dict]:
+    """
+    Users matching `query`, tier by tier (see search_tiers). Every page is read with
+    bounded index range scans. `after` is the (search_tier, search_key, user_id)
+    key of the last user of the previous page; both are set on returned users.
+    """
+    users: List[Dict] = []
+    for tier, (query_filter, key_field) in enumerate(search_tiers(query)):
+        if after is not None:
+            if tier < after[0]:
+                continue
+            if tier == after[0]:
+                key = list(after[1:]) if key_field else [after[2]]
+                query_filter = {"$and": [query_filter, keyset_filter(_tier_sort(key_field), key)]}
+        if skip:
+            skipped = await db.users.count_documents(query_filter, limit=skip)
+            if skipped < skip:
+                # The whole tier lies before the requested offset
+                skip -= skipped
+                continue
+        page = await db.users.find(query_filter, USER_LIST_PROJECTION).sort(
+            _tier_sort(key_field)
+        ).skip(skip).limit(limit - len(users)).to_list(None)
+        skip = 0
+        for user in page:
+            user["search_tier"] = tier
+            user["search_key"] = user.get(key_field, "") if key_field else ""
+        users.extend(page)
+        if len(users) >= limit:
+            break
+    return users
+
+async def backfill_search_fields(db, batch_size: int = 500) -> int:
+    """Populate search fields for users created before they existed"""
+    updated = 0
+    cursor = db.users.find(
+        {"$or": [{"search_tokens": {"$exists": False}}, {"char_id_lower": {"$exists": False}}]},
+        {"_id": 1, "name": 1, "email": 1, "char_id": 1}
+    )
+    operations = []
+    async for user in cursor:
+        operations.append(UpdateOne(
+            {"_id": user["_id"]},
+            {"$set": build_search_fields(user.get("name"), user.get("email"), user.get("char_id"))}
+        ))
+        if len(operations) >= batch_size:
+            await db.users.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    if updated:
+        logger.info("Backfilled search fields for %d users", updated)
+    return updated
@@ -1,29 +1,316 @@
 import asyncio
+import hashlib
+import io
+import os
+import re
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+from app.config import settings
+from app.utils.file_handler import upload_url_to_disk_path
 
-async def check_document_authenticity(file_path: str) -> bool:
+# Bump when the checks change so cached reports from older logic are not reused
+ENGINE_VERSION = "2"
+
+PDF_EXTENSIONS = {".pdf"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+# Tools whose presence in producer/software metadata suggests the file was edited
+EDITING_TOOLS = [
+    "photoshop", "gimp", "illustrator", "inkscape", "paint.net", "pixlr", "canva",
+    "pdfescape", "sejda", "smallpdf", "ilovepdf", "pdf-xchange", "foxit phantompdf",
+    "nitro pro", "pdfelement", "acrobat pro"
+]
+
+# Low and medium findings add up towards forgery_score_threshold; a single high
+# finding fails the file on its own (see is_authentic)
+SEVERITY_WEIGHTS = {"low": 0.1, "medium": 0.25, "high": 0.6}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_report_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_in_flight: Dict[str, asyncio.Future] = {}
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.analysis_workers)
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+class UnreadableFile(Exception):
+    """The file cannot be analyzed at all; it is rejected rather than scored"""
+
+def _finding(findings: List[Dict], check: str, severity: str, detail: str):
+    findings.append({"check": check, "severity": severity, "detail": detail})
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _pdf_searchable_text(data: bytes) -> bytes:
+    """Raw PDF bytes plus the decompressed contents of object streams (PDF 1.5+ hides objects there)"""
+    parts = [data]
+    for match in re.finditer(rb"/Type\s*/ObjStm.*?stream\r?\n", data, re.S):
+        start = match.end()
+        end = data.find(b"endstream", start)
+        if end == -1:
+            continue
+        try:
+            parts.append(zlib.decompress(data[start:end]))
+        except zlib.error:
+            continue
+    return b"\n".join(parts)
+
+def _parse_pdf_date(value: bytes) -> Optional[datetime]:
+    match = re.match(rb"D?:?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?", value)
+    if not match:
+        return None
+    parts = [int(p) if p else default for p, default in zip(match.groups(), (0, 1, 1, 0, 0, 0))]
+    try:
+        return datetime(*parts)
+    except ValueError:
+        return None
+
+def _analyze_pdf(path: str, findings: List[Dict], metrics: Dict):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(b"%PDF"):
+        raise UnreadableFile("File has a .pdf extension but no PDF header")
+
+    # Incremental updates: every saved revision appends another %%EOF
+    revisions = data.count(b"%%EOF")
+    metrics["pdf_revisions"] = revisions
+    if revisions > 1:
+        severity = "medium" if revisions <= 3 else "high"
+        _finding(findings, "incremental_updates", severity, f"PDF was saved {revisions} times (incremental updates)")
+
+    text = _pdf_searchable_text(data)
+
+    # Producer / creator anomalies
+    producers = {p.strip().decode("latin-1") for p in re.findall(rb"/Producer\s*\((.*?)\)", text)}
+    creators = {c.strip().decode("latin-1") for c in re.findall(rb"/Creator\s*\((.*?)\)", text)}
+    metrics["producers"] = sorted(producers)
+    metrics["creators"] = sorted(creators)
+    if len(producers) > 1:
+        _finding(findings, "multiple_producers", "medium", f"Different producers across revisions: {', '.join(sorted(producers))}")
+    for tool in EDITING_TOOLS:
+        if any(tool in value.lower() for value in producers | creators):
+            _finding(findings, "editing_tool", "low", f"Produced or modified with an editing tool ({tool})")
+            break
+
+    # Creation vs modification dates
+    created = re.search(rb"/CreationDate\s*\((.*?)\)", text)
+    modified = re.search(rb"/ModDate\s*\((.*?)\)", text)
+    created_at = _parse_pdf_date(created.group(1)) if created else None
+    modified_at = _parse_pdf_date(modified.group(1)) if modified else None
+    if created_at and modified_at:
+        if modified_at < created_at:
+            _finding(findings, "date_order", "high", "Modification date is earlier than creation date")
+        elif (modified_at - created_at).total_seconds() > 60:
+            _finding(findings, "modified_after_creation", "low", "Document was modified after it was created")
+
+    # Fonts: the same base font embedded under several subset prefixes hints at text added by another tool
+    subsets: Dict[bytes, set] = {}
+    fonts = set()
+    for name in re.findall(rb"/BaseFont\s*/([A-Za-z0-9+\-_,#.]+)", text):
+        if len(name) > 7 and name[6:7] == b"+":
+            subsets.setdefault(name[7:], set()).add(name[:6])
+            fonts.add(name[7:])
+        else:
+            fonts.add(name)
+    metrics["font_count"] = len(fonts)
+    resubset = sorted(base.decode("latin-1") for base, prefixes in subsets.items() if len(prefixes) > 1)
+    if resubset:
+        _finding(findings, "font_subsets", "medium", f"Fonts embedded as multiple subsets: {', '.join(resubset)}")
+    if len(fonts) > 12:
+        _finding(findings, "font_count", "low", f"Unusually many fonts ({len(fonts)})")
+
+    # Active or embedded content has no place in a signed agreement
+    for marker, label in [(b"/JavaScript", "JavaScript"), (b"/Launch", "launch actions"), (b"/EmbeddedFile", "embedded files")]:
+        if marker in text:
+            _finding(findings, "active_content", "medium", f"PDF contains {label}")
+
+def _analyze_image(path: str, findings: List[Dict], metrics: Dict):
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError as e:
+        _finding(findings, "engine", "low", f"Image analysis unavailable: {e}")
+        return
+
+    with Image.open(path) as img:
+        image_format = img.format
+        exif = img.getexif()
+        rgb = img.convert("RGB")
+
+    # Metadata consistency
+    software = str(exif.get(0x0131, "") or "")
+    if software:
+        metrics["software"] = software
+        if any(tool in software.lower() for tool in EDITING_TOOLS):
+            _finding(findings, "editing_tool", "medium", f"Image saved by editing software ({software})")
+    modified = exif.get(0x0132)
+    original = exif.get_ifd(0x8769).get(0x9003) if exif else None
+    if modified and original and str(modified) != str(original):
+        _finding(findings, "exif_dates", "low", "EXIF modification time differs from capture time")
+
+    # Error level analysis: re-compress and look for regions that respond differently
+    max_side = settings.ela_max_dimension
+    if max(rgb.size) > max_side:
+        rgb.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    rgb.save(buffer, "JPEG", quality=90)
+    buffer.seek(0)
+    with Image.open(buffer) as resaved:
+        original_pixels = np.asarray(rgb, dtype=np.int16)
+        resaved_pixels = np.asarray(resaved.convert("RGB"), dtype=np.int16)
+
+    error = np.abs(original_pixels - resaved_pixels).max(axis=2).astype(np.float32)
+    block = 16
+    height = (error.shape[0] // block) * block
+    width = (error.shape[1] // block) * block
+    if height == 0 or width == 0:
+        return
+    blocks = error[:height, :width].reshape(height // block, block, width // block, block).mean(axis=(1, 3))
+
+    mean = float(blocks.mean())
+    std = float(blocks.std())
+    outlier_ratio = float((blocks > mean + 3 * std).mean()) if std > 0 else 0.0
+    metrics["ela_mean"] = round(mean, 3)
+    metrics["ela_std"] = round(std, 3)
+    metrics["ela_outlier_ratio"] = round(outlier_ratio, 4)
+
+    # ELA is only meaningful for images that were JPEG-compressed to begin with
+    if image_format == "JPEG" and mean > 0 and outlier_ratio > 0.01 and float(blocks.max()) > 4 * mean:
+        severity = "high" if outlier_ratio > 0.05 else "medium"
+        _finding(findings, "error_level_analysis", severity, "Regions with inconsistent compression error levels")
+
+def _report(file_type: str, score: float, findings: List[Dict], metrics: Dict, rejected: Optional[str] = None) -> Dict:
+    return {
+        "file_type": file_type,
+        "score": round(score, 3),
+        "findings": findings,
+        "metrics": metrics,
+        "rejected": rejected,
+        "engine_version": ENGINE_VERSION,
+        "analyzed_at": datetime.now(timezone.utc).isoformat()
+    }
+
+def rejection_report(file_type: str, check: str, detail: str) -> Dict:
+    """Report for a file that could not be analyzed: maximum score, never authentic"""
+    return _report(file_type, 1.0, [{"check": check, "severity": "high", "detail": detail}], {}, rejected=detail)
+
+def is_authentic(report: Dict) -> bool:
+    """Rejected files and any high-severity finding fail; otherwise the score decides"""
+    if report.get("rejected"):
+        return False
+    if any(finding["severity"] == "high" for finding in report["findings"]):
+        return False
+    return report["score"] < settings.forgery_score_threshold
+
+def analyze_file(path: str) -> Dict:
+    """CPU-bound analysis of one file. Runs inside a worker process."""
+    findings: List[Dict] = []
+    metrics: Dict = {}
+    extension = os.path.splitext(path)[1].lower()
+
+    if not os.path.exists(path):
+        return rejection_report("missing", "file", "File not found")
+    if extension in PDF_EXTENSIONS:
+        file_type = "pdf"
+        try:
+            _analyze_pdf(path, findings, metrics)
+        except UnreadableFile as e:
+            return rejection_report(file_type, "pdf_header", str(e))
+    elif extension in IMAGE_EXTENSIONS:
+        file_type = "image"
+        try:
+            _analyze_image(path, findings, metrics)
+        except Exception as e:
+            return rejection_report(file_type, "image_decode", f"Image could not be decoded: {e}")
+    else:
+        # Nothing was checked, so nothing can be vouched for
+        return rejection_report("other", "file_type", f"No analysis available for {extension or 'unknown'} files")
+
+    score = min(1.0, sum(SEVERITY_WEIGHTS[f["severity"]] for f in findings))
+    return _report(file_type, score, findings, metrics)
+
+def _resolve_path(file_path: str) -> str:
+    if os.path.exists(file_path):
+        return file_path
+    return str(upload_url_to_disk_path(file_path))
+
+def _cache_put(key: str, report: Dict):
+    _report_cache[key] = report
+    _report_cache.move_to_end(key)
+    while len(_report_cache) > settings.forgery_cache_size:
+        _report_cache.popitem(last=False)
+
+async def _run_analysis(key: str, disk_path: str, digest: str) -> Dict:
+    loop = asyncio.get_running_loop()
+    report = await loop.run_in_executor(get_executor(), analyze_file, disk_path)
+    report["digest"] = digest
+    report["authentic"] = is_authentic(report)
+    # A file that vanished is not a verdict on its content, so it is not cached by digest
+    if report["file_type"] != "missing":
+        _cache_put(key, report)
+    return report
+
+async def analyze_document(file_path: str, digest: Optional[str] = None) -> Dict:
     """
-    AI-based document forgery detection
-    In production, integrate with actual AI/ML services
+    Forgery analysis report for a file: score in [0, 1], findings and metrics.
+    Reports are cached by content digest, so identical files are analyzed once.
     """
-    # Simulate AI processing delay
-    await asyncio.sleep(1)
-    
-    # Placeholder logic - replace with actual AI implementation
-    # This could integrate with services like:
-    # - AWS Textract
-    # - Google Cloud Document AI
-    # - Custom ML models
-    
-    # For demo purposes, return True (authentic)
-    return True
-
-async def verify_signature_authenticity(signature_path: str, reference_path: str) -> bool:
+    disk_path = _resolve_path(file_path)
+    if not os.path.exists(disk_path):
+        return {**rejection_report("missing", "file", "File not found"), "digest": digest, "authentic": False, "cached": False}
+    if digest is None:
+        digest = await asyncio.to_thread(_sha256_file, disk_path)
+
+    key = f"{ENGINE_VERSION}:{digest}"
+    if key in _report_cache:
+        _report_cache.move_to_end(key)
+        report = _report_cache[key]
+        return {**report, "cached": True}
+
+    # Concurrent requests for the same content share one analysis
+    if key in _in_flight:
+        report = await asyncio.shield(_in_flight[key])
+        return {**report, "cached": True}
+
+    task = asyncio.ensure_future(_run_analysis(key, disk_path, digest))
+    _in_flight[key] = task
+    try:
+        report = await asyncio.shield(task)
+    finally:
+        _in_flight.pop(key, None)
+    return {**report, "cached": False}
+
+async def check_document_authenticity(file_path: str, digest: Optional[str] = None) -> bool:
+    """
+    Local document forgery detection
     """
-    Verify signature authenticity against reference
+    report = await analyze_document(file_path, digest)
+    return report["authentic"]
+
+async def verify_signature_authenticity(signature_path: str, reference_path: Union[str, List[str]]) -> bool:
     """
-    await asyncio.sleep(0.5)
-    
-    # Placeholder for signature verification logic
-    # Could integrate with biometric verification services
-    
-    return True
\ No newline at end of file
+    Advisory check of a signature against one or more reference signatures
+    """
+    # Imported here because the signature engine shares this module's process pool
+    from app.utils.signatures import compare_signature
+
+    references = [reference_path] if isinstance(reference_path, str) else list(reference_path)
+    result = await compare_signature(signature_path, references)
+    return result["strokes_found"] and not result["below_threshold"]
@@ -0,0 +1,232 @@
+import logging
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.config import settings
+from app.database import db
+from app.utils.blockchain import blockchain
+from app.utils.file_handler import digest_entries
+from app.utils.merkle import hash_leaf, build_merkle_tree, merkle_proof, verify_merkle_proof
+
+logger = logging.getLogger(__name__)
+
+def compute_document_digest(document_id: str, file_paths: List[str], file_digests: Optional[List[Dict[str, str]]] = None) -> str:
+    """Digest of the finalized document that is committed as a Merkle leaf"""
+    payload = json.dumps({
+        "document_id": document_id,
+        "files": list(file_paths),
+        # SHA-256 of each file's bytes, so the anchor covers contents and not just paths. Hashed
+        # as a {path: digest} map, so anchors made before digests were stored as lists still verify
+        "file_digests": {entry["path"]: entry["digest"] for entry in digest_entries(file_digests)}
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class AnchorService:
+    """
+    Batches document finalizations and anchors them with one block per batch.
+
+    Each batch becomes a Merkle tree over the document digests; only the root is
+    written to the chain and every document gets its inclusion proof. A batch that
+    fails goes back to the front of the queue and keeps any anchor it already got,
+    so a retry writes the same proofs instead of orphaning the stored block.
+    """
+
+    def __init__(self, batch_size: int, window_seconds: float):
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self.pending: List[Dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        await self._recover()
+        self._task = asyncio.create_task(self._run())
+
+    async def _recover(self):
+        """Queue finalized documents whose anchoring was lost to a failure or restart"""
+        cursor = db.database.documents.find(
+            {"anchor_digest": {"$exists": True}, "blockchain": {"$ne": True}},
+            {"anchor_digest": 1}
+        )
+        recovered = 0
+        async for document in cursor:
+            self.submit(str(document["_id"]), document["anchor_digest"])
+            recovered += 1
+        if recovered:
+            logger.info("Re-queued %d unanchored documents", recovered)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Anchor whatever is still waiting; anything left is re-queued on the next start
+        while self.pending:
+            if not await self.flush():
+                logger.error("Stopping with %d documents not anchored", len(self.pending))
+                break
+
+    def submit(self, document_id: str, digest: str) -> asyncio.Future:
+        """Queue a document for the next anchor batch. The future resolves to its anchor record."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append({"document_id": document_id, "digest": digest, "future": future})
+        if len(self.pending) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+        return future
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.pending:
+                # Failed batches wait for the next window before being retried
+                if not await self.flush():
+                    break
+
+    async def flush(self) -> bool:
+        """Anchor one batch. Returns False, with the batch queued again, when it failed."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch = self.pending[:self.batch_size]
+            self.pending = self.pending[self.batch_size:]
+            if not batch:
+                return True
+
+            try:
+                unanchored = [item for item in batch if "anchor" not in item]
+                if unanchored:
+                    for item, anchor in zip(unanchored, await self._anchor_batch(unanchored)):
+                        item["anchor"] = anchor
+                anchors = [item["anchor"] for item in batch]
+                updates = [
+                    UpdateOne(
+                        {"_id": ObjectId(item["document_id"])},
+                        {
+                            "$set": {
+                                "blockchain": True,
+                                "blockchain_hash": anchor["block_hash"],
+                                "blockchain_anchor": anchor
+                            }
+                        }
+                    )
+                    for item, anchor in zip(batch, anchors)
+                ]
+                await db.database.documents.bulk_write(updates, ordered=False)
+            except Exception:
+                logger.exception("Error anchoring batch of %d documents, will retry", len(batch))
+                self.pending = batch + self.pending
+                return False
+
+            for item, anchor in zip(batch, anchors):
+                if not item["future"].done():
+                    item["future"].set_result(anchor)
+            logger.info("Anchored %d documents in block %s", len(batch), anchors[-1]["block_index"])
+            return True
+
+    async def _anchor_batch(self, batch: List[Dict]) -> List[Dict]:
+        leaves = [hash_leaf(item["digest"]) for item in batch]
+        levels = build_merkle_tree(leaves)
+        root = levels[-1][0]
+        anchored_at = datetime.now(timezone.utc).isoformat()
+
+        block = await blockchain.add_block({
+            "type": "merkle_anchor",
+            "merkle_root": root,
+            "document_count": len(batch),
+            "timestamp": anchored_at
+        })
+        block_index = block["index"]
+        block_hash = block["hash"]
+
+        return [
+            {
+                "digest": item["digest"],
+                "merkle_root": root,
+                "leaf_index": i,
+                "proof": merkle_proof(levels, i),
+                "block_index": block_index,
+                "block_hash": block_hash,
+                "anchored_at": anchored_at
+            }
+            for i, item in enumerate(batch)
+        ]
+
+async def verify_document_anchor(document: Dict) -> Dict:
+    """Check a document against its stored inclusion proof and anchor block in O(log n)"""
+    anchor = document.get("blockchain_anchor")
+    if not anchor:
+        return {"verified": False, "anchored": False, "reason": "Document has not been anchored yet"}
+
+    digest = compute_document_digest(
+        str(document["_id"]),
+        document.get("final_docs") or [],
+        document.get("final_docs_digests")
+    )
+    digest_matches = digest == anchor["digest"]
+    proof_valid = verify_merkle_proof(hash_leaf(digest), anchor["proof"], anchor["merkle_root"])
+
+    # Direct index lookup of the anchor block, no chain walk
+    block_index = anchor["block_index"]
+    if block_index >= len(blockchain.chain):
+        # Anchored by another process after this one loaded the chain
+        await blockchain.sync()
+    block = blockchain.chain[block_index] if block_index < len(blockchain.chain) else None
+    block_matches = bool(
+        block
+        and block["hash"] == anchor["block_hash"]
+        and isinstance(block.get("data"), dict)
+        and block["data"].get("merkle_root") == anchor["merkle_root"]
+    )
+
+    return {
+        "verified": digest_matches and proof_valid and block_matches,
+        "anchored": True,
+        "digest_matches": digest_matches,
+        "proof_valid": proof_valid,
+        "block_matches": block_matches,
+        "merkle_root": anchor["merkle_root"],
+        "block_index": block_index,
+        "block_hash": anchor["block_hash"],
+        "proof_length": len(anchor["proof"]),
+        "anchored_at": anchor.get("anchored_at")
+    }
+
+async def backfill_file_digests() -> int:
+    """
+    Rewrite path-keyed maps stored before they became lists: {path: digest} file
+    digests into [{path, digest}] and {path: report} forgery reports into [{path, report}]
+    """
+    modified = 0
+    for field, value_key in (
+        ("upload_raw_docs_digests", "digest"),
+        ("final_docs_digests", "digest"),
+        ("ai_forgery_reports", "report")
+    ):
+        result = await db.database.documents.update_many(
+            {field: {"$type": "object"}},
+            [{"$set": {field: {"$map": {
+                "input": {"$objectToArray": f"${field}"},
+                "in": {"path": "$$this.k", value_key: "$$this.v"}
+            }}}}]
+        )
+        modified += result.modified_count
+    if modified:
+        logger.info("Converted path-keyed file maps of %d documents to lists", modified)
+    return modified
+
+# Global anchor service instance
+anchor_service = AnchorService(settings.anchor_batch_size, settings.anchor_batch_window_seconds)
@@ -0,0 +1,199 @@
+import logging
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils.file_handler import upload_url_to_disk_path
+
+logger = logging.getLogger(__name__)
+
+# Cascade classifiers live in each worker process and are loaded once by the pool initializer
+_face_cascade = None
+_eye_cascade = None
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _load_cascades():
+    global _face_cascade, _eye_cascade
+    if _face_cascade is None:
+        import cv2
+        _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        _eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+def _init_worker():
+    try:
+        _load_cascades()
+    except Exception as e:
+        logger.warning("Biometric worker could not load cascades: %s", e)
+
+def _scale_boxes(boxes, scale: float) -> List[List[int]]:
+    return [[int(round(v / scale)) for v in box] for box in boxes]
+
+# Face embeddings: uniform local binary pattern histograms over a grid of the aligned face crop
+EMBEDDING_FACE_SIZE = 96
+EMBEDDING_GRID = 6
+LBP_BINS = 59
+EMBEDDING_DIMENSION = EMBEDDING_GRID * EMBEDDING_GRID * LBP_BINS
+_lbp_lookup = None
+
+def _uniform_lbp_lookup():
+    """Map the 256 LBP codes to 58 uniform patterns plus one bin for everything else"""
+    global _lbp_lookup
+    if _lbp_lookup is None:
+        import numpy as np
+        lookup = np.full(256, LBP_BINS - 1, dtype=np.uint8)
+        next_bin = 0
+        for code in range(256):
+            bits = [(code >> i) & 1 for i in range(8)]
+            transitions = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+            if transitions <= 2:
+                lookup[code] = next_bin
+                next_bin += 1
+        _lbp_lookup = lookup
+    return _lbp_lookup
+
+def face_embedding(gray, box) -> List[float]:
+    """
+    L2-normalized LBP embedding of the face inside `box` of a grayscale image.
+    A texture descriptor: different people can score well above the configured
+    thresholds, so similarities are advisory and must not gate identity.
+    """
+    import cv2
+    import numpy as np
+
+    x, y, w, h = box
+    face = cv2.resize(gray[y:y + h, x:x + w], (EMBEDDING_FACE_SIZE, EMBEDDING_FACE_SIZE), interpolation=cv2.INTER_AREA)
+
+    center = face[1:-1, 1:-1]
+    codes = np.zeros(center.shape, dtype=np.uint8)
+    offsets = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+    size = EMBEDDING_FACE_SIZE
+    for bit, (dy, dx) in enumerate(offsets):
+        neighbor = face[1 + dy:size - 1 + dy, 1 + dx:size - 1 + dx]
+        codes |= (neighbor >= center).astype(np.uint8) << bit
+    patterns = _uniform_lbp_lookup()[codes]
+
+    cell = patterns.shape[0] // EMBEDDING_GRID
+    histograms = []
+    for row in range(EMBEDDING_GRID):
+        for col in range(EMBEDDING_GRID):
+            block = patterns[row * cell:(row + 1) * cell, col * cell:(col + 1) * cell]
+            histograms.append(np.bincount(block.ravel(), minlength=LBP_BINS))
+    vector = np.concatenate(histograms).astype(np.float32)
+
+    # Hellinger mapping, then unit length so cosine similarity is a plain dot product
+    vector = np.sqrt(vector / max(vector.sum(), 1.0))
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+def detect_faces_and_eyes(path: str, max_dimension: int, with_embedding: bool = False) -> Dict:
+    """Detect faces and eyes in an image. Runs inside a worker process."""
+    try:
+        import cv2
+    except ImportError as e:
+        return {"available": False, "error": str(e)}
+
+    _load_cascades()
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return {"available": True, "readable": False, "faces": 0, "eyes": 0, "face_boxes": [], "eye_boxes": []}
+
+    # Downscale before detection; cascade cost grows with pixel count
+    height, width = gray.shape[:2]
+    scale = min(1.0, max_dimension / float(max(height, width)))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    gray = cv2.equalizeHist(gray)
+
+    faces = _face_cascade.detectMultiScale(
+        gray,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        minSize=(30, 30),
+        flags=cv2.CASCADE_SCALE_IMAGE
+    )
+    eyes = _eye_cascade.detectMultiScale(
+        gray,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        minSize=(10, 10),
+        flags=cv2.CASCADE_SCALE_IMAGE
+    )
+
+    embedding = None
+    if with_embedding and len(faces) > 0:
+        largest_face = max(faces, key=lambda box: box[2] * box[3])
+        embedding = face_embedding(gray, largest_face)
+
+    return {
+        "available": True,
+        "readable": True,
+        "embedding": embedding,
+        "faces": len(faces),
+        "eyes": len(eyes),
+        # Boxes are reported in original image coordinates
+        "face_boxes": _scale_boxes(faces, scale),
+        "eye_boxes": _scale_boxes(eyes, scale),
+        "image_size": [width, height]
+    }
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.biometric_workers, initializer=_init_worker)
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def detect_biometrics(file_path: str, with_embedding: bool = False) -> Dict:
+    """Run face/eye detection for a stored image without blocking the event loop"""
+    disk_path = file_path if os.path.exists(file_path) else str(upload_url_to_disk_path(file_path))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), detect_faces_and_eyes, disk_path, settings.biometric_max_dimension, with_embedding
+    )
+
+async def extract_face_embedding(file_path: str) -> Optional[List[float]]:
+    """Embedding of the largest face in an image, or None when no face is found"""
+    result = await detect_biometrics(file_path, with_embedding=True)
+    return result.get("embedding")
+
+async def check_verification_images(profile_pic_path: Optional[str], eye_path: Optional[str]) -> Dict:
+    """
+    Check that a selfie contains a face and an eye scan contains an eye.
+    Returns the detection results, a list of problems (empty when the images pass)
+    and the selfie's face embedding when a face was found.
+    """
+    checks = {}
+    if profile_pic_path:
+        checks["profile_pic"] = detect_biometrics(profile_pic_path, with_embedding=True)
+    if eye_path:
+        checks["eye"] = detect_biometrics(eye_path)
+    results = dict(zip(checks.keys(), await asyncio.gather(*checks.values())))
+    # Embeddings are returned separately so they are not stored with the detection results
+    embedding = results["profile_pic"].pop("embedding", None) if "profile_pic" in results else None
+    if "eye" in results:
+        results["eye"].pop("embedding", None)
+
+    errors = []
+    profile_result = results.get("profile_pic")
+    if profile_result and profile_result.get("available"):
+        if not profile_result.get("readable"):
+            errors.append("Profile picture could not be read as an image")
+        elif profile_result["faces"] == 0:
+            errors.append("No face detected in profile picture")
+    eye_result = results.get("eye")
+    if eye_result and eye_result.get("available"):
+        if not eye_result.get("readable"):
+            errors.append("Eye scan could not be read as an image")
+        elif eye_result["eyes"] == 0:
+            errors.append("No eye detected in eye scan")
+
+    return {"results": results, "errors": errors, "embedding": embedding}
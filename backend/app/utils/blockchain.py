@@ -1,11 +1,39 @@
+import logging
+import asyncio
 import hashlib
+import hmac
 import json
+import threading
+import time
 from datetime import datetime, timezone
-from typing import List, Dict
+from typing import List, Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
 
 class SimpleBlockchain:
+    """
+    Hash-linked chain of blocks stored in the blockchain_blocks collection (one
+    document per block, _id = index) and mirrored in memory. A block is appended
+    to the in-memory chain only after it is stored, so anchor proofs never point
+    at a block that a restart would lose. Signed checkpoints and the last full
+    audit are stored too (blockchain_checkpoints, blockchain_audits), so
+    incremental verification resumes after a restart; checkpoints are re-checked
+    against their signatures and the loaded blocks when read back.
+    """
+
     def __init__(self):
         self.chain = []
+        # Signed checkpoints: each one vouches for the hash of block `index`
+        self.checkpoints = []
+        # Checkpoint changes made by verify() (possibly in a worker thread), stored by save_checkpoints()
+        self._checkpoint_writes = []
+        self.last_audit = None
+        self._audit_task = None
+        self._lock = threading.Lock()
+        self._append_lock = asyncio.Lock()
         self.create_genesis_block()
     
     def create_genesis_block(self):
@@ -20,54 +48,218 @@ class SimpleBlockchain:
     
     def get_latest_block(self):
         return self.chain[-1]
+
+    async def load(self):
+        """Rebuild the chain from stored blocks, storing the genesis block on first start"""
+        blocks = await db.database.blockchain_blocks.find({}, {"_id": 0}).sort("_id", 1).to_list(None)
+        if not blocks:
+            try:
+                await db.database.blockchain_blocks.insert_one({"_id": 0, **self.chain[0]})
+                blocks = [self.chain[0]]
+            except DuplicateKeyError:
+                # Another process stored its genesis block first
+                blocks = await db.database.blockchain_blocks.find({}, {"_id": 0}).sort("_id", 1).to_list(None)
+        self.chain = blocks
+        await self._load_checkpoints()
+        self.last_audit = await db.database.blockchain_audits.find_one({}, {"_id": 0}, sort=[("verified_at", -1)])
+        logger.info("Loaded blockchain with %d blocks and %d checkpoints", len(self.chain), len(self.checkpoints))
+
+    async def _load_checkpoints(self):
+        """Keep stored checkpoints whose signature and block hash still match; delete the rest"""
+        stored = await db.database.blockchain_checkpoints.find({}, {"_id": 0}).sort("_id", 1).to_list(None)
+        valid = [checkpoint for checkpoint in stored if self._checkpoint_matches(checkpoint)]
+        if len(valid) < len(stored):
+            rejected = [checkpoint["index"] for checkpoint in stored if checkpoint not in valid]
+            logger.warning("Discarding %d stored checkpoints that no longer verify: %s", len(rejected), rejected)
+            await db.database.blockchain_checkpoints.delete_many({"_id": {"$in": rejected}})
+        with self._lock:
+            self.checkpoints = valid
+
+    async def save_checkpoints(self):
+        """Store checkpoints recorded or invalidated since the last call, in order"""
+        with self._lock:
+            writes, self._checkpoint_writes = self._checkpoint_writes, []
+        for operation, value in writes:
+            if operation == "record":
+                await db.database.blockchain_checkpoints.replace_one({"_id": value["index"]}, {"_id": value["index"], **value}, upsert=True)
+            else:
+                await db.database.blockchain_checkpoints.delete_many({"_id": {"$gte": value}})
+
+    async def save_audit(self, report: Dict):
+        self.last_audit = report
+        await db.database.blockchain_audits.insert_one(dict(report))
+
+    async def sync(self):
+        """Append blocks stored by other processes since the chain was loaded"""
+        cursor = db.database.blockchain_blocks.find({"_id": {"$gte": len(self.chain)}}, {"_id": 0}).sort("_id", 1)
+        async for block in cursor:
+            if block["index"] == len(self.chain):
+                self.chain.append(block)
     
     def calculate_hash(self, block: Dict) -> str:
-        block_string = json.dumps(block, sort_keys=True)
+        # The stored hash is not part of its own input, so blocks can be re-hashed when verifying
+        block_data = {key: value for key, value in block.items() if key != "hash"}
+        block_string = json.dumps(block_data, sort_keys=True)
         return hashlib.sha256(block_string.encode()).hexdigest()
     
-    def add_block(self, data: Dict) -> str:
-        latest_block = self.get_latest_block()
-        new_block = {
-            "index": len(self.chain),
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "data": data,
-            "previous_hash": latest_block["hash"]
+    async def add_block(self, data: Dict) -> Dict:
+        """Store a new block and append it to the chain. Returns the block."""
+        async with self._append_lock:
+            while True:
+                latest_block = self.get_latest_block()
+                new_block = {
+                    "index": len(self.chain),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "data": data,
+                    "previous_hash": latest_block["hash"]
+                }
+                new_block["hash"] = self.calculate_hash(new_block)
+                try:
+                    await db.database.blockchain_blocks.insert_one({"_id": new_block["index"], **new_block})
+                except DuplicateKeyError:
+                    # Another process stored a block at this index; link after it instead
+                    await self.sync()
+                    continue
+                self.chain.append(new_block)
+                return new_block
+
+    def sign_checkpoint(self, index: int, block_hash: str) -> str:
+        message = f"{index}:{block_hash}".encode()
+        return hmac.new(settings.secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+    def record_checkpoint(self, index: int) -> Dict:
+        block = self.chain[index]
+        checkpoint = {
+            "index": index,
+            "hash": block["hash"],
+            "signature": self.sign_checkpoint(index, block["hash"]),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        with self._lock:
+            self.checkpoints.append(checkpoint)
+            self._checkpoint_writes.append(("record", checkpoint))
+        return checkpoint
+
+    def invalidate_checkpoints(self, from_index: int) -> int:
+        """Drop checkpoints vouching for block `from_index` or later. Returns how many were dropped."""
+        with self._lock:
+            kept = [checkpoint for checkpoint in self.checkpoints if checkpoint["index"] < from_index]
+            dropped = len(self.checkpoints) - len(kept)
+            self.checkpoints = kept
+            self._checkpoint_writes.append(("invalidate", from_index))
+        return dropped
+
+    def latest_valid_checkpoint(self) -> Optional[Dict]:
+        """Most recent checkpoint whose signature and block hash still match"""
+        with self._lock:
+            checkpoints = list(self.checkpoints)
+        for checkpoint in reversed(checkpoints):
+            if self._checkpoint_matches(checkpoint):
+                return checkpoint
+        return None
+
+    def _checkpoint_matches(self, checkpoint: Dict) -> bool:
+        index = checkpoint["index"]
+        if index >= len(self.chain):
+            return False
+        expected_signature = self.sign_checkpoint(index, checkpoint["hash"])
+        if not hmac.compare_digest(checkpoint["signature"], expected_signature):
+            return False
+        return self.chain[index]["hash"] == checkpoint["hash"]
+
+    def find_first_corrupted(self, start: int, end: int) -> Optional[int]:
+        """Return the first index in [start, end) whose hash or link is broken"""
+        for i in range(max(start, 1), end):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            # Verify current block hash
+            if current_block["hash"] != self.calculate_hash(current_block):
+                return i
+
+            # Verify link to previous block
+            if current_block["previous_hash"] != previous_block["hash"]:
+                return i
+        return None
+
+    def verify(self, full: bool = False) -> Dict:
+        """Verify blocks after the last valid checkpoint, or the whole chain when full=True"""
+        started = time.perf_counter()
+        # Snapshot the length so blocks appended during an audit are left for the next check
+        end = len(self.chain)
+        checkpoint = None if full else self.latest_valid_checkpoint()
+        start = checkpoint["index"] + 1 if checkpoint else 1
+
+        first_corrupted = self.find_first_corrupted(start, end)
+        elapsed = time.perf_counter() - started
+
+        if first_corrupted is None:
+            blocks_verified = max(0, end - start)
+            # Only advance the checkpoint when new blocks were covered
+            if end > 1 and (checkpoint is None or checkpoint["index"] < end - 1):
+                checkpoint = self.record_checkpoint(end - 1)
+        else:
+            blocks_verified = first_corrupted - start + 1
+            # Checkpoints at or above the bad block vouch for corrupted history; without
+            # them the next incremental check starts below the corruption and reports it
+            dropped = self.invalidate_checkpoints(first_corrupted)
+            if dropped:
+                logger.warning("Blockchain corrupted at block %d, invalidated %d checkpoints", first_corrupted, dropped)
+            checkpoint = self.latest_valid_checkpoint()
+
+        return {
+            "valid": first_corrupted is None,
+            "first_corrupted_index": first_corrupted,
+            "full_audit": full,
+            "from_index": start,
+            "to_index": end - 1,
+            "blocks_verified": blocks_verified,
+            "chain_length": end,
+            "checkpoint_index": checkpoint["index"] if checkpoint else None,
+            "elapsed_seconds": elapsed,
+            "blocks_per_second": blocks_verified / elapsed if elapsed > 0 else None,
+            "verified_at": datetime.now(timezone.utc).isoformat()
         }
-        new_block["hash"] = self.calculate_hash(new_block)
-        self.chain.append(new_block)
-        return new_block["hash"]
 
 # Global blockchain instance
 blockchain = SimpleBlockchain()
 
-async def add_to_blockchain(document_id: str, file_paths: List[str]) -> str:
+async def add_to_blockchain(document_id: str, file_paths: List[str], file_digests: Optional[List[Dict[str, str]]] = None) -> str:
     """Add document information to blockchain"""
     
     # Create document hash from file paths and content
     document_data = {
         "document_id": document_id,
         "files": file_paths,
+        "file_digests": file_digests or [],
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "type": "document_finalization"
     }
     
     # Add to blockchain
-    block_hash = blockchain.add_block(document_data)
-    
-    return block_hash
-
-async def verify_blockchain_integrity() -> bool:
-    """Verify blockchain integrity"""
-    for i in range(1, len(blockchain.chain)):
-        current_block = blockchain.chain[i]
-        previous_block = blockchain.chain[i-1]
-        
-        # Verify current block hash
-        if current_block["hash"] != blockchain.calculate_hash(current_block):
-            return False
-        
-        # Verify link to previous block
-        if current_block["previous_hash"] != previous_block["hash"]:
-            return False
+    block = await blockchain.add_block(document_data)
     
+    return block["hash"]
+
+async def verify_blockchain_integrity(full: bool = False) -> Dict:
+    """Verify blockchain integrity incrementally from the last signed checkpoint"""
+    await blockchain.sync()
+    report = blockchain.verify(full=full)
+    await blockchain.save_checkpoints()
+    return report
+
+async def _run_full_audit():
+    try:
+        await blockchain.sync()
+        report = await asyncio.to_thread(blockchain.verify, True)
+        await blockchain.save_checkpoints()
+        await blockchain.save_audit(report)
+    except Exception as e:
+        logger.exception("Blockchain audit failed")
+
+def start_full_audit() -> bool:
+    """Schedule a full chain audit in a worker thread. Returns False if one is already running."""
+    if blockchain._audit_task and not blockchain._audit_task.done():
+        return False
+    blockchain._audit_task = asyncio.create_task(_run_full_audit())
     return True
@@ -0,0 +1,95 @@
+import logging
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.config import settings
+from app.database import db
+from app.utils.biometrics import EMBEDDING_DIMENSION
+
+logger = logging.getLogger(__name__)
+
+class FaceEmbeddingIndex:
+    """
+    Enrolled face embeddings, persisted in the face_embeddings collection and held
+    in memory as one float32 matrix with a row per user.
+
+    Embeddings are unit length, so the 1:1 selfie score is a single dot product and
+    1:N screening is a matrix-vector product over row batches. Both are advisory:
+    the embedding is a texture descriptor, not a calibrated face recognizer.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self._matrix = np.zeros((0, dimension), dtype=np.float32)
+        self.size = 0
+        self.user_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    async def load(self):
+        """Load every stored embedding into the in-memory matrix"""
+        documents = await db.database.face_embeddings.find({}, {"user_id": 1, "embedding": 1}).to_list(None)
+        self._matrix = np.zeros((max(len(documents), 64), self.dimension), dtype=np.float32)
+        self.size = 0
+        self.user_ids = []
+        self.rows = {}
+        for document in documents:
+            self._set_row(document["user_id"], document["embedding"])
+        logger.info("Loaded %d face embeddings", self.size)
+
+    def _set_row(self, user_id: str, embedding: List[float]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dimension,):
+            return
+        row = self.rows.get(user_id)
+        if row is None:
+            if self.size == self._matrix.shape[0]:
+                # Grow geometrically so enrollment stays amortized O(1)
+                grown = np.zeros((max(64, self._matrix.shape[0] * 2), self.dimension), dtype=np.float32)
+                grown[:self.size] = self._matrix[:self.size]
+                self._matrix = grown
+            row = self.size
+            self.size += 1
+            self.user_ids.append(user_id)
+            self.rows[user_id] = row
+        self._matrix[row] = vector
+
+    async def enroll(self, user_id: str, embedding: List[float], source: str):
+        """Store a user's reference embedding and update the matrix in place"""
+        await db.database.face_embeddings.update_one(
+            {"user_id": user_id},
+            {"$set": {
+                "user_id": user_id,
+                "embedding": embedding,
+                "source": source,
+                "updated_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+        self._set_row(user_id, embedding)
+
+    def is_enrolled(self, user_id: str) -> bool:
+        return user_id in self.rows
+
+    def similarity(self, user_id: str, embedding: List[float]) -> Optional[float]:
+        """Cosine similarity against the user's enrolled face (1:1), or None if not enrolled"""
+        row = self.rows.get(user_id)
+        if row is None:
+            return None
+        return float(self._matrix[row] @ np.asarray(embedding, dtype=np.float32))
+
+    def search(self, embedding: List[float], threshold: float, exclude_user_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Enrolled users whose face is at least `threshold` similar (1:N), best first"""
+        query = np.asarray(embedding, dtype=np.float32)
+        batch_size = settings.face_index_batch_size
+        matches = []
+        for start in range(0, self.size, batch_size):
+            scores = self._matrix[start:min(start + batch_size, self.size)] @ query
+            for offset in np.nonzero(scores >= threshold)[0]:
+                user_id = self.user_ids[start + offset]
+                if user_id != exclude_user_id:
+                    matches.append({"user_id": user_id, "score": float(scores[offset])})
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches[:limit]
+
+# Global face embedding index instance
+face_index = FaceEmbeddingIndex(EMBEDDING_DIMENSION)
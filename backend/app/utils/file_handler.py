@@ -1,65 +1,130 @@
+import logging
 import os
 import uuid
+import asyncio
+import hashlib
 import aiofiles
 from fastapi import UploadFile, HTTPException
 from app.config import settings
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
 
 async def save_uploaded_file(file: UploadFile, subfolder: str) -> str:
     """Save uploaded file to designated folder and return filename"""
+    filename, _ = await save_uploaded_file_with_digest(file, subfolder)
+    return filename
+
+async def save_uploaded_file_with_digest(file: UploadFile, subfolder: str) -> Tuple[str, str]:
+    """Stream uploaded file to disk, hashing it on the way. Returns (filename, sha256 hex digest)"""
     
+    file_path = None
     try:
-        print(f"Starting file save for: {file.filename}")
-        print(f"File size: {file.size if hasattr(file, 'size') else 'unknown'}")
-        print(f"File content type: {file.content_type}")
-        
-        # Validate file size
-        content = await file.read()
-        print(f"Read content length: {len(content)} bytes")
-        
-        if len(content) > settings.max_file_size:
-            raise HTTPException(status_code=413, detail="File too large")
-        
-        if len(content) == 0:
-            raise HTTPException(status_code=400, detail="File is empty")
-        
-        # Reset file pointer
-        await file.seek(0)
-        
         # Generate unique filename
         file_extension = Path(file.filename).suffix
         unique_filename = f"{uuid.uuid4()}{file_extension}"
-        print(f"Generated filename: {unique_filename}")
         
         # Create file path
         file_path = os.path.join(settings.upload_dir, subfolder, unique_filename)
-        print(f"File path: {file_path}")
-        print(f"Absolute file path: {os.path.abspath(file_path)}")
         
         # Ensure directory exists
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
-        # Save file
+        # Stream to disk in chunks, validating size and hashing as we go
+        digest = hashlib.sha256()
+        written = 0
         async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > settings.max_file_size:
+                    raise HTTPException(status_code=413, detail="File too large")
+                digest.update(chunk)
+                await f.write(chunk)
+        
+        if written == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        
+        # Reset file pointer
+        await file.seek(0)
         
         # Verify file was saved
         if os.path.exists(file_path):
             saved_size = os.path.getsize(file_path)
-            print(f"File saved successfully. Size on disk: {saved_size} bytes")
-            
-            if saved_size != len(content):
-                raise Exception(f"File size mismatch: expected {len(content)}, got {saved_size}")
+            if saved_size != written:
+                raise Exception(f"File size mismatch: expected {written}, got {saved_size}")
         else:
             raise Exception("File was not created on disk")
         
-        return unique_filename
+        return unique_filename, digest.hexdigest()
         
     except Exception as e:
-        print(f"Error in save_uploaded_file: {e}")
-        print(f"Error type: {type(e)}")
+        if not isinstance(e, HTTPException):
+            logger.exception("Error saving upload to %s", subfolder)
+        # Don't leave partial files behind
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
         raise e
 
+def upload_url_to_disk_path(url_path: str) -> Path:
+    """Map a stored /uploads/... URL path to its location on disk"""
+    return Path(".") / url_path.lstrip("/")
+
+async def hash_file(file_path) -> str:
+    """SHA-256 of a file on disk, read in chunks"""
+    digest = hashlib.sha256()
+    async with aiofiles.open(file_path, 'rb') as f:
+        while True:
+            chunk = await f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def digest_entries(file_digests: Optional[Union[List[Dict[str, str]], Dict[str, str]]]) -> List[Dict[str, str]]:
+    """
+    File digests as [{path, digest}] entries. Paths contain dots, so they are never
+    stored as field names; documents written before that kept a {path: digest} map.
+    """
+    if not file_digests:
+        return []
+    if isinstance(file_digests, dict):
+        return [{"path": path, "digest": digest} for path, digest in file_digests.items()]
+    return list(file_digests)
+
+async def verify_file_digests(expected: List[Dict[str, str]], max_concurrency: int = 8) -> Dict[str, Dict]:
+    """
+    Re-hash stored files and compare them with their recorded {path, digest} entries.
+    At most max_concurrency files are read at the same time. Results are keyed by path.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def verify_one(url_path: str, recorded: str) -> Tuple[str, Dict]:
+        disk_path = upload_url_to_disk_path(url_path)
+        async with semaphore:
+            if not disk_path.exists():
+                return url_path, {"status": "missing", "recorded_digest": recorded}
+            try:
+                actual = await hash_file(disk_path)
+            except Exception as e:
+                return url_path, {"status": "error", "recorded_digest": recorded, "error": str(e)}
+        return url_path, {
+            "status": "ok" if actual == recorded else "mismatch",
+            "recorded_digest": recorded,
+            "actual_digest": actual
+        }
+    
+    results = await asyncio.gather(*(verify_one(entry["path"], entry["digest"]) for entry in expected))
+    return dict(results)
+
 async def delete_file(file_path: str) -> bool:
     """Delete file from filesystem"""
     try:
@@ -0,0 +1,171 @@
+import logging
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.database import db
+from app.utils.ai_forgery import get_executor
+from app.utils.file_handler import upload_url_to_disk_path
+
+logger = logging.getLogger(__name__)
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def compute_image_hashes(path: str) -> Dict[str, int]:
+    """
+    64-bit perceptual hashes of an image. Runs inside a worker process.
+    pHash: sign of the low-frequency 8x8 DCT block against its median.
+    dHash: sign of horizontal brightness gradients on a 9x8 thumbnail.
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as img:
+        gray = img.convert("L")
+        small = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+        gradient = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+
+    # 2D DCT-II as two matrix products
+    n = np.arange(32)
+    basis = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / 64)
+    low = (basis @ small @ basis.T)[:8, :8].ravel()
+    # The DC term only carries overall brightness, so it is left out of the median
+    phash_bits = low > np.median(low[1:])
+    dhash_bits = (gradient[:, 1:] > gradient[:, :-1]).ravel()
+
+    def to_int(bits) -> int:
+        value = 0
+        for bit in bits:
+            value = (value << 1) | int(bit)
+        return value
+
+    return {"phash": to_int(phash_bits), "dhash": to_int(dhash_bits)}
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hamming distance. A radius query only descends into
+    children whose edge distance lies within [d - radius, d + radius], so lookups
+    touch a small part of the tree for small radii.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = _hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, object]]:
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = _hamming(value, node[0])
+            if distance <= radius:
+                results.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return results
+
+class ImageHashIndex:
+    """
+    Perceptual hashes of every stored verification image, persisted in the
+    image_hashes collection and indexed in memory by a BK-tree on pHash.
+    Candidates are confirmed with dHash before being reported.
+    """
+
+    def __init__(self):
+        self.tree = BKTree()
+
+    async def load(self):
+        """Rebuild the in-memory tree from stored hashes"""
+        self.tree = BKTree()
+        cursor = db.database.image_hashes.find({}, {"user_id": 1, "kind": 1, "path": 1, "phash": 1, "dhash": 1})
+        async for entry in cursor:
+            self._add(entry)
+        logger.info("Loaded %d image hashes", self.tree.size)
+
+    def _add(self, entry: Dict):
+        item = {
+            "user_id": entry["user_id"],
+            "kind": entry["kind"],
+            "path": entry["path"],
+            "dhash": int(entry["dhash"], 16)
+        }
+        self.tree.add(int(entry["phash"], 16), item)
+
+    def find_matches(self, phash: int, dhash: int, exclude_user_id: Optional[str] = None) -> List[Dict]:
+        """Stored images of other users within the configured hamming distance"""
+        radius = settings.image_hash_max_distance
+        matches = []
+        for phash_distance, item in self.tree.search(phash, radius):
+            if item["user_id"] == exclude_user_id:
+                continue
+            dhash_distance = _hamming(dhash, item["dhash"])
+            if dhash_distance > radius:
+                continue
+            matches.append({
+                "user_id": item["user_id"],
+                "kind": item["kind"],
+                "path": item["path"],
+                "phash_distance": phash_distance,
+                "dhash_distance": dhash_distance
+            })
+        matches.sort(key=lambda match: match["phash_distance"] + match["dhash_distance"])
+        return matches
+
+    async def register(self, user_id: str, kind: str, file_path: str) -> List[Dict]:
+        """Hash a newly saved image, record it with any cross-user matches and index it"""
+        disk_path = file_path if os.path.exists(file_path) else str(upload_url_to_disk_path(file_path))
+        loop = asyncio.get_running_loop()
+        hashes = await loop.run_in_executor(get_executor(), compute_image_hashes, disk_path)
+
+        matches = self.find_matches(hashes["phash"], hashes["dhash"], exclude_user_id=user_id)
+        entry = {
+            "user_id": user_id,
+            "kind": kind,
+            "path": file_path,
+            # Stored as hex: 64-bit unsigned values do not fit BSON int64
+            "phash": f"{hashes['phash']:016x}",
+            "dhash": f"{hashes['dhash']:016x}",
+            "matches": matches,
+            "flagged": bool(matches),
+            "created_at": datetime.now(timezone.utc)
+        }
+        await db.database.image_hashes.insert_one(entry)
+        self._add(entry)
+        if matches:
+            logger.warning("%s image of user %s matches %d image(s) of other users", kind, user_id, len(matches))
+        return matches
+
+    async def register_many(self, user_id: str, images: Dict[str, Optional[str]]):
+        """Register several verification images; hashing failures never block an upload"""
+        for kind, file_path in images.items():
+            if not file_path:
+                continue
+            try:
+                await self.register(user_id, kind, file_path)
+            except Exception as e:
+                logger.warning("Error hashing %s image of user %s: %s", kind, user_id, e)
+
+# Global image hash index
+image_hash_index = ImageHashIndex()
@@ -0,0 +1,55 @@
+import hashlib
+from typing import List, Dict
+
+# Domain separation keeps a leaf from ever being confused with an interior node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def hash_leaf(digest: str) -> str:
+    """Hash a hex digest into a Merkle leaf"""
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(digest)).hexdigest()
+
+def hash_pair(left: str, right: str) -> str:
+    """Hash two child nodes into their parent"""
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def build_merkle_tree(leaves: List[str]) -> List[List[str]]:
+    """Build all tree levels bottom-up. The last level holds the root."""
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = []
+        for i in range(0, len(level), 2):
+            left = level[i]
+            # Odd node out is paired with itself
+            right = level[i + 1] if i + 1 < len(level) else level[i]
+            parents.append(hash_pair(left, right))
+        levels.append(parents)
+    return levels
+
+def merkle_proof(levels: List[List[str]], index: int) -> List[Dict]:
+    """Sibling path from leaf `index` up to the root"""
+    proof = []
+    for level in levels[:-1]:
+        sibling_index = index ^ 1
+        if sibling_index >= len(level):
+            sibling_index = index
+        proof.append({
+            "position": "left" if sibling_index < index else "right",
+            "hash": level[sibling_index]
+        })
+        index //= 2
+    return proof
+
+def verify_merkle_proof(leaf: str, proof: List[Dict], root: str) -> bool:
+    """Recompute the root from a leaf and its proof in O(log n)"""
+    node = leaf
+    for step in proof:
+        if step["position"] == "left":
+            node = hash_pair(step["hash"], node)
+        else:
+            node = hash_pair(node, step["hash"])
+    return node == root
@@ -0,0 +1,200 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Latency is recorded in whole microseconds into log-linear buckets: each power
+# of two is split into SUB_COUNT equal sub-buckets, so any recorded value is
+# within 1/SUB_COUNT (about 3%) of the true one, from 1us up to MAX_MICROS
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS
+MAX_MICROS = (1 << 27) - 1  # ~134s; slower requests are counted here
+
+# Powers of two (in microseconds) exported as Prometheus `le` boundaries, 64us .. ~67s
+EXPORT_EXPONENTS = range(6, 27)
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+def bucket_index(value: int) -> int:
+    if value < SUB_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return ((shift + 1) << SUB_BITS) + (value >> shift) - SUB_COUNT
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """[lower, upper) in microseconds of the values counted in bucket `index`"""
+    if index < SUB_COUNT:
+        return index, index + 1
+    shift = (index >> SUB_BITS) - 1
+    mantissa = (index & (SUB_COUNT - 1)) + SUB_COUNT
+    return mantissa << shift, (mantissa + 1) << shift
+
+BUCKETS = bucket_index(MAX_MICROS) + 1
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of request latencies for one series"""
+
+    __slots__ = ("counts", "count", "total_micros", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_micros = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def record(self, micros: int, request_bytes: int, response_bytes: int):
+        if micros > MAX_MICROS:
+            micros = MAX_MICROS
+        self.counts[bucket_index(micros)] += 1
+        self.count += 1
+        self.total_micros += micros
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+    def cumulative(self, exponent: int) -> int:
+        """Number of values below 2**exponent microseconds"""
+        return sum(self.counts[:(exponent - SUB_BITS + 1) << SUB_BITS])
+
+    def quantile(self, q: float) -> float:
+        """Latency in microseconds at quantile `q`, to the precision of one bucket"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                lower, upper = bucket_bounds(index)
+                return (lower + upper - 1) / 2
+        return float(MAX_MICROS)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+class MetricsRegistry:
+    """
+    Request metrics for this process, keyed by (method, route template, status).
+    Only touched from the event loop, so recording needs no locking; with
+    several workers each one serves its own numbers.
+    """
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str, int], LatencyHistogram] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.started_at = time.time()
+
+    def record(self, method: str, route: str, status_code: int, micros: int, request_bytes: int, response_bytes: int):
+        key = (method, route, status_code)
+        histogram = self.series.get(key)
+        if histogram is None:
+            histogram = self.series[key] = LatencyHistogram()
+        histogram.record(micros, request_bytes, response_bytes)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        series = sorted(self.series.items())
+        lines: List[str] = []
+
+        lines.append("# HELP http_requests_total Requests served, by route template and status code.")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status_code), histogram in series:
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status_code)} {histogram.count}")
+
+        lines.append("# HELP http_request_duration_seconds Time from receiving a request to finishing its response.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route, status_code), histogram in series:
+            for exponent in EXPORT_EXPONENTS:
+                le = (1 << exponent) / 1e6
+                labels = _labels(method=method, route=route, status=status_code, le=f"{le:g}")
+                lines.append(f"http_request_duration_seconds_bucket{labels} {histogram.cumulative(exponent)}")
+            labels = _labels(method=method, route=route, status=status_code, le="+Inf")
+            lines.append(f"http_request_duration_seconds_bucket{labels} {histogram.count}")
+            labels = _labels(method=method, route=route, status=status_code)
+            lines.append(f"http_request_duration_seconds_sum{labels} {histogram.total_micros / 1e6}")
+            lines.append(f"http_request_duration_seconds_count{labels} {histogram.count}")
+
+        lines.append("# HELP http_request_duration_quantile_seconds Latency quantiles since start, from the full-resolution histogram.")
+        lines.append("# TYPE http_request_duration_quantile_seconds gauge")
+        for (method, route, status_code), histogram in series:
+            for q in QUANTILES:
+                labels = _labels(method=method, route=route, status=status_code, quantile=q)
+                lines.append(f"http_request_duration_quantile_seconds{labels} {histogram.quantile(q) / 1e6}")
+
+        lines.append("# HELP http_request_size_bytes_total Request body bytes, from Content-Length.")
+        lines.append("# TYPE http_request_size_bytes_total counter")
+        for (method, route, status_code), histogram in series:
+            lines.append(f"http_request_size_bytes_total{_labels(method=method, route=route, status=status_code)} {histogram.request_bytes}")
+
+        lines.append("# HELP http_response_size_bytes_total Response body bytes sent.")
+        lines.append("# TYPE http_response_size_bytes_total counter")
+        for (method, route, status_code), histogram in series:
+            lines.append(f"http_response_size_bytes_total{_labels(method=method, route=route, status=status_code)} {histogram.response_bytes}")
+
+        lines.append("# HELP http_requests_in_flight Requests currently being served.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        for method, count in sorted(self.in_flight.items()):
+            lines.append(f"http_requests_in_flight{_labels(method=method)} {count}")
+
+        lines.append("# HELP process_start_time_seconds Start time of the process since the epoch.")
+        lines.append("# TYPE process_start_time_seconds gauge")
+        lines.append(f"process_start_time_seconds {self.started_at}")
+        return "\n".join(lines) + "\n"
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+def route_template(scope) -> str:
+    """The matched route's path template, so ids in the path do not create new series"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", "")
+    if "endpoint" in scope:
+        # Mounted apps (static uploads) have no route object, only their mount point
+        return f"{scope.get('root_path', '')}/{{path}}"
+    return "<unmatched>"
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and records it under its route template and
+    status code. Pure ASGI, so recording costs a few microseconds and does not
+    buffer the response.
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        method = scope["method"]
+        request_bytes = 0
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                request_bytes = int(value) if value.isdigit() else 0
+                break
+
+        status_code = 500
+        response_bytes = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_flight[method] = registry.in_flight.get(method, 0) + 1
+        started = time.perf_counter_ns()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            micros = (time.perf_counter_ns() - started) // 1000
+            registry.in_flight[method] -= 1
+            registry.record(method, route_template(scope), status_code, micros, request_bytes, response_bytes)
@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    if isinstance(value, dict) and "$oid" in value:
+        return ObjectId(value["$oid"])
+    return value
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque continuation token for the sort-key values of the last item on a page"""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, length: int) -> List[Any]:
+    """Sort-key values from a continuation token. Raises 400 for malformed tokens."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != length:
+            raise ValueError("wrong cursor length")
+        return [_decode_value(value) for value in values]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def keyset_filter(sort: List[Tuple[str, int]], values: Sequence[Any]) -> Dict:
+    """
+    Filter selecting the items that come after `values` in `sort` order, e.g. for
+    [(created_at, -1), (user_id, -1)]: created_at < c OR (created_at == c AND user_id < u).
+    With a matching compound index every page is a bounded index range scan.
+    """
+    clauses = []
+    for position, (field, direction) in enumerate(sort):
+        clause = {prior_field: values[index] for index, (prior_field, _) in enumerate(sort[:position])}
+        clause[field] = {"$lt" if direction < 0 else "$gt": values[position]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def next_cursor(items: List[Dict], limit: int, sort: List[Tuple[str, int]]) -> Optional[str]:
+    """Cursor for the page after `items`, or None when the page was not full"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor([last.get(field) for field, _ in sort])
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils.ai_forgery import get_executor
+from app.utils.file_handler import upload_url_to_disk_path
+
+# Normalized signature canvas (height x width) and feature layout
+CANVAS_HEIGHT = 64
+CANVAS_WIDTH = 128
+PROFILE_ROWS = 32
+PROFILE_COLS = 64
+GRID_ROWS = 8
+GRID_COLS = 16
+HOG_CELL = 16
+HOG_BINS = 9
+
+_feature_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+def _otsu_threshold(gray) -> int:
+    import numpy as np
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    levels = np.arange(256)
+    weight_background = np.cumsum(histogram)
+    weight_foreground = total - weight_background
+    cumulative_mean = np.cumsum(histogram * levels)
+    mean_background = cumulative_mean / np.maximum(weight_background, 1)
+    mean_foreground = (cumulative_mean[-1] - cumulative_mean) / np.maximum(weight_foreground, 1)
+    between_variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+    return int(np.argmax(between_variance))
+
+def _resample(profile, length: int):
+    import numpy as np
+    positions = np.linspace(0, len(profile) - 1, length)
+    return np.interp(positions, np.arange(len(profile)), profile)
+
+def _unit(vector):
+    import numpy as np
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def extract_signature_features(path: str) -> Optional[List[float]]:
+    """
+    Feature vector of a signature image: projection profiles, grid ink density and
+    HOG-style orientation histograms of the binarized, cropped, normalized strokes.
+    Runs inside a worker process. Returns None if no ink is found.
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as img:
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            # Canvas exports draw strokes on a transparent background: flatten onto white
+            rgba = img.convert("RGBA")
+            flattened = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+            flattened.alpha_composite(rgba)
+            gray_image = flattened.convert("L")
+        else:
+            gray_image = img.convert("L")
+    gray_image.thumbnail((1024, 1024))
+    gray = np.asarray(gray_image, dtype=np.uint8)
+
+    # Binarize: the Otsu threshold is the darkest level of the ink class, so a pure
+    # black-and-white image thresholds at the ink level itself
+    ink = gray <= _otsu_threshold(gray)
+    rows = np.nonzero(ink.any(axis=1))[0]
+    cols = np.nonzero(ink.any(axis=0))[0]
+    if len(rows) == 0 or len(cols) == 0 or ink.mean() > 0.5:
+        return None
+
+    # Crop to the strokes and pad to the canvas aspect ratio before resizing
+    cropped = ink[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    height, width = cropped.shape
+    target_width = max(width, int(np.ceil(height * CANVAS_WIDTH / CANVAS_HEIGHT)))
+    target_height = max(height, int(np.ceil(target_width * CANVAS_HEIGHT / CANVAS_WIDTH)))
+    padded = np.zeros((target_height, target_width), dtype=np.uint8)
+    top = (target_height - height) // 2
+    left = (target_width - width) // 2
+    padded[top:top + height, left:left + width] = cropped * 255
+    canvas = np.asarray(
+        Image.fromarray(padded).resize((CANVAS_WIDTH, CANVAS_HEIGHT), Image.BILINEAR),
+        dtype=np.float32
+    ) / 255.0
+
+    # Projection profiles
+    horizontal = _resample(canvas.sum(axis=1), PROFILE_ROWS)
+    vertical = _resample(canvas.sum(axis=0), PROFILE_COLS)
+
+    # Grid density histogram
+    grid = canvas.reshape(GRID_ROWS, CANVAS_HEIGHT // GRID_ROWS, GRID_COLS, CANVAS_WIDTH // GRID_COLS).mean(axis=(1, 3)).ravel()
+
+    # HOG-style features: per-cell histograms of unsigned gradient orientation weighted by magnitude
+    gradient_y, gradient_x = np.gradient(canvas)
+    magnitude = np.hypot(gradient_x, gradient_y)
+    orientation = (np.degrees(np.arctan2(gradient_y, gradient_x)) % 180.0)
+    bins = np.minimum((orientation / (180.0 / HOG_BINS)).astype(np.int64), HOG_BINS - 1)
+    cell_rows = CANVAS_HEIGHT // HOG_CELL
+    cell_cols = CANVAS_WIDTH // HOG_CELL
+    cell_index = (np.arange(CANVAS_HEIGHT)[:, None] // HOG_CELL) * cell_cols + (np.arange(CANVAS_WIDTH)[None, :] // HOG_CELL)
+    hog = np.bincount(
+        (cell_index * HOG_BINS + bins).ravel(),
+        weights=magnitude.ravel(),
+        minlength=cell_rows * cell_cols * HOG_BINS
+    ).reshape(cell_rows * cell_cols, HOG_BINS)
+    hog = np.sqrt(hog)
+    hog /= np.maximum(np.linalg.norm(hog, axis=1, keepdims=True), 1e-6)
+
+    # Each group gets equal weight; the final vector is unit length for dot-product scoring
+    groups = [horizontal, vertical, grid, hog.ravel()]
+    features = np.concatenate([_unit(np.asarray(group, dtype=np.float32)) for group in groups])
+    return _unit(features).astype(np.float32).tolist()
+
+def extract_many(paths: List[str]) -> List[Optional[List[float]]]:
+    """Batch extraction so one worker round trip covers all uncached signatures"""
+    results = []
+    for path in paths:
+        try:
+            results.append(extract_signature_features(path))
+        except Exception:
+            results.append(None)
+    return results
+
+def _disk_path(file_path: str) -> str:
+    return file_path if os.path.exists(file_path) else str(upload_url_to_disk_path(file_path))
+
+def _digest(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def _known(digest: str) -> str:
+    return digest
+
+async def get_signature_features(file_paths: List[str], digests: Optional[List[Optional[str]]] = None) -> List[Optional[List[float]]]:
+    """
+    Features for each signature, cached per content digest. Digests recorded when
+    the files were saved are used as given; only the others are hashed from disk.
+    """
+    disk_paths = [_disk_path(path) for path in file_paths]
+    known = list(digests) if digests is not None else [None] * len(disk_paths)
+    digests = await asyncio.gather(*(
+        _known(digest) if digest else asyncio.to_thread(_digest, path)
+        for path, digest in zip(disk_paths, known)
+    ))
+
+    missing = [
+        (index, path) for index, (path, digest) in enumerate(zip(disk_paths, digests))
+        if digest is not None and digest not in _feature_cache
+    ]
+    if missing:
+        loop = asyncio.get_running_loop()
+        extracted = await loop.run_in_executor(get_executor(), extract_many, [path for _, path in missing])
+        for (index, _), features in zip(missing, extracted):
+            if features is not None:
+                _feature_cache[digests[index]] = features
+        while len(_feature_cache) > settings.signature_cache_size:
+            _feature_cache.popitem(last=False)
+
+    results = []
+    for digest in digests:
+        if digest is not None and digest in _feature_cache:
+            _feature_cache.move_to_end(digest)
+            results.append(_feature_cache[digest])
+        else:
+            results.append(None)
+    return results
+
+async def compare_signature(
+    signature_path: str,
+    reference_paths: List[str],
+    reference_digests: Optional[List[Optional[str]]] = None,
+    signature_digest: Optional[str] = None
+) -> Dict:
+    """
+    Score a signature against a user's reference signatures in one matrix product.
+    The features are non-negative and uncalibrated, so unrelated images also score
+    high: the score is advisory (`below_threshold` flags it for review) and only
+    `strokes_found` is a hard check.
+    """
+    import numpy as np
+
+    if not reference_paths:
+        candidate = (await get_signature_features([signature_path], [signature_digest]))[0]
+        return {"strokes_found": candidate is not None, "score": None, "advisory": True, "below_threshold": False, "references": 0}
+
+    digests = [signature_digest] + (list(reference_digests) if reference_digests is not None else [None] * len(reference_paths))
+    features = await get_signature_features([signature_path] + list(reference_paths), digests)
+    candidate, references = features[0], [f for f in features[1:] if f is not None]
+    if candidate is None or not references:
+        return {"strokes_found": candidate is not None, "score": None, "advisory": True, "below_threshold": False, "references": len(references)}
+
+    scores = np.asarray(references, dtype=np.float32) @ np.asarray(candidate, dtype=np.float32)
+    best = float(scores.max())
+    return {
+        "strokes_found": True,
+        "score": best,
+        "mean_score": float(scores.mean()),
+        "references": len(references),
+        "advisory": True,
+        "below_threshold": best < settings.signature_match_threshold,
+        "threshold": settings.signature_match_threshold
+    }
@@ -1,25 +1,19 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional
 from app.wallet.models import WalletResponse, TransactionResponse, WalletInDB, AddFundsRequest, TransactionType
-from app.auth.utils import verify_token
+from app.auth.tokens import get_current_user_claims
 from app.database import get_database
 from app.utils.file_handler import save_uploaded_file
 from bson import ObjectId
 from datetime import datetime, timezone
 
+logger = logging.getLogger(__name__)
+
 wallet_router = APIRouter()
-security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_database)):
-    user_id = verify_token(credentials.credentials)
-    user = await db.users.find_one({"user_id": user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    return user
+# Authorized from the signed access-token claims; handlers here only need user_id
+get_current_user = get_current_user_claims
 
 @wallet_router.get("/balance", response_model=WalletResponse)
 async def get_wallet_balance(current_user=Depends(get_current_user), db=Depends(get_database)):
@@ -88,8 +82,6 @@ async def get_transaction_history(current_user=Depends(get_current_user), db=Dep
             {"user_id": current_user["user_id"]}
         ).sort("created_at", -1).to_list(None)
         
-        print(f"Found {len(transactions)} transactions for user {current_user['user_id']}")
-        
         result = []
         for txn in transactions:
             try:
@@ -98,13 +90,13 @@ async def get_transaction_history(current_user=Depends(get_current_user), db=Dep
                 
                 # Validate transaction type
                 if transaction_type not in ["credit", "debit", "payment", "refund"]:
-                    print(f"Invalid transaction type: {transaction_type}, defaulting to 'credit'")
+                    logger.debug("Invalid transaction type %s on %s, defaulting to credit", transaction_type, txn["_id"])
                     transaction_type = "credit"
                 
                 # Validate created_at field
                 created_at = txn.get("created_at")
                 if not created_at or not isinstance(created_at, datetime):
-                    print(f"Invalid created_at field: {created_at}, using current time")
+                    logger.debug("Invalid created_at on transaction %s, using current time", txn["_id"])
                     created_at = datetime.now(timezone.utc)
                 
                 # Validate amount field
@@ -112,13 +104,13 @@ async def get_transaction_history(current_user=Depends(get_current_user), db=Dep
                 try:
                     amount = float(amount)
                 except (ValueError, TypeError):
-                    print(f"Invalid amount field: {amount}, defaulting to 0.0")
+                    logger.debug("Invalid amount on transaction %s, defaulting to 0.0", txn["_id"])
                     amount = 0.0
                 
                 # Validate user_id field
                 user_id = txn.get("user_id", "")
                 if not user_id or not isinstance(user_id, str):
-                    print(f"Invalid user_id field: {user_id}, using current user")
+                    logger.debug("Invalid user_id on transaction %s, using current user", txn["_id"])
                     user_id = current_user["user_id"]
                 
                 txn_data = {
@@ -133,16 +125,13 @@ async def get_transaction_history(current_user=Depends(get_current_user), db=Dep
                 }
                 
                 result.append(TransactionResponse(**txn_data))
-                print(f"Successfully processed transaction: {txn.get('_id')}")
             except Exception as e:
-                print(f"Error processing transaction {txn.get('_id', 'unknown')}: {e}")
-                print(f"Transaction data: {txn}")
+                logger.warning("Skipping malformed transaction %s: %s", txn.get("_id", "unknown"), e)
                 continue
         
-        print(f"Returning {len(result)} processed transactions")
         return result
     except Exception as e:
-        print(f"Error in get_transaction_history: {e}")
+        logger.exception("Error fetching transaction history")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching transactions: {str(e)}"
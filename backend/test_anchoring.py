@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for blockchain anchoring: a failed document write is retried with
+the same block, and anchors still verify after the chain is reloaded.
+Needs MongoDB as configured in .env.
+Run from the backend directory: python test_anchoring.py
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.database import connect_to_mongo, close_mongo_connection, db
+from app.utils.anchoring import AnchorService, compute_document_digest, verify_document_anchor
+from app.utils.blockchain import blockchain, SimpleBlockchain
+from app.utils import anchoring
+
+async def create_document():
+    document = {
+        "name": "Anchor Test",
+        "status": "finalized",
+        "final_docs": [],
+        "final_docs_digests": [],
+        "created_at": datetime.now(timezone.utc)
+    }
+    result = await db.database.documents.insert_one(document)
+    document_id = str(result.inserted_id)
+    return document_id, compute_document_digest(document_id, [], [])
+
+async def test_failed_write_is_retried():
+    """A bulk_write failure re-queues the batch and the retry reuses its block"""
+    await connect_to_mongo()
+    await blockchain.load()
+    document_id, digest = await create_document()
+    service = AnchorService(batch_size=8, window_seconds=60)
+    original_bulk_write = AsyncIOMotorCollection.bulk_write
+
+    async def failing_bulk_write(self, *args, **kwargs):
+        raise RuntimeError("simulated write failure")
+
+    try:
+        chain_length = len(blockchain.chain)
+        future = service.submit(document_id, digest)
+
+        AsyncIOMotorCollection.bulk_write = failing_bulk_write
+        try:
+            assert await service.flush() is False
+        finally:
+            AsyncIOMotorCollection.bulk_write = original_bulk_write
+        assert len(service.pending) == 1 and "anchor" in service.pending[0]
+        assert not future.done()
+
+        assert await service.flush() is True
+        anchor = await future
+        assert len(blockchain.chain) == chain_length + 1, "retry must not append another block"
+        assert anchor["block_index"] == chain_length
+
+        document = await db.database.documents.find_one({"_id": ObjectId(document_id)})
+        assert document["blockchain"] is True
+        assert document["blockchain_anchor"]["block_hash"] == anchor["block_hash"]
+        print("✅ Failed write retried with the same block")
+
+        # A restarted process loads the stored chain and still verifies the anchor
+        anchoring.blockchain = reloaded = SimpleBlockchain()
+        await reloaded.load()
+        try:
+            result = await verify_document_anchor(document)
+        finally:
+            anchoring.blockchain = blockchain
+        assert result["verified"] and result["block_matches"], result
+        print("✅ Anchor verified after reloading the chain")
+    finally:
+        await db.database.documents.delete_one({"_id": ObjectId(document_id)})
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    print("🧪 Testing Blockchain Anchoring")
+    print("=" * 60)
+    asyncio.run(test_failed_write_is_retried())
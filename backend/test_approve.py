@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for repeated approvals: approving an already approved document
+succeeds without changing it, while a finalized document is still refused.
+Needs MongoDB as configured in .env.
+Run from the backend directory: python test_approve.py
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.database import connect_to_mongo, close_mongo_connection, db
+from app.documents.resolver import DocumentResolver
+from app.documents.routes import approve_user_join
+
+async def create_document(user_id: str, status: str, is_locked: bool = False) -> str:
+    now = datetime.now(timezone.utc)
+    result = await db.database.documents.insert_one({
+        "involved_users": [user_id],
+        "primary_user": user_id,
+        "name": "Approve Test",
+        "document_code": uuid.uuid4().hex[:6].upper(),
+        "status": status,
+        "is_locked": is_locked,
+        "created_at": now,
+        "updated_at": now
+    })
+    return str(result.inserted_id)
+
+async def approve(document_id: str, user: dict):
+    return await approve_user_join(
+        document_id,
+        user["user_id"],
+        current_user=user,
+        db=db.database,
+        documents=DocumentResolver(db.database)
+    )
+
+async def test_repeated_approve():
+    await connect_to_mongo()
+    user = {"user_id": f"test_{uuid.uuid4().hex[:8]}", "name": "Test User"}
+    pending_id = await create_document(user["user_id"], "pending_approval")
+    finalized_id = await create_document(user["user_id"], "finalized", is_locked=True)
+    try:
+        await approve(pending_id, user)
+        document = await db.database.documents.find_one({"_id": ObjectId(pending_id)})
+        assert document["status"] == "approved", document["status"]
+        updated_at = document["updated_at"]
+        events = await db.database.document_events.count_documents({"document_id": pending_id})
+
+        response = await approve(pending_id, user)
+        assert response["message"] == "User approved successfully", response
+        document = await db.database.documents.find_one({"_id": ObjectId(pending_id)})
+        assert document["updated_at"] == updated_at, "repeat approve must not modify the document"
+        assert await db.database.document_events.count_documents({"document_id": pending_id}) == events
+        print("✅ Repeated approve is a no-op success")
+
+        try:
+            await approve(finalized_id, user)
+            raise AssertionError("approving a finalized document must fail")
+        except HTTPException as e:
+            assert e.status_code == 400, e.status_code
+        print("✅ Finalized document still refused with 400")
+    finally:
+        await db.database.documents.delete_many({"_id": {"$in": [ObjectId(pending_id), ObjectId(finalized_id)]}})
+        await db.database.document_events.delete_many({"document_id": {"$in": [pending_id, finalized_id]}})
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    print("🧪 Testing Repeated Document Approval")
+    print("=" * 60)
+    asyncio.run(test_repeated_approve())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for finalizing a document without uploaded final files.
+The server composes the final PDF itself; needs MongoDB as configured in .env.
+Run from the backend directory: python test_finalize.py
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from bson import ObjectId
+
+from app.database import connect_to_mongo, close_mongo_connection, db
+from app.documents.resolver import DocumentResolver
+from app.documents.routes import finalize_document
+
+async def create_fixture():
+    """Insert an approved, fully paid document with no raw or final files"""
+    user_id = f"test_{uuid.uuid4().hex[:8]}"
+    now = datetime.now(timezone.utc)
+    user = {"user_id": user_id, "name": "Test User", "email": f"{user_id}@example.com", "phone_no": "+919876543210"}
+    await db.database.users.insert_one(user)
+    document = {
+        "involved_users": [user_id],
+        "primary_user": user_id,
+        "upload_raw_docs": [],
+        "final_docs": [],
+        "name": "Finalize Test",
+        "document_code": uuid.uuid4().hex[:6].upper(),
+        "status": "approved",
+        "approved_count": 1,
+        "required_count": 1,
+        "user_approvals": {user_id: {"approved": True, "is_primary": True}},
+        "created_at": now,
+        "updated_at": now
+    }
+    result = await db.database.documents.insert_one(document)
+    document_id = str(result.inserted_id)
+    await db.database.payment_distributions.insert_one({
+        "document_id": document_id,
+        "total_amount": 1.0,
+        "distributions": [{"user_id": user_id, "percentage": 100, "amount": 1.0}]
+    })
+    await db.database.payments.insert_one({
+        "document_id": document_id,
+        "user_id": user_id,
+        "amount": 1.0,
+        "status": "completed"
+    })
+    return user, document_id
+
+async def cleanup(user, document_id):
+    await db.database.users.delete_one({"user_id": user["user_id"]})
+    await db.database.documents.delete_one({"_id": ObjectId(document_id)})
+    await db.database.payment_distributions.delete_many({"document_id": document_id})
+    await db.database.payments.delete_many({"document_id": document_id})
+    await db.database.document_events.delete_many({"document_id": document_id})
+
+async def test_finalize_without_files():
+    """Finalize with no uploaded files must compose the PDF and lock the document"""
+    await connect_to_mongo()
+    user, document_id = await create_fixture()
+    try:
+        response = await finalize_document(
+            document_id,
+            final_documents=None,
+            current_user=user,
+            db=db.database,
+            documents=DocumentResolver(db.database)
+        )
+        print(f"Response: {response}")
+
+        document = await db.database.documents.find_one({"_id": ObjectId(document_id)})
+        assert document["status"] == "finalized", document["status"]
+        assert document["is_locked"] is True
+        assert len(document["final_docs"]) == 1, document["final_docs"]
+        assert document["final_docs"][0].endswith(".pdf")
+        print("✅ Finalize without files successful!")
+    finally:
+        await cleanup(user, document_id)
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    print("🧪 Testing Document Finalize Without Uploaded Files")
+    print("=" * 60)
+    asyncio.run(test_finalize_without_files())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for the forgery analysis verdicts: files that cannot be analyzed
+are rejected outright and a single high-severity finding fails a file.
+Run from the backend directory: python test_forgery.py
+"""
+
+import asyncio
+import os
+import tempfile
+
+from app.config import settings
+from app.utils.ai_forgery import SEVERITY_WEIGHTS, analyze_document, analyze_file, is_authentic
+
+CLEAN_PDF = b"%PDF-1.4\n1 0 obj\n<< /Producer (Writer) /CreationDate (D:20240101120000) /ModDate (D:20240101120000) >>\nendobj\n%%EOF\n"
+BACKDATED_PDF = b"%PDF-1.4\n1 0 obj\n<< /Producer (Writer) /CreationDate (D:20240301120000) /ModDate (D:20240101120000) >>\nendobj\n%%EOF\n"
+
+def write_file(directory: str, name: str, data: bytes) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def verdict(path: str):
+    report = analyze_file(path)
+    return report, is_authentic(report)
+
+def test_high_weight_reaches_threshold():
+    assert SEVERITY_WEIGHTS["high"] >= settings.forgery_score_threshold
+    print("✅ One high-severity finding reaches the threshold")
+
+def test_missing_file_rejected(directory: str):
+    report, authentic = verdict(os.path.join(directory, "missing.pdf"))
+    assert report["rejected"] and not authentic, report
+    print("✅ Missing file rejected")
+
+def test_pdf_without_header_rejected(directory: str):
+    report, authentic = verdict(write_file(directory, "fake.pdf", b"not a pdf at all"))
+    assert report["rejected"] and not authentic, report
+    print("✅ .pdf without a PDF header rejected")
+
+def test_undecodable_image_rejected(directory: str):
+    report, authentic = verdict(write_file(directory, "broken.png", b"\x89PNG\r\n\x1a\ngarbage"))
+    assert report["rejected"] and not authentic, report
+    print("✅ Undecodable image rejected")
+
+def test_unknown_type_rejected(directory: str):
+    report, authentic = verdict(write_file(directory, "agreement.docx", b"PK\x03\x04"))
+    assert report["rejected"] and not authentic, report
+    print("✅ Unknown file type rejected")
+
+def test_backdated_pdf_fails(directory: str):
+    report, authentic = verdict(write_file(directory, "backdated.pdf", BACKDATED_PDF))
+    assert [f["check"] for f in report["findings"]] == ["date_order"], report["findings"]
+    assert not report["rejected"] and not authentic, report
+    print("✅ ModDate before CreationDate fails on its own")
+
+def test_clean_pdf_passes(directory: str):
+    report, authentic = verdict(write_file(directory, "clean.pdf", CLEAN_PDF))
+    assert authentic, report
+    print("✅ Clean PDF passes")
+
+def test_missing_file_not_cached(directory: str):
+    path = os.path.join(directory, "later.pdf")
+    report = asyncio.run(analyze_document(path, "0" * 64))
+    assert not report["authentic"] and report["file_type"] == "missing", report
+    write_file(directory, "later.pdf", CLEAN_PDF)
+    report = asyncio.run(analyze_document(path, "0" * 64))
+    assert report["file_type"] == "pdf" and not report["cached"], report
+    print("✅ Missing-file verdict is not cached by digest")
+
+if __name__ == "__main__":
+    print("🧪 Testing Forgery Analysis Verdicts")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        test_high_weight_reaches_threshold()
+        test_missing_file_rejected(directory)
+        test_pdf_without_header_rejected(directory)
+        test_undecodable_image_rejected(directory)
+        test_unknown_type_rejected(directory)
+        test_backdated_pdf_fails(directory)
+        test_clean_pdf_passes(directory)
+        test_missing_file_not_cached(directory)
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import { documentsAPI, usersAPI } from '../services/api';
-import { Document, User } from '../types';
+import { DocumentSummary, User } from '../types';
 import { 
   MessageCircle, 
   Plus, 
@@ -17,7 +17,7 @@ import toast from 'react-hot-toast';
 const ChatList: React.FC = () => {
   const navigate = useNavigate();
   const { user: currentUser } = useAuth();
-  const [documents, setDocuments] = useState<Document[]>([]);
+  const [documents, setDocuments] = useState<DocumentSummary[]>([]);
   const [users, setUsers] = useState<User[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [isRefreshing, setIsRefreshing] = useState(false);
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import { documentsAPI } from '../services/api';
-import { Document } from '../types';
+import { DocumentSummary } from '../types';
 import { 
   Plus, 
   FileText, 
@@ -24,7 +24,7 @@ import { checkProfileCompletion } from '../utils/profileCompletion';
 
 const Dashboard: React.FC = () => {
   const { user } = useAuth();
-  const [documents, setDocuments] = useState<Document[]>([]);
+  const [documents, setDocuments] = useState<DocumentSummary[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [showPendingAgreements, setShowPendingAgreements] = useState(false);
   const [pendingAgreementsCount, setPendingAgreementsCount] = useState(0);
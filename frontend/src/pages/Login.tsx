@@ -1,19 +1,48 @@
 import React, { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
+import { authAPI } from '../services/api';
 import { Phone, Lock, ArrowRight } from 'lucide-react';
 import toast from 'react-hot-toast';
 
 const Login: React.FC = () => {
   const [phoneNo, setPhoneNo] = useState('');
   const [otp, setOtp] = useState('');
+  const [otpSent, setOtpSent] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
   const { login } = useAuth();
   const navigate = useNavigate();
 
+  // Concatenate country code with phone number
+  const fullPhoneNumber = `+91${phoneNo}`;
+
+  const sendOtp = async () => {
+    if (phoneNo.length !== 10) {
+      toast.error('Please enter a valid 10-digit mobile number');
+      return;
+    }
+
+    setIsLoading(true);
+    try {
+      await authAPI.requestOtp(fullPhoneNumber);
+      setOtpSent(true);
+      toast.success('OTP sent to your phone');
+    } catch (error: any) {
+      console.error('OTP request error:', error);
+      toast.error(error.response?.data?.detail || 'Could not send OTP. Please try again.');
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     
+    if (!otpSent) {
+      await sendOtp();
+      return;
+    }
+
     if (!phoneNo || !otp) {
       toast.error('Please fill in all fields');
       return;
@@ -21,8 +50,6 @@ const Login: React.FC = () => {
 
     setIsLoading(true);
     try {
-      // Concatenate country code with phone number
-      const fullPhoneNumber = `+91${phoneNo}`;
       await login(fullPhoneNumber, otp);
       navigate('/dashboard');
     } catch (error) {
@@ -88,6 +115,9 @@ const Login: React.FC = () => {
                           const value = e.target.value.replace(/\D/g, '');
                           if (value.length <= 10) {
                             setPhoneNo(value);
+                            // A code is only valid for the number it was sent to
+                            setOtpSent(false);
+                            setOtp('');
                           }
                         }}
                         className="w-full px-4 py-3 border border-gray-200 rounded-xl focus:ring-2 focus:ring-primary-500 focus:border-transparent transition-all duration-200 bg-gray-50 focus:bg-white"
@@ -101,27 +131,37 @@ const Login: React.FC = () => {
                   </p>
                 </div>
                 
-                <div>
-                  <label htmlFor="otp" className="block text-sm font-semibold text-gray-700 mb-2">
-                    OTP Code
-                  </label>
-                  <div className="relative group">
-                    <div className="absolute inset-y-0 left-0 pl-4 flex items-center pointer-events-none">
-                      <Lock className="h-5 w-5 text-gray-400 group-focus-within:text-primary-500 transition-colors" />
+                {otpSent && (
+                  <div>
+                    <label htmlFor="otp" className="block text-sm font-semibold text-gray-700 mb-2">
+                      OTP Code
+                    </label>
+                    <div className="relative group">
+                      <div className="absolute inset-y-0 left-0 pl-4 flex items-center pointer-events-none">
+                        <Lock className="h-5 w-5 text-gray-400 group-focus-within:text-primary-500 transition-colors" />
+                      </div>
+                      <input
+                        id="otp"
+                        name="otp"
+                        type="text"
+                        required
+                        value={otp}
+                        onChange={(e) => setOtp(e.target.value)}
+                        className="w-full pl-12 pr-4 py-3 border border-gray-200 rounded-xl focus:ring-2 focus:ring-primary-500 focus:border-transparent transition-all duration-200 bg-gray-50 focus:bg-white"
+                        placeholder="Enter the 6-digit code"
+                        maxLength={6}
+                      />
                     </div>
-                    <input
-                      id="otp"
-                      name="otp"
-                      type="text"
-                      required
-                      value={otp}
-                      onChange={(e) => setOtp(e.target.value)}
-                      className="w-full pl-12 pr-4 py-3 border border-gray-200 rounded-xl focus:ring-2 focus:ring-primary-500 focus:border-transparent transition-all duration-200 bg-gray-50 focus:bg-white"
-                      placeholder="123456"
-                      maxLength={6}
-                    />
+                    <button
+                      type="button"
+                      onClick={sendOtp}
+                      disabled={isLoading}
+                      className="mt-2 text-xs font-semibold text-primary-600 hover:text-primary-700 disabled:opacity-50"
+                    >
+                      Resend OTP
+                    </button>
                   </div>
-                </div>
+                )}
               </div>
 
               <div>
@@ -134,7 +174,7 @@ const Login: React.FC = () => {
                     <div className="animate-spin rounded-full h-5 w-5 border-b-2 border-white"></div>
                   ) : (
                     <>
-                      Sign in
+                      {otpSent ? 'Sign in' : 'Send OTP'}
                       <ArrowRight className="ml-2 h-4 w-4 group-hover:translate-x-1 transition-transform" />
                     </>
                   )}
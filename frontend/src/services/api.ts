@@ -5,6 +5,7 @@ import {
   RegisterData,
   // DocumentFormData,
   Document,
+  DocumentSummary,
   // JoinDocumentData,
   DocumentPaymentSetup,
   PaymentCalculationResponse
@@ -55,6 +56,9 @@ api.interceptors.response.use(
 
 // Auth API
 export const authAPI = {
+  requestOtp: (phoneNo: string) =>
+    api.post<{ message: string }>('/auth/request-otp', { phone_no: phoneNo }),
+
   register: (data: RegisterData) =>
     api.post<{ message: string; user_id: string; char_id: string; redirect_to_login: boolean }>('/auth/register', data),
 
@@ -74,7 +78,7 @@ export const usersAPI = {
     api.get<User>(`/users/${userId}`), // Works with both user_id and char_id
 
   getAllUsers: () =>
-    api.get<User[]>('/users/all'),
+    api.get<User[]>('/users/all', { params: { limit: 100 } }),
 };
 
 // Documents API
@@ -88,8 +92,19 @@ export const documentsAPI = {
   approveUserJoin: (documentId: string, userId: string) =>
     api.put<{ message: string }>(`/documents/${documentId}/approve/${userId}`), // Works with both document_id and document_code
 
-  getMyDocuments: () =>
-    api.get<Document[]>('/documents/my-documents'),
+  // Pages through X-Next-Cursor, so users with more documents than one page still get all of them
+  getMyDocuments: async () => {
+    const documents: DocumentSummary[] = [];
+    let cursor: string | undefined;
+    do {
+      const response = await api.get<DocumentSummary[]>('/documents/my-documents', {
+        params: { limit: 100, cursor }
+      });
+      documents.push(...response.data);
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return { data: documents };
+  },
 
   getDocument: (documentId: string) =>
     api.get<Document>(`/documents/${documentId}`), // Works with both document_id and document_code
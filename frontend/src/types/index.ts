@@ -43,6 +43,24 @@ export interface Document {
   updated_at: string;
 }
 
+// List view returned by /documents/my-documents; full details come from getDocument
+export interface DocumentSummary {
+  _id: string;
+  name: string;
+  document_code: string;
+  status: string;
+  role: 'primary' | 'participant';
+  primary_user: string;
+  involved_users: string[];
+  location?: string;
+  start_date?: string;
+  end_date?: string;
+  total_amount?: number;
+  payment_status?: string;
+  created_at: string;
+  updated_at: string;
+}
+
 export interface Message {
   _id: string;
   sender_id: string;